@@ -163,3 +163,46 @@ LOGGING = {
         },
     },
 }
+
+# Share coalesced API computations across worker processes through the cache.
+# Only enable this with a cache backend shared by all workers (e.g. file-based or Redis).
+DASHBOARD_COALESCE_SHARED = False
+
+# Background pest detection for uploaded images: worker threads per process and
+# the number of waiting jobs before uploads are refused with HTTP 429.
+DETECTION_WORKERS = 2
+DETECTION_QUEUE_SIZE = 8
+
+# Detection processes, each with its own loaded model. Off (0) by default: detection
+# runs in the web process. Every web worker (e.g. each gunicorn worker) starts its
+# own pool, so N workers with DETECTION_PROCESSES = P hold N * P model copies; enable
+# it with a single web worker, or size it for the memory that needs (see
+# DETECTION_README.md). Inference threads per process default to an even share of the cores.
+DETECTION_PROCESSES = 0
+DETECTION_ORT_THREADS = 0
+# Largest image accepted by the upload API, in bytes
+DETECTION_UPLOAD_MAX_BYTES = 10 * 1024 * 1024
+
+# Detection result cache: entries kept in memory (0 disables it), near-duplicate
+# matching by perceptual hash, and an optional directory to persist results in.
+DETECTION_CACHE_ENTRIES = 512
+DETECTION_CACHE_PERCEPTUAL = False
+DETECTION_CACHE_MAX_DISTANCE = 4
+DETECTION_CACHE_DIR = None
+
+# Skip slices without content before inference: None, 'variance', 'edges' or
+# 'histogram'. The threshold defaults per method (see dashboard.prefilter);
+# tune it against detection accuracy before enabling.
+DETECTION_PREFILTER = None
+DETECTION_PREFILTER_THRESHOLD = None
+
+# Slice geometry written by `manage.py tune_slices`; None uses models/slice_profile.json
+DETECTION_SLICE_PROFILE = None
+
+# Detection models: models/registry.json maps growth stages to model names and
+# versions (see models/README.md); without it, DETECTION_MODEL_PATH is used for
+# every stage. Loaded models are unloaded least recently used first beyond
+# DETECTION_MODEL_MEMORY_MB (estimated from the model file sizes).
+DETECTION_MODEL_REGISTRY = None
+DETECTION_MODEL_PATH = BASE_DIR / 'dashboard' / 'models' / 'best.onnx'
+DETECTION_MODEL_MEMORY_MB = 1024
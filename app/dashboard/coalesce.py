@@ -0,0 +1,164 @@
+# type: ignore
+import hashlib
+import logging
+import threading
+import time
+from collections import defaultdict
+from functools import wraps
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from .responses import wants_binary
+
+logger = logging.getLogger(__name__)
+
+# Query parameters that only defeat browser caches and never change the response
+IGNORED_PARAMS = {'_'}
+
+# Cross-worker coalescing through the Django cache (needs a cache shared by all workers)
+SHARED_LOCK_SECONDS = 30
+SHARED_RESULT_SECONDS = 1
+SHARED_POLL_SECONDS = 0.05
+
+_flights = {}
+_flights_lock = threading.Lock()
+_stats = defaultdict(lambda: {'requests': 0, 'computed': 0, 'coalesced': 0, 'shared': 0})
+
+
+class _Flight:
+    """One in-progress computation that concurrent callers wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def shared_coalescing_enabled():
+    """Cross-worker coalescing is opt-in: the default locmem cache is per process"""
+    return getattr(settings, 'DASHBOARD_COALESCE_SHARED', False)
+
+
+def flight_key(name, params):
+    """Normalize a view name and its parameters into a stable key"""
+    normalized = urlencode(sorted((str(key), str(value)) for key, value in params if key not in IGNORED_PARAMS))
+    return f'{name}:' + hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+
+def _compute_shared(name, key, compute):
+    """Let one worker compute while the others wait for its result in the shared cache"""
+    lock_key, result_key = f'dashboard:flight_lock:{key}', f'dashboard:flight_result:{key}'
+    deadline = time.monotonic() + SHARED_LOCK_SECONDS
+    waited = False
+    while not cache.add(lock_key, 1, SHARED_LOCK_SECONDS):
+        waited = True
+        result = cache.get(result_key)
+        if result is not None:
+            with _flights_lock:
+                _stats[name]['shared'] += 1
+            return result
+        if time.monotonic() > deadline:
+            # The other worker died or is too slow, compute locally
+            break
+        time.sleep(SHARED_POLL_SECONDS)
+
+    try:
+        if waited:
+            # The lock is released as soon as the result is stored, so a waiter that
+            # takes it over may find the computation it waited for already finished
+            result = cache.get(result_key)
+            if result is not None:
+                with _flights_lock:
+                    _stats[name]['shared'] += 1
+                return result
+        result = compute()
+        cache.set(result_key, result, SHARED_RESULT_SECONDS)
+        return result
+    finally:
+        cache.delete(lock_key)
+
+
+def single_flight(name, params, compute):
+    """
+    Run compute() once for all concurrent callers with the same name and params
+    Args:
+        name: Name of the computation, used for the stats
+        params: Iterable of (key, value) pairs identifying the request
+        compute: Callable producing the (picklable) result
+    Returns:
+        The result of the shared computation; its exception is raised in every caller
+    """
+    key = flight_key(name, params)
+    with _flights_lock:
+        _stats[name]['requests'] += 1
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+        else:
+            _stats[name]['coalesced'] += 1
+
+    if not leader:
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    try:
+        with _flights_lock:
+            _stats[name]['computed'] += 1
+        if shared_coalescing_enabled():
+            flight.result = _compute_shared(name, key, compute)
+        else:
+            flight.result = compute()
+        return flight.result
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
+        flight.done.set()
+
+
+def coalesce_view(view):
+    """
+    Share one execution of a GET view among concurrent identical requests
+    The view must depend only on its query parameters and URL arguments, not on
+    the user, and must not return a streaming response
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return view(request, *args, **kwargs)
+
+        # Query parameters are namespaced so they can never collide with the reserved __ keys
+        params = [(f'q.{key}', value) for key in request.GET if key not in IGNORED_PARAMS
+                  for value in request.GET.getlist(key)]
+        params += [(f'__arg{i}', value) for i, value in enumerate(args)]
+        params += [(f'__kwarg.{key}', value) for key, value in kwargs.items()]
+        # JSON and typed-array clients get different bodies
+        params.append(('__repr', 'binary' if wants_binary(request) else 'json'))
+
+        def render():
+            response = view(request, *args, **kwargs)
+            return response.status_code, dict(response.headers), response.content
+
+        status, headers, content = single_flight(view.__name__, params, render)
+        response = HttpResponse(content, status=status)
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    return wrapper
+
+
+def get_stats():
+    """Per-computation counts of requests, executions and coalesced callers"""
+    with _flights_lock:
+        return {
+            'shared': shared_coalescing_enabled(),
+            'in_flight': len(_flights),
+            'computations': {name: dict(stats) for name, stats in _stats.items()},
+        }
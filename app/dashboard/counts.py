@@ -0,0 +1,136 @@
+# type: ignore
+import logging
+from datetime import date, datetime, time, timedelta
+from django.core.cache import cache
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import SensorData, SystemData, DetectionData, DailyRowCount
+from .coalesce import flight_key, single_flight
+
+logger = logging.getLogger(__name__)
+
+COUNTED_MODELS = {
+    'sensor': SensorData,
+    'system': SystemData,
+    'detection': DetectionData,
+}
+
+# The data log shows one row per timestamp for these types (see latest_per_timestamp)
+DEDUPLICATED_TYPES = ('sensor', 'detection')
+
+SEARCH_COUNT_CACHE_SECONDS = 60
+
+
+def local_day(value):
+    """Calendar day of an aware datetime in the configured TIME_ZONE"""
+    return timezone.localtime(value).date()
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _adjust(data_type, day, delta):
+    """Add delta to a day's counter, creating the counter on first insert"""
+    updated = DailyRowCount.objects.filter(data_type=data_type, day=day).update(rows=F('rows') + delta)
+    if not updated and delta > 0:
+        DailyRowCount.objects.get_or_create(data_type=data_type, day=day, defaults={'rows': delta})
+
+
+def _is_visible_row(data_type, instance):
+    """Whether the instance is (or was) the only row for its timestamp, i.e. counted once"""
+    if data_type not in DEDUPLICATED_TYPES:
+        return True
+    model = COUNTED_MODELS[data_type]
+    return not model.objects.filter(timestamp=instance.timestamp).exclude(pk=instance.pk).exists()
+
+
+def record_insert(data_type, instance):
+    """Update the counters after a row was created"""
+    if _is_visible_row(data_type, instance):
+        _adjust(data_type, local_day(instance.timestamp), 1)
+
+
+def record_delete(data_type, instance):
+    """Update the counters after a row was deleted"""
+    if _is_visible_row(data_type, instance):
+        _adjust(data_type, local_day(instance.timestamp), -1)
+
+
+def rebuild_daily_counts(data_types=None):
+    """
+    Recompute the counters from the data tables
+    Needed after bulk_create, raw SQL or queryset deletes, which bypass the model signals
+    Returns:
+        int: Number of counter rows written
+    """
+    written = 0
+    for data_type in data_types or COUNTED_MODELS:
+        model = COUNTED_MODELS[data_type]
+        counted = Count('timestamp', distinct=True) if data_type in DEDUPLICATED_TYPES else Count('id')
+        days = model.objects.order_by().annotate(day=TruncDate('timestamp')).values('day').annotate(rows=counted)
+
+        DailyRowCount.objects.filter(data_type=data_type).delete()
+        DailyRowCount.objects.bulk_create([
+            DailyRowCount(data_type=data_type, day=entry['day'], rows=entry['rows'])
+            for entry in days if entry['day'] is not None
+        ])
+        written += len(days)
+        logger.info(f"Rebuilt {len(days)} daily row counters for {data_type} data")
+    return written
+
+
+def _search_count(queryset, data_type, period, start_date, end_date, search):
+    """Exact count for search queries, cached briefly per filter combination"""
+    params = [('type', data_type), ('period', period), ('start_date', start_date), ('end_date', end_date), ('search', search)]
+    key = 'dashboard:count:' + flight_key('count', params)
+    count = cache.get(key)
+    if count is None:
+        # Concurrent identical searches share one COUNT(*)
+        count = single_flight('search_count', params, queryset.count)
+        cache.set(key, count, SEARCH_COUNT_CACHE_SECONDS)
+    return count
+
+
+def count_records(queryset, data_type, period, start_date, end_date, search=''):
+    """
+    Total rows for the data log without a full COUNT(*)
+    Whole days come from the maintained per-day counters; only the partial first
+    day of a rolling period is counted exactly, through the timestamp index.
+    Search queries use a cached exact count.
+    Args:
+        queryset: The filtered (and deduplicated) data log queryset
+        data_type, period, start_date, end_date, search: The data log filters
+    Returns:
+        int: Number of rows
+    """
+    if search or data_type not in COUNTED_MODELS:
+        return _search_count(queryset, data_type, period, start_date, end_date, search)
+
+    try:
+        start = timezone.now() - timedelta(days=int(period)) if period != 'all' else None
+        if start_date:
+            start = max(filter(None, [start, _day_start(date.fromisoformat(start_date))]))
+        end_day = date.fromisoformat(end_date) + timedelta(days=1) if end_date else None
+    except ValueError:
+        return _search_count(queryset, data_type, period, start_date, end_date, search)
+
+    total = 0
+    first_day = None
+    if start is not None:
+        first_day = local_day(start)
+        if _day_start(first_day) < start:
+            # Count the partial first day exactly, then use counters from midnight on
+            first_day += timedelta(days=1)
+            total += queryset.filter(timestamp__lt=_day_start(first_day)).count()
+
+    counters = DailyRowCount.objects.filter(data_type=data_type)
+    if first_day is not None:
+        counters = counters.filter(day__gte=first_day)
+    if end_day is not None:
+        if first_day is not None and end_day <= first_day:
+            # The whole window lies within the partial day counted above
+            return total
+        counters = counters.filter(day__lt=end_day)
+    return total + (counters.aggregate(rows=Sum('rows'))['rows'] or 0)
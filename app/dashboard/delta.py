@@ -0,0 +1,91 @@
+# type: ignore
+import logging
+from datetime import datetime, timezone as dt_timezone
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import SensorData, SystemData, DetectionData
+
+logger = logging.getLogger(__name__)
+
+# Columns returned by delta sync, per read API (id and timestamp are always included)
+DELTA_FIELDS = {
+    'sensor': (SensorData, ['temperature', 'humidity', 'rainfall', 'thunder', 'pest_count', 'cpu_usage',
+                            'status', 'latitude', 'longitude']),
+    'system': (SystemData, ['cpu_percent', 'ram_percent', 'ram_used_gb', 'ram_total_gb', 'storage_percent',
+                            'storage_used_gb', 'storage_total_gb', 'network_sent_mb', 'network_recv_mb',
+                            'load_1min', 'load_5min', 'load_15min', 'status', 'cpu_temp', 'battery_level']),
+    'detection': (DetectionData, ['total_detections', 'growth_stage', 'class_counts', 'status']),
+}
+
+DELTA_LIMIT = 1000
+
+
+def wants_delta(request):
+    """Whether a read API request asks for rows newer than a client cursor"""
+    return 'since_id' in request.GET or 'since_ts' in request.GET
+
+
+def parse_since_ts(value):
+    """Parse since_ts given as epoch milliseconds or an ISO datetime"""
+    try:
+        millis = float(value)
+    except ValueError:
+        millis = None
+    if millis is not None:
+        try:
+            return datetime.fromtimestamp(millis / 1000, tz=dt_timezone.utc)
+        except (ValueError, OverflowError, OSError):
+            # NaN, infinite or outside the range datetime and the platform support
+            raise ValueError(f'Invalid since_ts: {value}')
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f'Invalid since_ts: {value}')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def get_delta(data_type, since_id=None, since_ts=None, limit=DELTA_LIMIT):
+    """
+    Rows newer than the client's cursor as one array per field
+    With both since_id and since_ts the cursor is the (timestamp, id) pair the
+    previous response returned, so rows sharing a timestamp are not skipped
+    Args:
+        data_type: sensor, system or detection
+        since_id: Last row id the client has
+        since_ts: Last timestamp the client has (aware datetime)
+        limit: Maximum rows per response
+    Returns:
+        dict: count, has_more, the next cursor and {field: [values]} oldest first
+    """
+    model, fields = DELTA_FIELDS[data_type]
+    queryset = model.objects.all()
+
+    if since_ts is not None and since_id is not None:
+        queryset = queryset.filter(Q(timestamp__gt=since_ts) | Q(timestamp=since_ts, id__gt=since_id))
+        queryset = queryset.order_by('timestamp', 'id')
+    elif since_ts is not None:
+        queryset = queryset.filter(timestamp__gt=since_ts).order_by('timestamp', 'id')
+    else:
+        queryset = queryset.filter(id__gt=since_id or 0).order_by('id')
+
+    rows = list(queryset.values_list('id', 'timestamp', *fields)[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    columns = list(zip(*rows)) if rows else [()] * (len(fields) + 2)
+    data = {field: list(values) for field, values in zip(['id', 'timestamp', *fields], columns)}
+    if rows:
+        # The cursor keeps full precision; the column uses epoch ms like /api/series/
+        since_id, since_ts = rows[-1][0], rows[-1][1]
+    data['timestamp'] = [int(value.timestamp() * 1000) for value in data['timestamp']]
+
+    return {
+        'type': data_type,
+        'count': len(rows),
+        'has_more': has_more,
+        'since_id': since_id,
+        'since_ts': since_ts.isoformat() if since_ts else None,
+        'columns': data,
+    }
@@ -0,0 +1,310 @@
+# type: ignore
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import cv2
+import numpy as np
+from django.conf import settings
+from .result_cache import get_result_cache
+
+logger = logging.getLogger(__name__)
+
+# Seconds between worker heartbeats and before a silent worker is considered hung
+HEARTBEAT_SECONDS = 1.0
+HEARTBEAT_TIMEOUT = 30.0
+HEALTH_CHECK_SECONDS = 2.0
+# Seconds to wait for every worker to load the model on start
+STARTUP_TIMEOUT = 120.0
+
+
+class WorkerCrashed(Exception):
+    """Raised for a detection whose worker process died or hung"""
+
+
+def decode_image(image):
+    """Decode encoded image bytes straight to a BGR array; arrays pass through"""
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        decoded = cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_COLOR)
+        if decoded is None:
+            raise ValueError('Could not decode image')
+        return decoded
+    return image
+
+
+def _heartbeat(heartbeat):
+    while True:
+        heartbeat.value = time.time()
+        time.sleep(HEARTBEAT_SECONDS)
+
+
+def _worker_main(index, tasks, results, heartbeat, current, completed, ort_threads):
+    """
+    Detection worker process: load the model once, then pull tasks from the shared queue
+    Idle workers take the next task as soon as they finish, so a slow image never
+    holds back work that another worker could run
+    """
+    import django
+    django.setup()
+    from django.conf import settings as worker_settings
+    if ort_threads:
+        # Split the cores between processes instead of every session using all of them
+        worker_settings.DETECTION_ORT_THREADS = ort_threads
+    from .model_registry import get_registry
+
+    heartbeat.value = time.time()
+    threading.Thread(target=_heartbeat, args=(heartbeat,), daemon=True).start()
+    # Preload the default model; models for other growth stages load on first use
+    registry = get_registry()
+    detector = registry.detector_for()[1]
+    results.put(('ready', index, os.getpid(), detector.engine is not None or detector.detection_model is not None))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        task_id, image, entry = task
+        current.value = task_id
+        try:
+            results.put(('done', task_id, True, registry.detect(decode_image(image), entry=entry)))
+        except Exception as e:
+            results.put(('done', task_id, False, f'{type(e).__name__}: {e}'))
+        finally:
+            current.value = 0
+            completed.value += 1
+
+
+class _Worker:
+    """Parent-side handle and shared state of one worker process"""
+
+    def __init__(self, index, context):
+        self.index = index
+        self.heartbeat = context.Value('d', 0.0, lock=False)
+        self.current = context.Value('q', 0, lock=False)
+        self.completed = context.Value('q', 0, lock=False)
+        self.process = None
+        self.pid = None
+        self.ready = False
+        self.model_loaded = False
+        self.started_at = None
+        self.restarts = 0
+
+
+class DetectionExecutor:
+    """
+    Runs pest detection in a pool of processes that each keep a loaded model
+    Inference is CPU-bound, so threads in one process serialize on the GIL; the
+    processes run detections on separate cores
+    """
+
+    def __init__(self, processes=None):
+        self.processes = processes or os.cpu_count() or 1
+        # Give each ONNX Runtime session its share of the cores unless configured
+        self.ort_threads = getattr(settings, 'DETECTION_ORT_THREADS', 0) or max(1, (os.cpu_count() or 1) // self.processes)
+        # Spawn, not fork: the parent has open DB connections and threads
+        self.context = multiprocessing.get_context('spawn')
+        self.tasks = self.context.Queue()
+        self.results = self.context.Queue()
+        self.workers = [_Worker(i, self.context) for i in range(self.processes)]
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._ready = threading.Condition(self._lock)
+        self._running = False
+        self._stopping = False
+        self.stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'crashed': 0}
+
+    def _spawn(self, worker):
+        worker.ready = False
+        worker.heartbeat.value = time.time()
+        worker.current.value = 0
+        worker.process = self.context.Process(
+            target=_worker_main,
+            args=(worker.index, self.tasks, self.results, worker.heartbeat, worker.current, worker.completed,
+                  self.ort_threads),
+            name=f'detection-process-{worker.index}',
+            daemon=True,
+        )
+        worker.process.start()
+        worker.pid = worker.process.pid
+        worker.started_at = time.time()
+
+    def start(self, wait=True):
+        """
+        Start the worker processes
+        Args:
+            wait: Block until every worker has loaded its model
+        """
+        self._running = True
+        for worker in self.workers:
+            self._spawn(worker)
+        threading.Thread(target=self._collect, name='detection-results', daemon=True).start()
+        threading.Thread(target=self._monitor, name='detection-health', daemon=True).start()
+        if wait:
+            with self._ready:
+                self._ready.wait_for(lambda: all(w.ready for w in self.workers), timeout=STARTUP_TIMEOUT)
+        logger.info(f"Started {self.processes} detection processes ({self.ort_threads} inference threads each)")
+        return self
+
+    def _collect(self):
+        """Resolve futures as workers report results"""
+        while self._running:
+            try:
+                message = self.results.get(timeout=HEALTH_CHECK_SECONDS)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+
+            if message[0] == 'ready':
+                _, index, pid, model_loaded = message
+                with self._ready:
+                    worker = self.workers[index]
+                    worker.ready, worker.pid, worker.model_loaded = True, pid, model_loaded
+                    self._ready.notify_all()
+                continue
+
+            _, task_id, ok, payload = message
+            with self._lock:
+                future = self._pending.pop(task_id, None)
+                self.stats['completed' if ok else 'failed'] += 1
+            if future is None:
+                continue
+            if ok:
+                future.set_result(payload)
+            else:
+                future.set_exception(RuntimeError(payload))
+
+    def _monitor(self):
+        """Restart workers that died or stopped sending heartbeats and fail their task"""
+        while self._running and not self._stopping:
+            time.sleep(HEALTH_CHECK_SECONDS)
+            for worker in self.workers:
+                if self._stopping:
+                    break
+                alive = worker.process.is_alive()
+                stale = time.time() - worker.heartbeat.value > HEARTBEAT_TIMEOUT
+                if alive and not stale:
+                    continue
+
+                task_id = worker.current.value
+                logger.error(f"Detection process {worker.index} (pid {worker.pid}) "
+                             f"{'hung' if alive else 'died'}, restarting")
+                if alive:
+                    worker.process.terminate()
+                worker.process.join(timeout=5)
+                with self._lock:
+                    future = self._pending.pop(task_id, None) if task_id else None
+                    self.stats['crashed'] += 1
+                if future is not None:
+                    future.set_exception(WorkerCrashed(f'Detection process {worker.index} failed during detection'))
+                worker.restarts += 1
+                self._spawn(worker)
+
+    def submit(self, image, entry=None):
+        """
+        Queue one detection
+        Args:
+            image: OpenCV image (numpy array), or encoded image bytes to decode in the worker
+            entry: Registry ModelEntry to detect with (default: the registry's default model)
+        Returns:
+            Future resolving to the detection results dict
+        """
+        if not self._running:
+            raise RuntimeError('Detection executor is not running')
+        future = Future()
+        with self._lock:
+            task_id = next(self._ids)
+            self._pending[task_id] = future
+            self.stats['submitted'] += 1
+        self.tasks.put((task_id, image, entry))
+        return future
+
+    def detect(self, image, entry=None, timeout=None):
+        """Run one detection in the pool and wait for its results"""
+        return self.submit(image, entry).result(timeout)
+
+    def health(self):
+        """Per-worker liveness, heartbeat age and task counts"""
+        now = time.time()
+        return [{
+            'index': worker.index,
+            'pid': worker.pid,
+            'alive': worker.process is not None and worker.process.is_alive(),
+            'ready': worker.ready,
+            'model_loaded': worker.model_loaded,
+            'busy': bool(worker.current.value),
+            'heartbeat_age': round(now - worker.heartbeat.value, 2),
+            'completed': worker.completed.value,
+            'restarts': worker.restarts,
+            'uptime': round(now - worker.started_at, 1) if worker.started_at else None,
+        } for worker in self.workers]
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, processes=self.processes, pending=len(self._pending))
+
+    def shutdown(self):
+        """Stop the workers after the tasks already queued"""
+        self._stopping = True
+        for _ in self.workers:
+            self.tasks.put(None)
+        for worker in self.workers:
+            worker.process.join(timeout=10)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        self._running = False
+        with self._lock:
+            for future in self._pending.values():
+                future.set_exception(WorkerCrashed('Detection executor shut down'))
+            self._pending.clear()
+
+
+# Global executor instance
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Get or start the process pool, or None when settings.DETECTION_PROCESSES is 0"""
+    global _executor
+    processes = getattr(settings, 'DETECTION_PROCESSES', 0)
+    if not processes:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = DetectionExecutor(processes).start()
+    return _executor
+
+
+def detect(image, growth_stage=None):
+    """
+    Detect pests in the process pool when configured, otherwise in this process,
+    going through the result cache
+    Encoded bytes are much smaller than the decoded frame to pass to a worker
+    Args:
+        image: OpenCV image (numpy array) or encoded image bytes
+        growth_stage: Growth stage selecting the model from the registry
+    Returns:
+        dict: Detection results
+    """
+    from .model_registry import get_registry
+    from .yolo_detector import detect_pests, detection_config_key
+    # Resolved once here so the cache key and the worker agree on the model, even mid-swap
+    entry = get_registry().resolve(growth_stage)
+    executor = get_executor()
+    if executor is None:
+        compute = lambda: detect_pests(decode_image(image), entry=entry)
+    else:
+        compute = lambda: executor.detect(image, entry)
+
+    # Re-uploaded and (in perceptual mode) near-identical frames reuse earlier results
+    cache = get_result_cache()
+    if cache is None:
+        return compute()
+    config = detection_config_key(entry.path, entry.fingerprint)
+    return cache.get_or_compute(image, config and f'{entry.label}|{config}', compute)
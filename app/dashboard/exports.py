@@ -0,0 +1,312 @@
+# type: ignore
+import csv
+import json
+import logging
+import zipfile
+from datetime import datetime, timezone as dt_timezone
+from functools import lru_cache
+from io import StringIO
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError as e:
+    logger.warning(f"pyarrow not available, Parquet/Arrow exports disabled: {e}")
+    PYARROW_AVAILABLE = False
+
+# Rows fetched per database round trip and encoded per CSV chunk
+EXPORT_CHUNK_SIZE = 2000
+
+# Years checked for a constant UTC offset before localizing timestamps by addition
+FIXED_OFFSET_YEARS = range(1970, 2038)
+
+# Arrow column types for model fields (DateTimeField and JSONField are handled separately)
+ARROW_TYPES = {}
+if PYARROW_AVAILABLE:
+    ARROW_TYPES = {
+        'FloatField': pa.float64(),
+        'IntegerField': pa.int64(),
+        'CharField': pa.string(),
+    }
+
+# (CSV header, model field) for each exportable data type
+EXPORT_COLUMNS = {
+    'sensor': [
+        ('Timestamp', 'timestamp'),
+        ('Temperature', 'temperature'),
+        ('Humidity', 'humidity'),
+        ('Rainfall', 'rainfall'),
+        ('Thunder', 'thunder'),
+        ('Pest Count', 'pest_count'),
+        ('Status', 'status'),
+        ('Latitude', 'latitude'),
+        ('Longitude', 'longitude'),
+    ],
+    'system': [
+        ('Timestamp', 'timestamp'),
+        ('CPU %', 'cpu_percent'),
+        ('RAM %', 'ram_percent'),
+        ('RAM Used (GB)', 'ram_used_gb'),
+        ('RAM Total (GB)', 'ram_total_gb'),
+        ('Storage %', 'storage_percent'),
+        ('Storage Used (GB)', 'storage_used_gb'),
+        ('Storage Total (GB)', 'storage_total_gb'),
+        ('Network Sent (MB)', 'network_sent_mb'),
+        ('Network Received (MB)', 'network_recv_mb'),
+        ('Load 1min', 'load_1min'),
+        ('CPU Temp (°C)', 'cpu_temp'),
+        ('Battery Level (%)', 'battery_level'),
+        ('Status', 'status'),
+    ],
+    'detection': [
+        ('Timestamp', 'timestamp'),
+        ('Total Detections', 'total_detections'),
+        ('Class Counts', 'class_counts'),
+        ('Growth Stage', 'growth_stage'),
+        ('Status', 'status'),
+        ('Model Version', 'model_version'),
+    ],
+}
+
+
+@lru_cache(maxsize=None)
+def _fixed_offset(zone):
+    """
+    The zone's UTC offset if it never changes (no DST) in FIXED_OFFSET_YEARS, else None
+    Asia/Jakarta is UTC+7 throughout, so its timestamps localize by a plain addition
+    """
+    offsets = {
+        datetime(year, month, 1, tzinfo=dt_timezone.utc).astimezone(zone).utcoffset()
+        for year in FIXED_OFFSET_YEARS for month in (1, 7)
+    }
+    return offsets.pop() if len(offsets) == 1 else None
+
+
+def format_timestamps_csv(timestamps):
+    """
+    Batch version of views.format_timestamp_csv for a chunk of UTC timestamps
+    Returns local (TIME_ZONE) time strings in Excel-friendly YYYY-MM-DD HH:MM:SS format
+    """
+    zone = timezone.get_default_timezone()
+    offset = _fixed_offset(zone)
+    if offset is None:
+        return [ts.astimezone(zone).isoformat(' ', 'seconds')[:19] for ts in timestamps]
+    return [(ts + offset).isoformat(' ', 'seconds')[:19] for ts in timestamps]
+
+
+def iter_row_chunks(queryset, data_type, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Iterate over raw export rows in chunks without loading model instances
+    Args:
+        queryset: Filtered and ordered queryset for the data type
+        data_type: Key of EXPORT_COLUMNS
+        chunk_size: Number of rows per chunk
+    Yields:
+        list: Row tuples (values in EXPORT_COLUMNS order) for one chunk
+    """
+    fields = [field for _, field in EXPORT_COLUMNS[data_type]]
+
+    chunk = []
+    for row in queryset.values_list(*fields).iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _prepare_csv_chunk(chunk, json_columns):
+    """Localize timestamps for a whole chunk and stringify JSON columns"""
+    timestamps = format_timestamps_csv([row[0] for row in chunk])
+    rows = []
+    for timestamp, row in zip(timestamps, chunk):
+        row = list(row)
+        row[0] = timestamp
+        for i in json_columns:
+            row[i] = str(row[i]) if row[i] else ''
+        rows.append(row)
+    return rows
+
+
+def iter_csv(queryset, data_type, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Stream a queryset as UTF-8 CSV, one encoded chunk at a time
+    Memory use is bounded by chunk_size regardless of the export size
+    """
+    fields = [field for _, field in EXPORT_COLUMNS[data_type]]
+    json_columns = [i for i, field in enumerate(fields) if field == 'class_counts']
+
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow([header for header, _ in EXPORT_COLUMNS[data_type]])
+    for chunk in iter_row_chunks(queryset, data_type, chunk_size):
+        writer.writerows(_prepare_csv_chunk(chunk, json_columns))
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+
+    # Header only (empty export)
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def iter_ndjson(queryset, data_type, chunk_size=EXPORT_CHUNK_SIZE):
+    """Stream a queryset as newline-delimited JSON objects with typed values"""
+    fields = [field for _, field in EXPORT_COLUMNS[data_type]]
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    zone = timezone.get_default_timezone()
+
+    for chunk in iter_row_chunks(queryset, data_type, chunk_size):
+        lines = []
+        for row in chunk:
+            record = dict(zip(fields, row))
+            record['timestamp'] = row[0].astimezone(zone).isoformat()
+            lines.append(encoder.encode(record))
+        lines.append('')
+        yield '\n'.join(lines).encode('utf-8')
+
+
+def _arrow_schema(queryset, data_type):
+    """Build a typed Arrow schema from the model fields of an export"""
+    model = queryset.model
+    arrow_fields = []
+    for _, field in EXPORT_COLUMNS[data_type]:
+        internal_type = model._meta.get_field(field).get_internal_type()
+        if internal_type == 'DateTimeField':
+            arrow_type = pa.timestamp('us', tz=settings.TIME_ZONE)
+        elif internal_type == 'JSONField':
+            arrow_type = pa.map_(pa.string(), pa.int64())
+        else:
+            arrow_type = ARROW_TYPES[internal_type]
+        arrow_fields.append(pa.field(field, arrow_type))
+    return pa.schema(arrow_fields)
+
+
+def _iter_record_batches(queryset, data_type, schema, chunk_size):
+    """Convert row chunks into Arrow record batches, one batch per chunk"""
+    for chunk in iter_row_chunks(queryset, data_type, chunk_size):
+        columns = list(zip(*chunk))
+        arrays = []
+        for values, field in zip(columns, schema):
+            if pa.types.is_map(field.type):
+                values = [list(value.items()) if value else None for value in values]
+            arrays.append(pa.array(values, type=field.type))
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def iter_parquet(queryset, data_type, chunk_size=EXPORT_CHUNK_SIZE):
+    """Stream a queryset as a Parquet file, one row group per chunk"""
+    schema = _arrow_schema(queryset, data_type)
+    sink = _StreamSink()
+    writer = pq.ParquetWriter(sink, schema, compression='zstd')
+    try:
+        for batch in _iter_record_batches(queryset, data_type, schema, chunk_size):
+            writer.write_batch(batch, row_group_size=chunk_size)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def iter_arrow(queryset, data_type, chunk_size=EXPORT_CHUNK_SIZE):
+    """Stream a queryset in the Arrow IPC streaming format, one record batch per chunk"""
+    schema = _arrow_schema(queryset, data_type)
+    sink = _StreamSink()
+    writer = pa.ipc.new_stream(sink, schema)
+    try:
+        for batch in _iter_record_batches(queryset, data_type, schema, chunk_size):
+            writer.write_batch(batch)
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+# format: (iterator, content type, file extension, deflate inside ZIP, needs pyarrow)
+EXPORT_FORMATS = {
+    'csv': (iter_csv, 'text/csv', 'csv', True, False),
+    'ndjson': (iter_ndjson, 'application/x-ndjson', 'ndjson', True, False),
+    'parquet': (iter_parquet, 'application/vnd.apache.parquet', 'parquet', False, True),
+    'arrow': (iter_arrow, 'application/vnd.apache.arrow.stream', 'arrow', True, True),
+}
+
+
+def get_export_format(name):
+    """
+    Look up an export format by name
+    Raises:
+        ValueError: If the format is unknown or its optional dependency is missing
+    """
+    if name not in EXPORT_FORMATS:
+        raise ValueError(f'Unknown export format: {name}')
+    export_format = EXPORT_FORMATS[name]
+    if export_format[4] and not PYARROW_AVAILABLE:
+        raise ValueError(f'Export format {name} requires pyarrow')
+    return export_format
+
+
+def iter_export(queryset, data_type, format='csv', chunk_size=EXPORT_CHUNK_SIZE):
+    """Stream a queryset in the given export format as bytes"""
+    return get_export_format(format)[0](queryset, data_type, chunk_size)
+
+
+class _StreamSink:
+    """Unseekable write target that hands written bytes back to the caller"""
+
+    closed = False
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_zip(entries, format='csv', chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Stream a ZIP archive of exports as it is compressed
+    Tables are exported one after another: encoding rows holds the GIL, so producing
+    them in parallel threads measured no faster
+    Args:
+        entries: List of (filename, queryset, data_type)
+        format: Export format of each entry (see EXPORT_FORMATS)
+        chunk_size: Number of rows per chunk
+    Yields:
+        bytes: Compressed archive data
+    """
+    compress_type = zipfile.ZIP_DEFLATED if get_export_format(format)[3] else zipfile.ZIP_STORED
+    stream = _StreamSink()
+    with zipfile.ZipFile(stream, 'w', compress_type) as zip_file:
+        for filename, queryset, data_type in entries:
+            with zip_file.open(filename, 'w', force_zip64=True) as entry:
+                for chunk in iter_export(queryset, data_type, format, chunk_size):
+                    entry.write(chunk)
+                    data = stream.drain()
+                    if data:
+                        yield data
+            yield stream.drain()
+    yield stream.drain()
@@ -0,0 +1,236 @@
+# type: ignore
+import logging
+import math
+import time
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Max
+from .models import SensorData
+
+logger = logging.getLogger(__name__)
+
+# Devices are bucketed into web-mercator tiles at this zoom to form the grid index
+INDEX_ZOOM = 12
+# Cluster cells per tile side: 4 cells of 64px in a 256px map tile
+CELLS_PER_TILE = 4
+MAX_ZOOM = 20
+# Upper bound on tiles per request so a request's cost doesn't depend on the bbox;
+# larger viewports are clustered at a coarser zoom
+MAX_TILES = 64
+FLEET_INDEX_CACHE_KEY = 'dashboard:fleet_index'
+FLEET_INDEX_VERSION_CACHE_KEY = 'dashboard:fleet_index_version'
+FLEET_CACHE_SECONDS = 30
+MAX_LATITUDE = 85.05112878
+
+# Pest levels by pest count: (upper bound inclusive, level), anything above is 'high'
+PEST_LEVELS = [(0, 'none'), (5, 'low'), (20, 'medium')]
+
+
+def pest_level(pest_count):
+    """Map a pest count to a coarse severity level"""
+    for bound, level in PEST_LEVELS:
+        if pest_count <= bound:
+            return level
+    return 'high'
+
+
+def project(latitude, longitude):
+    """Project coordinates onto the unit web-mercator square (x, y in [0, 1))"""
+    latitude = np.clip(np.asarray(latitude, dtype=np.float64), -MAX_LATITUDE, MAX_LATITUDE)
+    longitude = np.clip(np.asarray(longitude, dtype=np.float64), -180.0, 180.0)
+    x = (longitude + 180.0) / 360.0
+    sin_lat = np.sin(np.radians(latitude))
+    y = 0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * np.pi)
+    limit = np.nextafter(1.0, 0.0)
+    return np.clip(x, 0.0, limit), np.clip(y, 0.0, limit)
+
+
+def _tile_span(west, south, east, north, zoom):
+    """First and last tile columns and rows at a zoom level covering a bounding box"""
+    (x0, x1), (y1, y0) = project([south, north], [west, east])
+    n = 1 << zoom
+    return int(x0 * n), int(x1 * n), int(y0 * n), int(y1 * n)
+
+
+def bbox_tile_count(west, south, east, north, zoom):
+    """Number of tiles at a zoom level covering a bounding box"""
+    tx0, tx1, ty0, ty1 = _tile_span(west, south, east, north, zoom)
+    return (tx1 - tx0 + 1) * (ty1 - ty0 + 1)
+
+
+def bbox_tiles(west, south, east, north, zoom):
+    """List the (x, y) tiles at a zoom level covering a bounding box"""
+    tx0, tx1, ty0, ty1 = _tile_span(west, south, east, north, zoom)
+    return [(tx, ty) for tx in range(tx0, tx1 + 1) for ty in range(ty0, ty1 + 1)]
+
+
+def fit_zoom(west, south, east, north, zoom):
+    """Highest zoom up to the requested one at which the bounding box spans at most MAX_TILES tiles"""
+    while zoom > 0 and bbox_tile_count(west, south, east, north, zoom) > MAX_TILES:
+        zoom -= 1
+    return zoom
+
+
+def _group_by_tile(x, y, zoom):
+    """Map each (tile x, tile y) at a zoom level to the indices of the devices inside it"""
+    n = 1 << zoom
+    tile_keys = (x * n).astype(np.int64) * n + (y * n).astype(np.int64)
+    order = np.argsort(tile_keys, kind='stable')
+    keys, starts = np.unique(tile_keys[order], return_index=True)
+    return {(key // n, key % n): members for key, members in zip(keys.tolist(), np.split(order, starts[1:]))}
+
+
+def build_fleet_index():
+    """
+    Load the latest reading of every device location into a grid index
+    A device is a distinct (latitude, longitude) pair reported in sensor data
+    Returns:
+        dict: version, per-device arrays and, for every zoom up to INDEX_ZOOM,
+              {(tile x, tile y): device indices}
+    """
+    latest_ids = (
+        SensorData.objects.filter(latitude__isnull=False, longitude__isnull=False)
+        .order_by().values('latitude', 'longitude').annotate(last_id=Max('id')).values('last_id')
+    )
+    rows = list(
+        SensorData.objects.filter(id__in=latest_ids).order_by()
+        .values_list('latitude', 'longitude', 'status', 'pest_count', 'timestamp')
+    )
+
+    latitude = np.array([row[0] for row in rows], dtype=np.float64)
+    longitude = np.array([row[1] for row in rows], dtype=np.float64)
+    x, y = project(latitude, longitude)
+
+    # One tile lookup per requested tile at any zoom, whatever the fleet size
+    tiles = {zoom: _group_by_tile(x, y, zoom) if rows else {} for zoom in range(INDEX_ZOOM + 1)}
+
+    return {
+        'version': time.time_ns(),
+        'latitude': latitude,
+        'longitude': longitude,
+        'x': x,
+        'y': y,
+        'status': np.array([row[2] or 'Offline' for row in rows], dtype=object),
+        'pest_count': np.array([row[3] or 0 for row in rows], dtype=np.int64),
+        'timestamp': np.array([row[4].timestamp() for row in rows], dtype=np.float64),
+        'tiles': tiles,
+    }
+
+
+# The index this process last loaded from the cache
+_index = None
+
+
+def get_fleet_index():
+    """
+    Get the grid index, rebuilt at most every FLEET_CACHE_SECONDS
+    The index itself is only read from the cache when its version changes, so
+    requests don't pay for loading the whole fleet
+    """
+    global _index
+    version = cache.get(FLEET_INDEX_VERSION_CACHE_KEY)
+    if version is not None and _index is not None and _index['version'] == version:
+        return _index
+    index = cache.get(FLEET_INDEX_CACHE_KEY) if version is not None else None
+    if index is None:
+        index = build_fleet_index()
+        cache.set_many({FLEET_INDEX_CACHE_KEY: index, FLEET_INDEX_VERSION_CACHE_KEY: index['version']},
+                       FLEET_CACHE_SECONDS)
+        logger.info(f"Built fleet index with {len(index['x'])} devices in {len(index['tiles'][INDEX_ZOOM])} cells")
+    _index = index
+    return index
+
+
+def _tile_devices(index, zoom, tx, ty):
+    """Indices of the devices inside one tile, looked up through the grid index"""
+    if zoom <= INDEX_ZOOM:
+        devices = index['tiles'][zoom].get((tx, ty))
+        return devices if devices is not None else np.empty(0, dtype=np.intp)
+
+    shift = zoom - INDEX_ZOOM
+    devices = index['tiles'][INDEX_ZOOM].get((tx >> shift, ty >> shift))
+    if devices is None:
+        return np.empty(0, dtype=np.intp)
+    n = 1 << zoom
+    inside = ((index['x'][devices] * n).astype(np.int64) == tx) & ((index['y'][devices] * n).astype(np.int64) == ty)
+    return devices[inside]
+
+
+def cluster_tile(index, zoom, tx, ty):
+    """
+    Cluster the devices of one tile on a CELLS_PER_TILE grid
+    Returns:
+        list: clusters with centroid, device count, latest status and worst pest level
+    """
+    devices = _tile_devices(index, zoom, tx, ty)
+    if not len(devices):
+        return []
+
+    cells_per_side = (1 << zoom) * CELLS_PER_TILE
+    cell_x = (index['x'][devices] * cells_per_side).astype(np.int64)
+    cell_y = (index['y'][devices] * cells_per_side).astype(np.int64)
+    _, cluster_of = np.unique(cell_x * cells_per_side + cell_y, return_inverse=True)
+    cluster_count = cluster_of.max() + 1
+
+    counts = np.bincount(cluster_of, minlength=cluster_count)
+    latitude = np.bincount(cluster_of, weights=index['latitude'][devices], minlength=cluster_count) / counts
+    longitude = np.bincount(cluster_of, weights=index['longitude'][devices], minlength=cluster_count) / counts
+
+    worst = np.zeros(cluster_count, dtype=np.int64)
+    np.maximum.at(worst, cluster_of, index['pest_count'][devices])
+
+    # Latest device per cluster: sort by (cluster, timestamp) and take the last of each run
+    order = np.lexsort((index['timestamp'][devices], cluster_of))
+    last = np.flatnonzero(np.r_[cluster_of[order][1:] != cluster_of[order][:-1], True])
+    latest = devices[order[last]]
+
+    online = np.bincount(cluster_of, weights=index['status'][devices] == 'Online', minlength=cluster_count)
+
+    return [
+        {
+            'latitude': round(float(latitude[i]), 6),
+            'longitude': round(float(longitude[i]), 6),
+            'count': int(counts[i]),
+            'online': int(online[i]),
+            'status': index['status'][latest[i]],
+            'timestamp': int(index['timestamp'][latest[i]] * 1000),
+            'max_pest_count': int(worst[i]),
+            'pest_level': pest_level(int(worst[i])),
+        }
+        for i in range(cluster_count)
+    ]
+
+
+def get_fleet_clusters(west, south, east, north, zoom):
+    """
+    Server-side clusters for the map viewport, cached per zoom and tile
+    Viewports spanning more than MAX_TILES tiles are clustered at a coarser zoom
+    Args:
+        west, south, east, north: Viewport bounds in degrees
+        zoom: Map zoom level (0 - MAX_ZOOM)
+    Returns:
+        dict: zoom clustered at, tile count, device count and clusters
+    """
+    zoom = fit_zoom(west, south, east, north, zoom)
+    tiles = bbox_tiles(west, south, east, north, zoom)
+
+    index = get_fleet_index()
+    keys = {tile: f"dashboard:fleet:{index['version']}:{zoom}:{tile[0]}:{tile[1]}" for tile in tiles}
+    cached = cache.get_many(list(keys.values()))
+
+    computed = {}
+    clusters = []
+    for tile, key in keys.items():
+        tile_clusters = cached.get(key)
+        if tile_clusters is None:
+            tile_clusters = computed[key] = cluster_tile(index, zoom, *tile)
+        clusters.extend(tile_clusters)
+    if computed:
+        cache.set_many(computed, FLEET_CACHE_SECONDS)
+
+    return {
+        'zoom': zoom,
+        'tiles': len(tiles),
+        'devices': sum(cluster['count'] for cluster in clusters),
+        'clusters': clusters,
+    }
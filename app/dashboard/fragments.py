@@ -0,0 +1,72 @@
+# type: ignore
+import hashlib
+import logging
+import time
+from datetime import timedelta
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.utils import timezone
+from .counts import local_day
+from .pagination import decode_cursor
+
+logger = logging.getLogger(__name__)
+
+# Rendered data log pages only change when rows are saved or deleted on the days they span
+FRAGMENT_CACHE_SECONDS = 60 * 60
+DATA_LOG_FRAGMENTS = ('data_log_table', 'data_log_modals')
+
+
+def _version_key(data_type, day):
+    return f'dashboard:fragment_version:{data_type}:{day.isoformat()}'
+
+
+def bump_fragment_version(data_type, day):
+    """Invalidate every cached data log fragment that spans this day"""
+    cache.set(_version_key(data_type, day), time.time_ns(), None)
+
+
+def _fragment_versions(data_type, days):
+    keys = [_version_key(data_type, day) for day in days]
+    versions = cache.get_many(keys)
+    # A missing (or evicted) version gets a fresh value so stale fragments can't match
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def page_fragment_key(data_type, filters, cursor, page):
+    """
+    Cache key for the rendered rows and modals of one data log page
+    Args:
+        data_type: sensor, system or detection
+        filters: Filter values the page was built from (period, dates, search)
+        cursor: Cursor the page was requested with ('' for the first page)
+        page: KeysetPage with at least id and timestamp loaded
+    Returns:
+        str: Key that changes when rows land between the cursor and the end of the page
+    """
+    timestamps = [row.timestamp for row in page]
+    if cursor:
+        timestamps.append(decode_cursor(cursor)[0])
+    else:
+        # The first page changes whenever a newer row arrives
+        timestamps.append(timezone.now())
+
+    first_day, last_day = local_day(min(timestamps)), local_day(max(timestamps))
+    days = [first_day + timedelta(days=offset) for offset in range((last_day - first_day).days + 1)]
+
+    parts = [data_type, cursor, *filters, *[row.id for row in page], *_fragment_versions(data_type, days)]
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+def fragments_cached(fragment_key):
+    """Whether every data log fragment for this key is already rendered"""
+    return all(cache.has_key(make_template_fragment_key(name, [fragment_key])) for name in DATA_LOG_FRAGMENTS)
+
+
+def load_page_rows(page, model):
+    """Replace the page's id/timestamp-only rows with full rows for rendering"""
+    rows = model.objects.in_bulk([row.id for row in page])
+    page.object_list = [rows[row.id] for row in page if row.id in rows]
@@ -0,0 +1,218 @@
+# type: ignore
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .executor import detect
+from .models import DetectionData, DetectionJob
+
+logger = logging.getLogger(__name__)
+
+# Defaults, overridable with settings.DETECTION_WORKERS / settings.DETECTION_QUEUE_SIZE
+DETECTION_WORKERS = 2
+DETECTION_QUEUE_SIZE = 8
+# Seconds clients are asked to wait before retrying when the queue is full
+RETRY_AFTER_SECONDS = 5
+# Processes renew the lease on their jobs every JOB_LEASE_RENEW_SECONDS; jobs whose
+# lease is older than JOB_LEASE_SECONDS belong to a process that is gone and are taken over
+JOB_LEASE_RENEW_SECONDS = 10
+JOB_LEASE_SECONDS = 60
+
+
+class QueueFull(Exception):
+    """Raised when the detection queue is at capacity"""
+
+
+_queue = None
+_workers = []
+_worker_id = None
+_start_lock = threading.Lock()
+
+
+def _process_job(job_id):
+    """Run detection for one job and record the outcome"""
+    # Claim the job; it may have been taken over by another process if our lease expired
+    claimed = DetectionJob.objects.filter(id=job_id, status=DetectionJob.QUEUED, worker=_worker_id).update(
+        status=DetectionJob.RUNNING, started_at=timezone.now(), lease_at=timezone.now()
+    )
+    if not claimed:
+        return
+    job = DetectionJob.objects.get(id=job_id)
+    # Only finish the job while this process still holds it: if the lease expired during
+    # a slow detection, the process that took the job over records the result instead
+    still_leased = DetectionJob.objects.filter(id=job_id, status=DetectionJob.RUNNING, worker=_worker_id)
+
+    try:
+        # The stored upload is decoded once, by whichever process runs the detection
+        with open(os.path.join(settings.MEDIA_ROOT, job.image_path), 'rb') as image_file:
+            detection_results = detect(image_file.read(), job.growth_stage)
+    except Exception as e:
+        logger.error(f"Detection job {job_id} failed: {e}")
+        finished = still_leased.update(status=DetectionJob.FAILED, error=str(e), finished_at=timezone.now())
+    else:
+        with transaction.atomic():
+            detection = DetectionData.objects.create(
+                timestamp=timezone.now(),
+                total_detections=len(detection_results.get('detections', [])),
+                class_counts=detection_results.get('class_counts', {}),
+                growth_stage=job.growth_stage,
+                image_path=job.image_path,
+                model_version=detection_results.get('model_version', ''),
+                status='Completed'
+            )
+            finished = still_leased.update(status=DetectionJob.COMPLETED, result=detection_results,
+                                           detection=detection, finished_at=timezone.now())
+            if not finished:
+                # Drop the detection so the job is only recorded once
+                transaction.set_rollback(True)
+        if finished:
+            logger.info(f"Detection job {job_id} completed: {detection_results['total_detections']} objects found")
+
+    if not finished:
+        logger.warning(f"Detection job {job_id} was taken over by another process, discarding this result")
+
+
+def _worker():
+    while True:
+        job_id = _queue.get()
+        try:
+            _process_job(job_id)
+        except Exception as e:
+            logger.error(f"Unexpected error in detection worker: {e}")
+        finally:
+            close_old_connections()
+            _queue.task_done()
+
+
+def _adopt_expired():
+    """
+    Take over jobs left queued or running by a process that stopped renewing their lease
+    Each job is taken over by exactly one process: the conditional update only
+    succeeds for the first process that sees the expired lease
+    """
+    expired = timezone.now() - timedelta(seconds=JOB_LEASE_SECONDS)
+    orphaned = DetectionJob.objects.filter(
+        Q(lease_at__lt=expired) | Q(lease_at__isnull=True),
+        status__in=[DetectionJob.QUEUED, DetectionJob.RUNNING],
+    ).exclude(worker=_worker_id).order_by('created_at').values_list('id', 'worker', 'lease_at')
+    adopted = 0
+    for job_id, worker, lease_at in orphaned:
+        if _queue.full():
+            # Leave the rest for a process with room; they stay expired
+            break
+        # Interrupted mid-inference jobs are run again
+        taken = DetectionJob.objects.filter(
+            id=job_id, worker=worker, lease_at=lease_at, status__in=[DetectionJob.QUEUED, DetectionJob.RUNNING]
+        ).update(
+            status=DetectionJob.QUEUED, started_at=None, worker=_worker_id, lease_at=timezone.now()
+        )
+        if not taken:
+            continue
+        try:
+            _queue.put_nowait(job_id)
+            adopted += 1
+        except queue.Full:
+            # Give it back by leaving the lease expired
+            DetectionJob.objects.filter(id=job_id, worker=_worker_id).update(lease_at=expired)
+            break
+    if adopted:
+        logger.info(f"Took over {adopted} detection jobs from stopped processes")
+
+
+def _renew_leases():
+    """Keep this process's jobs leased and take over jobs of processes that are gone"""
+    while True:
+        try:
+            DetectionJob.objects.filter(
+                worker=_worker_id, status__in=[DetectionJob.QUEUED, DetectionJob.RUNNING]
+            ).update(lease_at=timezone.now())
+            _adopt_expired()
+        except Exception as e:
+            logger.error(f"Error renewing detection job leases: {e}")
+        finally:
+            close_old_connections()
+        time.sleep(JOB_LEASE_RENEW_SECONDS)
+
+
+def start_workers():
+    """Start the detection worker threads and the lease thread once per process"""
+    global _queue, _worker_id
+    with _start_lock:
+        if _queue is not None:
+            return
+        _worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        _queue = queue.Queue(maxsize=getattr(settings, 'DETECTION_QUEUE_SIZE', DETECTION_QUEUE_SIZE))
+        # Threads only wait on the detection processes, so keep at least one per process
+        threads = max(getattr(settings, 'DETECTION_WORKERS', DETECTION_WORKERS), getattr(settings, 'DETECTION_PROCESSES', 0))
+        for i in range(threads):
+            worker = threading.Thread(target=_worker, name=f'detection-worker-{i}', daemon=True)
+            worker.start()
+            _workers.append(worker)
+        threading.Thread(target=_renew_leases, name='detection-leases', daemon=True).start()
+        logger.info(f"Started {len(_workers)} detection workers")
+
+
+def submit_job(image_path, growth_stage):
+    """
+    Create a detection job and queue it
+    Args:
+        image_path: Saved upload, relative to MEDIA_ROOT
+        growth_stage: Growth stage selected by the user
+    Returns:
+        DetectionJob
+    Raises:
+        QueueFull: If the queue is at capacity; no job is created
+    """
+    start_workers()
+    if _queue.full():
+        raise QueueFull()
+    job = DetectionJob.objects.create(image_path=image_path, growth_stage=growth_stage,
+                                      worker=_worker_id, lease_at=timezone.now())
+    try:
+        _queue.put_nowait(job.id)
+    except queue.Full:
+        job.delete()
+        raise QueueFull()
+    return job
+
+
+def detection_queue_full():
+    """Whether a new upload would be refused"""
+    start_workers()
+    return _queue.full()
+
+
+def queue_depth():
+    """Number of jobs waiting in this process's queue"""
+    return _queue.qsize() if _queue is not None else 0
+
+
+def job_payload(job):
+    """JSON shape of a job for the polling endpoint"""
+    data = {
+        'job_id': job.id,
+        'status': job.status,
+        'growth_stage': job.growth_stage,
+        'image_path': job.image_path,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+    }
+    if job.status == DetectionJob.COMPLETED:
+        data.update({
+            'success': True,
+            'detection_results': job.result,
+            'detection_id': job.detection_id,
+        })
+    elif job.status == DetectionJob.FAILED:
+        data.update({'success': False, 'error': job.error})
+    else:
+        data['queue_depth'] = queue_depth()
+    return data
@@ -0,0 +1,64 @@
+# type: ignore
+import glob
+import os
+import time
+import cv2
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from dashboard.executor import DetectionExecutor
+
+
+class Command(BaseCommand):
+    help = 'Measure detection throughput of the process pool for increasing process counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', default=None,
+                            help='Comma-separated process counts (default: 1, 2, 4 ... up to the core count)')
+        parser.add_argument('--images', type=int, default=16, help='Detections per run')
+        parser.add_argument('--image', default=None,
+                            help='Image to detect on (default: uploads in MEDIA_ROOT/detections, else a noise frame)')
+
+    def _load_images(self, path, count):
+        paths = [path] if path else sorted(glob.glob(os.path.join(settings.MEDIA_ROOT, 'detections', '*.jpg')))
+        images = [image for image in (cv2.imread(p) for p in paths[:count]) if image is not None]
+        if not images:
+            images = [np.random.default_rng(0).integers(0, 255, (1080, 1920, 3), dtype=np.uint8)]
+        return [images[i % len(images)] for i in range(count)]
+
+    def handle(self, *args, **options):
+        cores = os.cpu_count() or 1
+        if options['processes']:
+            counts = [int(count) for count in options['processes'].split(',')]
+        else:
+            counts = sorted({1, cores} | {2 ** i for i in range(1, cores.bit_length()) if 2 ** i <= cores})
+        images = self._load_images(options['image'], options['images'])
+
+        self.stdout.write(f'{len(images)} detections per run on {cores} cores')
+        self.stdout.write(f'{"processes":>10}{"startup s":>11}{"seconds":>10}{"images/s":>10}{"speedup":>9}{"efficiency":>12}')
+
+        baseline = None
+        for processes in counts:
+            start = time.perf_counter()
+            executor = DetectionExecutor(processes).start()
+            startup = time.perf_counter() - start
+            try:
+                # Warm every session before timing
+                for future in [executor.submit(image) for image in images[:processes]]:
+                    future.result()
+                start = time.perf_counter()
+                for future in [executor.submit(image) for image in images]:
+                    future.result()
+                elapsed = time.perf_counter() - start
+                unhealthy = [worker['index'] for worker in executor.health() if not worker['alive']]
+            finally:
+                executor.shutdown()
+
+            throughput = len(images) / elapsed
+            baseline = baseline or throughput
+            speedup = throughput / baseline
+            self.stdout.write(
+                f'{processes:>10}{startup:>11.2f}{elapsed:>10.2f}{throughput:>10.2f}{speedup:>8.2f}x{speedup / processes:>11.0%}'
+            )
+            if unhealthy:
+                self.stdout.write(self.style.WARNING(f'  workers not alive after the run: {unhealthy}'))
@@ -0,0 +1,48 @@
+# type: ignore
+import time
+from django.core.management.base import BaseCommand
+from dashboard.exports import EXPORT_FORMATS, EXPORT_CHUNK_SIZE, PYARROW_AVAILABLE, iter_export
+from dashboard.views import DATA_TYPE_MODELS
+
+
+class Command(BaseCommand):
+    help = 'Benchmark export throughput and size for each export format against CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', choices=sorted(DATA_TYPE_MODELS), default='sensor', help='Data type to export')
+        parser.add_argument('--rows', type=int, default=None, help='Limit the number of exported rows')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE, help='Rows per chunk')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per format (best time is reported)')
+
+    def handle(self, *args, **options):
+        data_type = options['type']
+        queryset = DATA_TYPE_MODELS[data_type].objects.order_by('-timestamp', '-id')
+        if options['rows']:
+            queryset = queryset[:options['rows']]
+        row_count = queryset.count()
+
+        if not row_count:
+            self.stdout.write(self.style.WARNING(f'No {data_type} data to export'))
+            return
+
+        self.stdout.write(f'Exporting {row_count} {data_type} rows, chunk size {options["chunk_size"]}')
+        self.stdout.write(f'{"format":<10}{"seconds":>10}{"rows/s":>12}{"bytes":>14}{"vs csv":>10}')
+
+        csv_size = None
+        for name, export_format in EXPORT_FORMATS.items():
+            if export_format[4] and not PYARROW_AVAILABLE:
+                self.stdout.write(self.style.WARNING(f'{name:<10}skipped (pyarrow not installed)'))
+                continue
+
+            best = None
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                size = sum(len(chunk) for chunk in iter_export(queryset, data_type, name, options['chunk_size']))
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+
+            if csv_size is None:
+                csv_size = size
+            self.stdout.write(
+                f'{name:<10}{best:>10.3f}{row_count / best:>12.0f}{size:>14}{size / csv_size:>9.2f}x'
+            )
@@ -0,0 +1,57 @@
+# type: ignore
+import json
+import time
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.utils import timezone
+from dashboard import views
+from dashboard.series import build_series
+from dashboard.responses import ORJSON_AVAILABLE, DashboardJSONEncoder, dumps
+
+
+class Command(BaseCommand):
+    help = 'Microbenchmark JSON encoding of the statistics, history and series API payloads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=365, help='Period for the detection statistics payload')
+        parser.add_argument('--iterations', type=int, default=200, help='Encodes per payload and encoder')
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        user = User(username='benchmark', is_active=True)
+
+        def payload(view, path):
+            request = factory.get(path)
+            request.user = user
+            return json.loads(view(request).content)
+
+        payloads = {
+            'statistics': payload(views.get_detection_statistics, f'/api/detection-statistics/?days={options["days"]}'),
+            'history': payload(views.get_detection_history, '/api/detection-history/'),
+        }
+        # The series payload is benchmarked as built, with NumPy arrays
+        end = timezone.now()
+        payloads['series'] = build_series('temperature', end - timedelta(days=options['days']), end)
+
+        encoders = [('stdlib', lambda data: json.dumps(data, cls=DashboardJSONEncoder).encode('utf-8'))]
+        if ORJSON_AVAILABLE:
+            encoders.append(('orjson', dumps))
+        else:
+            self.stdout.write(self.style.WARNING('orjson not installed, only the stdlib encoder is measured'))
+
+        iterations = options['iterations']
+        self.stdout.write(f'{"payload":<12}{"encoder":<10}{"bytes":>10}{"us/encode":>12}{"speedup":>10}')
+        for name, data in payloads.items():
+            baseline = None
+            for encoder_name, encode in encoders:
+                size = len(encode(data))
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    encode(data)
+                per_call = (time.perf_counter() - start) / iterations * 1e6
+                baseline = baseline or per_call
+                self.stdout.write(
+                    f'{name:<12}{encoder_name:<10}{size:>10}{per_call:>12.1f}{baseline / per_call:>9.1f}x'
+                )
@@ -0,0 +1,14 @@
+# type: ignore
+from django.core.management.base import BaseCommand
+from dashboard.counts import COUNTED_MODELS, rebuild_daily_counts
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-day row counters behind the data log totals (after bulk imports or raw SQL deletes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', choices=sorted(COUNTED_MODELS), action='append', help='Only rebuild this data type')
+
+    def handle(self, *args, **options):
+        written = rebuild_daily_counts(options['type'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} daily row counters'))
@@ -0,0 +1,237 @@
+# type: ignore
+import glob
+import json
+import os
+import time
+import cv2
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from dashboard import yolo_detector
+from dashboard.model_registry import get_registry
+from dashboard.yolo_detector import (
+    CONFIDENCE_THRESHOLD, SLICE_SIZE, SLICE_OVERLAP, BatchedSliceEngine, model_version, slice_profile_path,
+)
+
+IMAGE_PATTERNS = ('*.jpg', '*.jpeg', '*.png', '*.bmp', '*.webp')
+MATCH_IOU = 0.5
+
+
+def _parse_list(value, cast):
+    return [cast(part) for part in value.split(',') if part.strip()]
+
+
+def _load_labels(image_path, width, height, class_names):
+    """
+    YOLO-format labels next to the image (class cx cy w h, normalized), if any
+    Returns:
+        list of (class name, [x1, y1, x2, y2]) in pixels of the 1080p frame, or None
+    """
+    label_path = os.path.splitext(image_path)[0] + '.txt'
+    if not os.path.exists(label_path):
+        return None
+    labels = []
+    with open(label_path) as label_file:
+        for line in label_file:
+            parts = line.split()
+            if len(parts) < 5:
+                continue
+            class_id = int(parts[0])
+            cx, cy, w, h = (float(value) for value in parts[1:5])
+            labels.append((class_names.get(class_id, str(class_id)), [
+                (cx - w / 2) * width, (cy - h / 2) * height, (cx + w / 2) * width, (cy + h / 2) * height,
+            ]))
+    return labels
+
+
+def _box_arrays(objects):
+    """(class name, box) pairs as a class array and an (n, 4) box array"""
+    if not objects:
+        return np.empty(0, dtype=object), np.empty((0, 4))
+    names, boxes = zip(*objects)
+    return np.asarray(names, dtype=object), np.asarray(boxes, dtype=np.float64)
+
+
+def _matched(reference, candidate):
+    """Number of reference boxes matched one-to-one by a same-class candidate at IoU >= MATCH_IOU"""
+    ref_classes, ref_boxes = _box_arrays(reference)
+    cand_classes, cand_boxes = _box_arrays(candidate)
+    if not len(ref_boxes) or not len(cand_boxes):
+        return 0
+    top_left = np.maximum(ref_boxes[:, None, :2], cand_boxes[None, :, :2])
+    bottom_right = np.minimum(ref_boxes[:, None, 2:], cand_boxes[None, :, 2:])
+    intersection = np.clip(bottom_right - top_left, 0, None).prod(axis=2)
+    ref_area = (ref_boxes[:, 2:] - ref_boxes[:, :2]).prod(axis=1)
+    cand_area = (cand_boxes[:, 2:] - cand_boxes[:, :2]).prod(axis=1)
+    iou = intersection / (ref_area[:, None] + cand_area[None, :] - intersection)
+    iou[ref_classes[:, None] != cand_classes[None, :]] = 0
+
+    # Greedy matching, best pairs first
+    matched, used_ref, used_cand = 0, set(), set()
+    for flat in np.argsort(iou, axis=None)[::-1]:
+        i, j = np.unravel_index(flat, iou.shape)
+        if iou[i, j] < MATCH_IOU:
+            break
+        if i in used_ref or j in used_cand:
+            continue
+        used_ref.add(i)
+        used_cand.add(j)
+        matched += 1
+    return matched
+
+
+def _count_agreement(reference, candidate):
+    """Share of per-class counts two detections agree on (1.0 when identical)"""
+    ref_counts, cand_counts = {}, {}
+    for name, _ in reference:
+        ref_counts[name] = ref_counts.get(name, 0) + 1
+    for name, _ in candidate:
+        cand_counts[name] = cand_counts.get(name, 0) + 1
+    total = max(len(reference), len(candidate))
+    if not total:
+        return 1.0
+    return sum(min(count, cand_counts.get(name, 0)) for name, count in ref_counts.items()) / total
+
+
+class Command(BaseCommand):
+    help = ('Sweep SAHI slice size and overlap over an image set, measure latency, count agreement and '
+            'recall against a reference config, and write the chosen slice profile')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--images', default=None,
+                            help='Image directory (default MEDIA_ROOT/detections); YOLO .txt labels next to '
+                                 'the images are used as ground truth when present')
+        parser.add_argument('--limit', type=int, default=50, help='Maximum number of images')
+        parser.add_argument('--model', default=None, help='ONNX model (default: the registry default model)')
+        parser.add_argument('--sizes', default='512,640,800,960', help='Comma-separated slice sizes')
+        parser.add_argument('--overlaps', default='0.1,0.2,0.3,0.5', help='Comma-separated overlap ratios')
+        parser.add_argument('--reference', default=f'{SLICE_SIZE}:{SLICE_OVERLAP}',
+                            help='Reference config as size:overlap, used when images have no labels')
+        parser.add_argument('--min-recall', type=float, default=0.95, help='Recall the chosen config must reach')
+        parser.add_argument('--min-agreement', type=float, default=0.95,
+                            help='Count agreement the chosen config must reach')
+        parser.add_argument('--repeat', type=int, default=1, help='Timed runs per image (best is kept)')
+        parser.add_argument('--output', default=None, help='Profile file (default: the profile the detector reads)')
+        parser.add_argument('--dry-run', action='store_true', help='Report without writing the profile')
+
+    def _load_images(self, directory, limit):
+        paths = sorted(path for pattern in IMAGE_PATTERNS for path in glob.glob(os.path.join(directory, pattern)))
+        images = []
+        for path in paths[:limit]:
+            image = cv2.imread(path)
+            if image is None:
+                continue
+            # The detector runs on 1080p frames
+            image = cv2.resize(image, (1920, 1080), interpolation=cv2.INTER_LANCZOS4)
+            images.append((path, cv2.cvtColor(image, cv2.COLOR_BGR2RGB)))
+        return images
+
+    def _run(self, engine, images, slice_size, overlap, repeat):
+        """Detections and best latency per image for one slice geometry"""
+        engine.slice_size, engine.slice_overlap = slice_size, overlap
+        detections, latencies = [], []
+        for _, image in images:
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                boxes, _, class_ids, _ = engine.predict(image)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            latencies.append(best)
+            detections.append([(engine.class_names.get(class_id, str(class_id)), box)
+                               for class_id, box in zip(class_ids.tolist(), boxes.tolist())])
+        return detections, latencies
+
+    def handle(self, *args, **options):
+        if not yolo_detector.ONNXRUNTIME_AVAILABLE:
+            raise CommandError('Slice tuning needs onnxruntime installed')
+        model_path = options['model'] or get_registry().resolve().path
+        if not os.path.exists(model_path):
+            raise CommandError(f'Model not found: {model_path}')
+
+        directory = options['images'] or os.path.join(settings.MEDIA_ROOT, 'detections')
+        images = self._load_images(directory, options['limit'])
+        if not images:
+            raise CommandError(f'No images found in {directory}')
+
+        try:
+            sizes = _parse_list(options['sizes'], int)
+            overlaps = _parse_list(options['overlaps'], float)
+            ref_size, ref_overlap = options['reference'].split(':')
+            reference_config = (int(ref_size), float(ref_overlap))
+        except ValueError as e:
+            raise CommandError(f'Invalid sweep arguments: {e}')
+
+        # The prefilter would make results depend on its threshold, tune the geometry without it
+        engine = BatchedSliceEngine(model_path, confidence_threshold=CONFIDENCE_THRESHOLD)
+        engine.prefilter_method = None
+        height, width = images[0][1].shape[:2]
+        labels = [_load_labels(path, width, height, engine.class_names) for path, _ in images]
+        labeled = all(image_labels is not None for image_labels in labels)
+
+        # Warm the session so the first config is not charged for it
+        engine.predict(images[0][1])
+        reference, reference_latencies = self._run(engine, images, *reference_config, options['repeat'])
+        truth = labels if labeled else reference
+        self.stdout.write(
+            f'{len(images)} images from {directory}, recall against '
+            f'{"labels" if labeled else f"reference {reference_config[0]}px at {reference_config[1]} overlap"}'
+        )
+        self.stdout.write(f'{"size":>6}{"overlap":>9}{"slices":>8}{"ms/image":>10}{"vs ref":>8}'
+                          f'{"recall":>8}{"agreement":>11}')
+
+        results = []
+        for slice_size in sizes:
+            for overlap in overlaps:
+                if (slice_size, overlap) == reference_config:
+                    detections, latencies = reference, reference_latencies
+                else:
+                    detections, latencies = self._run(engine, images, slice_size, overlap, options['repeat'])
+                total_truth = sum(len(objects) for objects in truth)
+                matched = sum(_matched(expected, found) for expected, found in zip(truth, detections))
+                result = {
+                    'slice_size': slice_size,
+                    'overlap': overlap,
+                    'slices': len(yolo_detector.slice_boxes(height, width, slice_size, slice_size, overlap, overlap)),
+                    'latency_ms': round(float(np.mean(latencies)) * 1000, 1),
+                    'recall': round(matched / total_truth, 4) if total_truth else 1.0,
+                    'count_agreement': round(float(np.mean([
+                        _count_agreement(expected, found) for expected, found in zip(truth, detections)
+                    ])), 4),
+                }
+                results.append(result)
+                speedup = float(np.mean(reference_latencies)) * 1000 / result['latency_ms']
+                self.stdout.write(
+                    f'{slice_size:>6}{overlap:>9.2f}{result["slices"]:>8}{result["latency_ms"]:>10.1f}'
+                    f'{speedup:>7.2f}x{result["recall"]:>8.3f}{result["count_agreement"]:>11.3f}'
+                )
+
+        acceptable = [result for result in results
+                      if result['recall'] >= options['min_recall'] and result['count_agreement'] >= options['min_agreement']]
+        if not acceptable:
+            self.stdout.write(self.style.WARNING('No config reaches the recall and agreement targets, keeping the reference'))
+            chosen = {'slice_size': reference_config[0], 'overlap': reference_config[1]}
+        else:
+            chosen = min(acceptable, key=lambda result: result['latency_ms'])
+        self.stdout.write(self.style.SUCCESS(f'Chosen: {chosen["slice_size"]}px slices at {chosen["overlap"]} overlap'))
+
+        if options['dry_run']:
+            return
+        output = options['output'] or slice_profile_path()
+        profile = {
+            'slice_size': chosen['slice_size'],
+            'overlap': chosen['overlap'],
+            'model_version': model_version(model_path),
+            'tuned_at': timezone.now().isoformat(),
+            'images': len(images),
+            'ground_truth': 'labels' if labeled else 'reference',
+            'reference': {'slice_size': reference_config[0], 'overlap': reference_config[1]},
+            'min_recall': options['min_recall'],
+            'min_agreement': options['min_agreement'],
+            'results': results,
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as profile_file:
+            json.dump(profile, profile_file, indent=2)
+        self.stdout.write(f'Wrote {output}; detection processes pick it up when they next load the model')
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.3 on 2026-10-19 00:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0010_add_image_path_to_detection_data'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='detectiondata',
+            index=models.Index(fields=['-timestamp', '-id'], name='dashboard_d_timesta_47465a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sensordata',
+            index=models.Index(fields=['-timestamp', '-id'], name='dashboard_s_timesta_b13f88_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='systemdata',
+            index=models.Index(fields=['-timestamp', '-id'], name='dashboard_s_timesta_bdc888_idx'),
+        ),
+    ]
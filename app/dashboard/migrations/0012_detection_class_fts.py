@@ -0,0 +1,62 @@
+from django.db import migrations
+import logging
+
+logger = logging.getLogger(__name__)
+
+CLASS_NAMES_SQL = "(SELECT group_concat(key, ' ') FROM json_each({}.class_counts) WHERE value > 0)"
+
+CREATE_SQL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS dashboard_detectiondata_fts USING fts5(class_names)",
+    "INSERT INTO dashboard_detectiondata_fts(rowid, class_names) "
+    "SELECT id, " + CLASS_NAMES_SQL.format('dashboard_detectiondata') + " FROM dashboard_detectiondata",
+    "CREATE TRIGGER IF NOT EXISTS dashboard_detectiondata_fts_insert AFTER INSERT ON dashboard_detectiondata BEGIN "
+    "INSERT INTO dashboard_detectiondata_fts(rowid, class_names) VALUES (NEW.id, " + CLASS_NAMES_SQL.format('NEW') + "); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS dashboard_detectiondata_fts_update AFTER UPDATE OF class_counts ON dashboard_detectiondata BEGIN "
+    "UPDATE dashboard_detectiondata_fts SET class_names = " + CLASS_NAMES_SQL.format('NEW') + " WHERE rowid = NEW.id; "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS dashboard_detectiondata_fts_delete AFTER DELETE ON dashboard_detectiondata BEGIN "
+    "DELETE FROM dashboard_detectiondata_fts WHERE rowid = OLD.id; "
+    "END",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS dashboard_detectiondata_fts_insert",
+    "DROP TRIGGER IF EXISTS dashboard_detectiondata_fts_update",
+    "DROP TRIGGER IF EXISTS dashboard_detectiondata_fts_delete",
+    "DROP TABLE IF EXISTS dashboard_detectiondata_fts",
+]
+
+
+def create_detection_fts(apps, schema_editor):
+    """Create the FTS5 class name index on SQLite; other databases use JSON key lookups"""
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        try:
+            for sql in CREATE_SQL:
+                cursor.execute(sql)
+        except Exception as e:
+            # SQLite built without FTS5: search falls back to JSON key lookups
+            logger.warning(f"Could not create detection FTS index: {e}")
+
+
+def drop_detection_fts(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for sql in DROP_SQL:
+            cursor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0011_add_timestamp_id_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_detection_fts, drop_detection_fts),
+    ]
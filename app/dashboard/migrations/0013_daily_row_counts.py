@@ -0,0 +1,46 @@
+# Generated by Django 5.2.3 on 2026-10-19 00:47
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_row_counts(apps, schema_editor):
+    """Seed the counters; sensor and detection rows are counted once per timestamp"""
+    DailyRowCount = apps.get_model('dashboard', 'DailyRowCount')
+    sources = [
+        ('sensor', 'SensorData', Count('timestamp', distinct=True)),
+        ('system', 'SystemData', Count('id')),
+        ('detection', 'DetectionData', Count('timestamp', distinct=True)),
+    ]
+    for data_type, model_name, counted in sources:
+        model = apps.get_model('dashboard', model_name)
+        days = model.objects.order_by().annotate(day=TruncDate('timestamp')).values('day').annotate(rows=counted)
+        DailyRowCount.objects.bulk_create([
+            DailyRowCount(data_type=data_type, day=entry['day'], rows=entry['rows'])
+            for entry in days if entry['day'] is not None
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0012_detection_class_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRowCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_type', models.CharField(help_text='Data log type: sensor, system or detection', max_length=20)),
+                ('day', models.DateField(help_text='Local (TIME_ZONE) calendar day')),
+                ('rows', models.IntegerField(default=0, help_text='Rows shown in the data log for this day')),
+            ],
+            options={
+                'ordering': ['data_type', 'day'],
+                'unique_together': {('data_type', 'day')},
+            },
+        ),
+        migrations.RunPython(backfill_daily_row_counts, migrations.RunPython.noop),
+    ]
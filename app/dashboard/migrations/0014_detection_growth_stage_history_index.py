@@ -0,0 +1,21 @@
+# Generated by Django 5.2.3 on 2026-10-19 00:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0013_daily_row_counts'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='detectiondata',
+            name='dashboard_d_growth__ceb986_idx',
+        ),
+        migrations.AddIndex(
+            model_name='detectiondata',
+            index=models.Index(fields=['growth_stage', '-timestamp', '-id'], name='dashboard_d_growth__2d0236_idx'),
+        ),
+    ]
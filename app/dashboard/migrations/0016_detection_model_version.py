@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-19 01:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0015_detection_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detectiondata',
+            name='model_version',
+            field=models.CharField(blank=True, default='', help_text='Registry model (name@version) that produced the detection', max_length=100),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.3 on 2026-10-19 01:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0016_detection_model_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detectionjob',
+            name='lease_at',
+            field=models.DateTimeField(blank=True, help_text='Last lease renewal by the worker', null=True),
+        ),
+        migrations.AddField(
+            model_name='detectionjob',
+            name='worker',
+            field=models.CharField(blank=True, default='', help_text='Process holding the job', max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='detectionjob',
+            index=models.Index(fields=['worker', 'status'], name='dashboard_d_worker_234b98_idx'),
+        ),
+    ]
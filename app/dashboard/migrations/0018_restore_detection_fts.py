@@ -0,0 +1,34 @@
+from importlib import import_module
+from django.db import migrations
+
+detection_fts = import_module('dashboard.migrations.0012_detection_class_fts')
+
+FTS_TABLE = 'dashboard_detectiondata_fts'
+
+
+def restore_detection_fts(apps, schema_editor):
+    """
+    Rebuild the FTS5 class name index and its triggers
+    SQLite remakes dashboard_detectiondata to add model_version (0016), which drops
+    the triggers keeping the index in sync; rows saved since then are missing from it
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    if FTS_TABLE not in connection.introspection.table_names():
+        # Never created (SQLite without FTS5): search uses JSON key lookups
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+    detection_fts.create_detection_fts(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0017_detection_job_lease'),
+    ]
+
+    operations = [
+        migrations.RunPython(restore_detection_fts, migrations.RunPython.noop),
+    ]
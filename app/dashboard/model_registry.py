@@ -0,0 +1,266 @@
+# type: ignore
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_NAME = 'registry.json'
+# Defaults, overridable with settings.DETECTION_MODEL_PATH / settings.DETECTION_MODEL_MEMORY_MB
+DEFAULT_MODEL_PATH = os.path.join('dashboard', 'models', 'best.onnx')
+MODEL_MEMORY_MB = 1024
+# Seconds between checks of the manifest and model files for changes
+REFRESH_SECONDS = 5
+
+
+class ModelEntry(namedtuple('ModelEntry', ['name', 'version', 'path', 'growth_stages', 'fingerprint'])):
+    """
+    One registered model file and the growth stages it serves (empty: all of them)
+    fingerprint is the file's model_version when the registry last checked it, or None if missing
+    """
+    __slots__ = ()
+
+    @property
+    def label(self):
+        """name@version, as recorded on each detection"""
+        return f'{self.name}@{self.version}'
+
+
+def registry_path():
+    """Registry manifest (settings.DETECTION_MODEL_REGISTRY, default models/registry.json)"""
+    return str(getattr(settings, 'DETECTION_MODEL_REGISTRY', None) or
+               os.path.join(settings.BASE_DIR, 'models', REGISTRY_NAME))
+
+
+def default_model_path():
+    """Model used when there is no registry manifest (settings.DETECTION_MODEL_PATH)"""
+    return str(getattr(settings, 'DETECTION_MODEL_PATH', None) or os.path.join(settings.BASE_DIR, DEFAULT_MODEL_PATH))
+
+
+def _default_entry(path=None):
+    """Registry entry for a single model file, named after it and versioned by its mtime and size"""
+    from .yolo_detector import model_version
+    path = path or default_model_path()
+    fingerprint = model_version(path)
+    return ModelEntry(os.path.splitext(os.path.basename(path))[0],
+                      fingerprint.split(':', 1)[1] if fingerprint else 'missing', path, (), fingerprint)
+
+
+def _parse_manifest(path):
+    """
+    Read the registry manifest
+    {"default": "padi", "models": [{"name": "padi", "version": "3", "path": "padi-v3.onnx",
+                                    "growth_stages": ["Vegetatif", "Generatif"]}, ...]}
+    Model paths are relative to the manifest. Entries without a version are versioned
+    by the model file, and entries without growth stages serve every stage.
+    Returns:
+        tuple: (entries, default entry)
+    """
+    with open(path) as manifest_file:
+        manifest = json.load(manifest_file)
+    base = os.path.dirname(os.path.abspath(path))
+    entries = []
+    for model in manifest['models']:
+        model_path = os.path.join(base, model['path'])
+        entry = _default_entry(model_path)
+        entries.append(entry._replace(
+            name=str(model.get('name') or entry.name),
+            version=str(model['version']) if model.get('version') is not None else entry.version,
+            growth_stages=tuple(model.get('growth_stages') or ()),
+        ))
+    if not entries:
+        raise ValueError('no models listed')
+    default_name = manifest.get('default')
+    default = next((entry for entry in entries if entry.name == default_name), None)
+    if default_name and default is None:
+        raise ValueError(f'default model {default_name!r} is not listed')
+    return entries, default or entries[0]
+
+
+class ModelRegistry:
+    """
+    Detection models keyed by name, version and growth stage
+    Models are loaded on first use and kept in an LRU bounded by the size of their
+    files. Editing the manifest, or replacing a model file, takes effect within
+    refresh_seconds without a restart: detections already running keep the detector
+    they started with, and models no longer in the manifest are dropped once unused.
+    """
+
+    def __init__(self, manifest_path=None, max_bytes=MODEL_MEMORY_MB * 1024 * 1024, refresh_seconds=REFRESH_SECONDS):
+        self.manifest_path = manifest_path
+        self.max_bytes = max_bytes
+        self.refresh_seconds = refresh_seconds
+        self._entries, self._default = [], None
+        self._manifest_mtime = None
+        self._checked_at = None
+        self._loaded = OrderedDict()  # load key -> (entry, detector, size in bytes)
+        self._lock = threading.Lock()
+        self._loading = {}  # load key -> lock held while that model loads
+        self.stats = {'loads': 0, 'hits': 0, 'evictions': 0, 'swaps': 0}
+
+    def _refresh(self):
+        """Re-read the manifest when it or one of its model files changed (caller holds the lock)"""
+        from .yolo_detector import model_version
+        # Detections only stat the manifest and model files every refresh_seconds
+        now = time.monotonic()
+        if self._entries and now - self._checked_at < self.refresh_seconds:
+            return
+        self._checked_at = now
+        path = self.manifest_path or registry_path()
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            mtime = None
+        if (self._entries and mtime == self._manifest_mtime and
+                all(model_version(entry.path) == entry.fingerprint for entry in self._entries)):
+            return
+
+        if mtime is None:
+            # No manifest: the single configured model
+            entries, default = [_default_entry()], None
+        else:
+            try:
+                entries, default = _parse_manifest(path)
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.error(f"Invalid model registry {path}, keeping the current models: {e}")
+                entries, default = (self._entries, self._default) if self._entries else ([_default_entry()], None)
+
+        if self._entries and entries != self._entries:
+            self.stats['swaps'] += 1
+            logger.info(f"Model registry changed: {', '.join(entry.label for entry in entries)}")
+        self._entries, self._default = entries, default or entries[0]
+        self._manifest_mtime = mtime
+        # Models taken out of the registry are released; running detections hold their own reference
+        current = {self._load_key(entry) for entry in entries}
+        for key in [key for key in self._loaded if key not in current]:
+            del self._loaded[key]
+
+    @staticmethod
+    def _load_key(entry):
+        # The file fingerprint reloads a model replaced in place under the same version
+        return entry.name, entry.version, entry.fingerprint
+
+    def entries(self):
+        with self._lock:
+            self._refresh()
+            return list(self._entries)
+
+    def resolve(self, growth_stage=None):
+        """
+        Model for a growth stage
+        Args:
+            growth_stage: Growth stage selected by the user, or None for the default model
+        Returns:
+            ModelEntry: the first listed model serving that stage, else the default one
+        """
+        with self._lock:
+            self._refresh()
+            if growth_stage:
+                for entry in self._entries:
+                    if growth_stage in entry.growth_stages:
+                        return entry
+            return self._default
+
+    def _evict(self, keep):
+        """Drop least recently used models until under max_bytes (caller holds the lock)"""
+        total = sum(size for _, _, size in self._loaded.values())
+        for key in list(self._loaded):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            entry, _, size = self._loaded.pop(key)
+            total -= size
+            self.stats['evictions'] += 1
+            logger.info(f"Unloaded model {entry.label} to stay within the model memory limit")
+
+    def get_detector(self, entry):
+        """
+        Loaded detector for a registry entry, loading it on first use
+        Concurrent requests for a model that is loading wait for that one load
+        """
+        from .yolo_detector import SAHIDetector
+        key = self._load_key(entry)
+        with self._lock:
+            if key in self._loaded:
+                self._loaded.move_to_end(key)
+                self.stats['hits'] += 1
+                return self._loaded[key][1]
+            loading = self._loading.setdefault(key, threading.Lock())
+
+        with loading:
+            with self._lock:
+                if key in self._loaded:
+                    self._loaded.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return self._loaded[key][1]
+            try:
+                logger.info(f"Loading model {entry.label} from {entry.path}")
+                detector = SAHIDetector(entry.path)
+                # Model weights dominate the memory a loaded detector takes
+                size = os.path.getsize(entry.path) if os.path.exists(entry.path) else 0
+                with self._lock:
+                    self._loaded[key] = (entry, detector, size)
+                    self.stats['loads'] += 1
+                    self._evict(keep=key)
+            finally:
+                with self._lock:
+                    self._loading.pop(key, None)
+        return detector
+
+    def detector_for(self, growth_stage=None):
+        """
+        Returns:
+            tuple: (ModelEntry, detector) for a growth stage
+        """
+        entry = self.resolve(growth_stage)
+        return entry, self.get_detector(entry)
+
+    def detect(self, image, growth_stage=None, entry=None):
+        """
+        Detect pests with the model for a growth stage, or with a given registry entry
+        Args:
+            image: OpenCV image (numpy array)
+            growth_stage: Growth stage selected by the user
+            entry: ModelEntry resolved earlier (e.g. by the process that queued the image)
+        Returns:
+            dict: Detection results with the model_version that produced them
+        """
+        entry = entry or self.resolve(growth_stage)
+        results = self.get_detector(entry).detect(image)
+        if not results.get('simulated'):
+            results['model_version'] = entry.label
+        return results
+
+    def get_stats(self):
+        """Registered and loaded models with load, hit and eviction counts"""
+        with self._lock:
+            self._refresh()
+            return dict(
+                self.stats,
+                models=[{'name': entry.name, 'version': entry.version, 'growth_stages': list(entry.growth_stages),
+                         'default': entry == self._default} for entry in self._entries],
+                loaded=[entry.label for entry, _, _ in self._loaded.values()],
+                loaded_bytes=sum(size for _, _, size in self._loaded.values()),
+                max_bytes=self.max_bytes,
+            )
+
+
+# Global registry instance
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Get or create the model registry"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry(
+                max_bytes=getattr(settings, 'DETECTION_MODEL_MEMORY_MB', MODEL_MEMORY_MB) * 1024 * 1024
+            )
+    return _registry
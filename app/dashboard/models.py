@@ -7,6 +7,9 @@ import json
 
 logger = logging.getLogger(__name__)
 
+# Rice paddy growth stages offered on the detection page
+GROWTH_STAGES = ['Benih', 'Vegetatif', 'Generatif', 'Panen']
+
 class SensorData(models.Model):
     timestamp = models.DateTimeField(default=timezone.now)
     temperature = models.FloatField(null=True, blank=True)
@@ -26,6 +29,7 @@ class SensorData(models.Model):
         unique_together = ['timestamp', 'temperature', 'humidity', 'rainfall', 'thunder', 'pest_count']
         indexes = [
             models.Index(fields=['-timestamp']),
+            models.Index(fields=['-timestamp', '-id']),
             models.Index(fields=['status']),
         ]
     
@@ -141,6 +145,7 @@ class SystemData(models.Model):
         ordering = ['-timestamp']
         indexes = [
             models.Index(fields=['-timestamp']),
+            models.Index(fields=['-timestamp', '-id']),
             models.Index(fields=['status']),
         ]
     
@@ -233,14 +238,17 @@ class DetectionData(models.Model):
     latitude = models.FloatField(null=True, blank=True, help_text="Latitude where detection occurred")
     longitude = models.FloatField(null=True, blank=True, help_text="Longitude where detection occurred")
     status = models.CharField(max_length=20, default='Completed')
+    model_version = models.CharField(max_length=100, blank=True, default='',
+                                     help_text="Registry model (name@version) that produced the detection")
     
     class Meta:
         ordering = ['-timestamp']
         indexes = [
             models.Index(fields=['-timestamp']),
+            models.Index(fields=['-timestamp', '-id']),
             models.Index(fields=['total_detections']),
             models.Index(fields=['status']),
-            models.Index(fields=['growth_stage']),
+            models.Index(fields=['growth_stage', '-timestamp', '-id']),
         ]
     
     def __str__(self):
@@ -306,7 +314,7 @@ class DetectionData(models.Model):
             hourly_detections = detections.annotate(
                 hour=TruncHour('timestamp')
             ).values('hour').annotate(
-                total_detections=Count('id'),
+                detection_count=Count('id'),
                 total_pests=Sum('total_detections')
             ).order_by('hour')
             
@@ -314,7 +322,7 @@ class DetectionData(models.Model):
                 hour = hour_data['hour']
                 if hour:
                     daily_stats[hour] = {
-                        'total_detections': hour_data['total_detections'],
+                        'total_detections': hour_data['detection_count'],
                         'pest_count': hour_data['total_pests'] or 0,
                         'class_counts': {}
                     }
@@ -352,7 +360,7 @@ class DetectionData(models.Model):
             weekly_detections = detections.annotate(
                 week=TruncWeek('timestamp')
             ).values('week').annotate(
-                total_detections=Count('id'),
+                detection_count=Count('id'),
                 total_pests=Sum('total_detections')
             ).order_by('week')
             
@@ -360,7 +368,7 @@ class DetectionData(models.Model):
                 week = week_data['week']
                 if week:
                     daily_stats[week] = {
-                        'total_detections': week_data['total_detections'],
+                        'total_detections': week_data['detection_count'],
                         'pest_count': week_data['total_pests'] or 0,
                         'class_counts': {}
                     }
@@ -380,7 +388,7 @@ class DetectionData(models.Model):
             monthly_detections = detections.annotate(
                 month=TruncMonth('timestamp')
             ).values('month').annotate(
-                total_detections=Count('id'),
+                detection_count=Count('id'),
                 total_pests=Sum('total_detections')
             ).order_by('month')
             
@@ -388,7 +396,7 @@ class DetectionData(models.Model):
                 month = month_data['month']
                 if month:
                     daily_stats[month] = {
-                        'total_detections': month_data['total_detections'],
+                        'total_detections': month_data['detection_count'],
                         'pest_count': month_data['total_pests'] or 0,
                         'class_counts': {}
                     }
@@ -410,3 +418,54 @@ class DetectionData(models.Model):
             'daily_stats': daily_stats,
             'period_days': days
         }
+
+
+class DailyRowCount(models.Model):
+    """Per-table, per-day row counters used to show data log totals without a COUNT(*)"""
+    data_type = models.CharField(max_length=20, help_text="Data log type: sensor, system or detection")
+    day = models.DateField(help_text="Local (TIME_ZONE) calendar day")
+    rows = models.IntegerField(default=0, help_text="Rows shown in the data log for this day")
+
+    class Meta:
+        ordering = ['data_type', 'day']
+        unique_together = ['data_type', 'day']
+
+    def __str__(self):
+        return f"{self.data_type} {self.day}: {self.rows} rows"
+
+
+class DetectionJob(models.Model):
+    """Queued pest detection for an uploaded image, processed by the detection workers"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (COMPLETED, 'Completed'),
+        (FAILED, 'Failed'),
+    ]
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    growth_stage = models.CharField(max_length=50, default='Vegetatif', help_text="Rice paddy growth stage")
+    image_path = models.CharField(max_length=255, help_text="Uploaded image, relative to MEDIA_ROOT")
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True, help_text="Detection results once completed")
+    error = models.TextField(blank=True, default='')
+    detection = models.ForeignKey(DetectionData, null=True, blank=True, on_delete=models.SET_NULL, related_name='jobs')
+    # Lease: the process (host:pid) holding the job renews lease_at while it is queued or running there
+    worker = models.CharField(max_length=100, blank=True, default='', help_text="Process holding the job")
+    lease_at = models.DateTimeField(null=True, blank=True, help_text="Last lease renewal by the worker")
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['worker', 'status']),
+        ]
+
+    def __str__(self):
+        return f"Detection Job {self.id} - {self.status}"
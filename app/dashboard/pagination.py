@@ -0,0 +1,121 @@
+# type: ignore
+import base64
+import json
+import logging
+from django.db.models import Q, Exists, OuterRef
+from django.utils.dateparse import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidCursor(Exception):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+def encode_cursor(timestamp, pk, direction='next'):
+    """Encode a (timestamp, id) position into an opaque URL-safe cursor"""
+    payload = json.dumps({'t': timestamp.isoformat(), 'i': pk, 'd': direction}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor into (timestamp, id, direction)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        timestamp = parse_datetime(payload['t'])
+        pk = int(payload['i'])
+        direction = payload.get('d', 'next')
+    except (ValueError, KeyError, TypeError, UnicodeDecodeError) as e:
+        raise InvalidCursor(str(e))
+    if timestamp is None or direction not in ('next', 'prev'):
+        raise InvalidCursor(cursor)
+    return timestamp, pk, direction
+
+
+def latest_per_timestamp(queryset):
+    """
+    Keep only the newest row (highest id) for each timestamp within the queryset
+    Duplicates are looked up in the filtered queryset itself, so a row is not hidden
+    by a newer duplicate that the filters exclude
+    """
+    newer = queryset.filter(
+        timestamp=OuterRef('timestamp'),
+        id__gt=OuterRef('id')
+    )
+    return queryset.filter(~Exists(newer))
+
+
+class KeysetPage:
+    """A single page of keyset-paginated results"""
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Seek pagination over (timestamp, id), newest first
+    Every page is a bounded index range scan, so no COUNT(*) or OFFSET is needed
+    """
+
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset
+        self.per_page = per_page
+
+    def page(self, cursor=None):
+        """
+        Get the page starting after (or before) the given cursor
+        Args:
+            cursor: Opaque cursor from a previous page, or None for the first page
+        Returns:
+            KeysetPage
+        """
+        if cursor:
+            timestamp, pk, direction = decode_cursor(cursor)
+        else:
+            timestamp, pk, direction = None, None, 'next'
+
+        queryset = self.queryset
+        if direction == 'next':
+            if timestamp is not None:
+                queryset = queryset.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=pk))
+            rows = list(queryset.order_by('-timestamp', '-id')[:self.per_page + 1])
+            has_more = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_next = has_more
+            has_previous = timestamp is not None
+        else:
+            queryset = queryset.filter(Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, id__gt=pk))
+            rows = list(queryset.order_by('timestamp', 'id')[:self.per_page + 1])
+            has_more = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            has_next = True
+            has_previous = has_more
+
+        next_cursor = None
+        previous_cursor = None
+        if rows:
+            if has_next:
+                next_cursor = encode_cursor(rows[-1].timestamp, rows[-1].id, 'next')
+            if has_previous:
+                previous_cursor = encode_cursor(rows[0].timestamp, rows[0].id, 'prev')
+
+        return KeysetPage(rows, next_cursor, previous_cursor)
@@ -0,0 +1,125 @@
+# type: ignore
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# SAHI's cross-slice merge defaults: greedy NMM, intersection over the smaller box
+MERGE_MATCH_THRESHOLD = 0.5
+MERGE_MATCH_METRIC = 'IOS'
+
+
+def overlaps(box, boxes, metric=MERGE_MATCH_METRIC):
+    """
+    IoU or IoS of one xyxy box against (n, 4) boxes, in float32 like SAHI's numpy backend
+    """
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    width = np.clip(np.minimum(box[2], boxes[:, 2]) - np.maximum(box[0], boxes[:, 0]), 0, None)
+    height = np.clip(np.minimum(box[3], boxes[:, 3]) - np.maximum(box[1], boxes[:, 1]), 0, None)
+    intersection = width * height
+    denominator = area + areas - intersection if metric == 'IOU' else np.minimum(area, areas)
+    return np.divide(intersection, denominator, out=np.zeros_like(intersection), where=denominator > 0)
+
+
+def _pair_overlap(box, other, metric):
+    """IoU or IoS of two boxes, for the merge confirmation step"""
+    width = min(box[2], other[2]) - max(box[0], other[0])
+    height = min(box[3], other[3]) - max(box[1], other[1])
+    intersection = max(width, 0.0) * max(height, 0.0)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    other_area = (other[2] - other[0]) * (other[3] - other[1])
+    denominator = area + other_area - intersection if metric == 'IOU' else min(area, other_area)
+    return intersection / denominator if denominator > 0 else 0.0
+
+
+def merge_predictions(boxes, scores, class_ids, match_threshold=MERGE_MATCH_THRESHOLD, metric=MERGE_MATCH_METRIC):
+    """
+    Class-aware greedy non-maximum merging of detections from overlapping slices
+    Same result and order as SAHI's GreedyNMMPostprocess(class_agnostic=False), without
+    building an ObjectPrediction per box: keepers are taken by score and absorb the
+    same-class boxes that overlap them, growing to the union box
+    Args:
+        boxes: (n, 4) xyxy boxes in frame pixels
+        scores: (n,) confidences
+        class_ids: (n,) integer class ids
+        match_threshold: Overlap at which boxes are merged
+        metric: IOS or IOU
+    Returns:
+        tuple: (boxes, scores, class_ids) of the merged detections, ordered by class then score
+    """
+    if not len(boxes):
+        return boxes.reshape(0, 4), scores, class_ids
+
+    # SAHI groups on float32 copies of the predictions
+    boxes32, scores32 = boxes.astype(np.float32), scores.astype(np.float32)
+    # Highest score first, ties broken by coordinates as SAHI does
+    order = np.lexsort((boxes32[:, 3], boxes32[:, 2], boxes32[:, 1], boxes32[:, 0], -scores32))
+
+    # Boxes of different classes never merge; SAHI emits keepers class by class
+    keepers, merged_into = [], {}
+    for class_id in np.unique(class_ids):
+        candidates = order[class_ids[order] == class_id]
+        while len(candidates):
+            index, candidates = candidates[0], candidates[1:]
+            matches = overlaps(boxes32[index], boxes32[candidates], metric) >= match_threshold
+            keepers.append(index)
+            if matches.any():
+                merged_into[index] = candidates[matches]
+                candidates = candidates[~matches]
+    keepers = np.asarray(keepers, dtype=np.intp)
+
+    # Unions are taken in the boxes' own precision, as SAHI does with the prediction coordinates
+    merged = boxes[keepers].copy()
+    for row, index in enumerate(keepers):
+        for other in merged_into.get(index, ()):
+            # Confirm against the grown box before taking the union
+            if _pair_overlap(merged[row], boxes[other], metric) >= match_threshold:
+                merged[row, :2] = np.minimum(merged[row, :2], boxes[other, :2])
+                merged[row, 2:] = np.maximum(merged[row, 2:], boxes[other, 2:])
+
+    return merged, scores[keepers], class_ids[keepers]
+
+
+def from_object_predictions(object_predictions):
+    """SAHI ObjectPredictions (from get_sliced_prediction) as box, score, class id and name arrays"""
+    boxes = np.array([prediction.bbox.to_xyxy() for prediction in object_predictions], dtype=np.float64).reshape(-1, 4)
+    scores = np.array([prediction.score.value for prediction in object_predictions], dtype=np.float64)
+    class_ids = np.array([prediction.category.id for prediction in object_predictions], dtype=np.int64)
+    class_names = {prediction.category.id: prediction.category.name for prediction in object_predictions}
+    return boxes, scores, class_ids, class_names
+
+
+def to_results(boxes, scores, class_ids, class_names, processing_time):
+    """
+    Detection arrays as the JSON results returned by detect_pests
+    Args:
+        boxes: (n, 4) xyxy boxes
+        scores: (n,) confidences
+        class_ids: (n,) integer class ids
+        class_names: {class id: name}
+        processing_time: Seconds spent on detection
+    Returns:
+        dict: detections, total_detections, average_confidence, processing_time, class_counts
+    """
+    names = [class_names.get(int(class_id), str(class_id)) for class_id in range(int(class_ids.max()) + 1)] \
+        if len(class_ids) else []
+    counts = np.bincount(class_ids, minlength=len(names)) if len(class_ids) else np.zeros(0, dtype=np.int64)
+    # Classes in order of first appearance, like counting the detections one by one
+    _, first = np.unique(class_ids, return_index=True)
+    class_counts = {names[class_ids[i]]: int(counts[class_ids[i]]) for i in sorted(first)}
+
+    int_boxes = boxes.astype(np.int64).tolist()
+    labels = [names[class_id] for class_id in class_ids.tolist()]
+    detections = [
+        {'class': label, 'confidence': confidence, 'bbox': bbox}
+        for label, confidence, bbox in zip(labels, scores.tolist(), int_boxes)
+    ]
+
+    return {
+        'detections': detections,
+        'total_detections': len(detections),
+        'average_confidence': round(sum(d['confidence'] for d in detections) / len(detections), 2) if detections else 0.0,
+        'processing_time': round(processing_time, 2),
+        'class_counts': class_counts
+    }
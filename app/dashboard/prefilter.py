@@ -0,0 +1,92 @@
+# type: ignore
+import logging
+import cv2
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Default threshold per method; slices scoring below it are not run through the model
+PREFILTER_THRESHOLDS = {
+    # Grayscale variance (0-255 levels): sky, water and flat canopy sit far below textured crop
+    'variance': 60.0,
+    # Fraction of Canny edge pixels
+    'edges': 0.01,
+    # Bhattacharyya distance of the slice's hue/saturation histogram from the whole frame's:
+    # skips slices that look like the frame at large, e.g. uniform canopy
+    'histogram': 0.15,
+}
+# Slices are scored on a frame downscaled by this factor
+PREFILTER_SCALE = 4
+CANNY_THRESHOLDS = (50, 150)
+HISTOGRAM_BINS = [18, 8]
+
+
+def prefilter_settings():
+    """
+    Configured slice prefilter
+    Returns:
+        tuple: (method or None when disabled, threshold)
+    """
+    method = getattr(settings, 'DETECTION_PREFILTER', None)
+    if not method:
+        return None, None
+    if method not in PREFILTER_THRESHOLDS:
+        logger.error(f"Unknown DETECTION_PREFILTER {method!r}, slices are not prefiltered")
+        return None, None
+    threshold = getattr(settings, 'DETECTION_PREFILTER_THRESHOLD', None)
+    return method, PREFILTER_THRESHOLDS[method] if threshold is None else threshold
+
+
+def _box_sums(integral, boxes):
+    """Sum of the pixels inside each box, from an integral image, for all boxes at once"""
+    x0, y0, x1, y1 = boxes.T
+    return integral[y1, x1] - integral[y0, x1] - integral[y1, x0] + integral[y0, x0]
+
+
+def _scaled_boxes(boxes, shape):
+    """Slice boxes in the coordinates of the downscaled frame, at least one pixel wide"""
+    height, width = shape[:2]
+    scaled = np.asarray(boxes, dtype=np.int64) // PREFILTER_SCALE
+    scaled[:, 2] = np.clip(np.maximum(scaled[:, 2], scaled[:, 0] + 1), 1, width)
+    scaled[:, 3] = np.clip(np.maximum(scaled[:, 3], scaled[:, 1] + 1), 1, height)
+    return scaled
+
+
+def score_slices(image, boxes, method):
+    """
+    Score how much content each slice has with a cheap statistic
+    Args:
+        image: RGB frame (numpy array)
+        boxes: [x_min, y_min, x_max, y_max] per slice, in frame pixels
+        method: variance, edges or histogram
+    Returns:
+        numpy array: One score per slice, higher means more worth running the model on
+    """
+    if method not in PREFILTER_THRESHOLDS:
+        raise ValueError(f'Unknown prefilter method: {method}')
+
+    height, width = image.shape[:2]
+    small = cv2.resize(image, (max(1, width // PREFILTER_SCALE), max(1, height // PREFILTER_SCALE)),
+                       interpolation=cv2.INTER_AREA)
+    scaled = _scaled_boxes(boxes, small.shape)
+    areas = ((scaled[:, 2] - scaled[:, 0]) * (scaled[:, 3] - scaled[:, 1])).astype(np.float64)
+
+    if method == 'histogram':
+        hsv = cv2.cvtColor(small, cv2.COLOR_RGB2HSV)
+        ranges = [0, 180, 0, 256]
+        frame_hist = cv2.normalize(cv2.calcHist([hsv], [0, 1], None, HISTOGRAM_BINS, ranges), None).flatten()
+        scores = []
+        for x0, y0, x1, y1 in scaled:
+            hist = cv2.normalize(cv2.calcHist([hsv[y0:y1, x0:x1]], [0, 1], None, HISTOGRAM_BINS, ranges), None)
+            scores.append(cv2.compareHist(frame_hist, hist.flatten(), cv2.HISTCMP_BHATTACHARYYA))
+        return np.asarray(scores)
+
+    gray = cv2.cvtColor(small, cv2.COLOR_RGB2GRAY)
+    if method == 'edges':
+        edges = (cv2.Canny(gray, *CANNY_THRESHOLDS) > 0).astype(np.uint8)
+        return _box_sums(cv2.integral(edges), scaled) / areas
+
+    sums, squares = cv2.integral2(gray, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+    mean = _box_sums(sums, scaled) / areas
+    return _box_sums(squares, scaled) / areas - mean ** 2
@@ -0,0 +1,116 @@
+# type: ignore
+import json
+import logging
+import numpy as np
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    logger.info("orjson not available, using the standard library JSON encoder")
+    ORJSON_AVAILABLE = False
+
+
+class DashboardJSONEncoder(DjangoJSONEncoder):
+    """Standard library fallback that also understands NumPy arrays and scalars"""
+
+    def default(self, o):
+        if isinstance(o, np.ndarray):
+            return o.tolist()
+        if isinstance(o, np.generic):
+            return o.item()
+        return super().default(o)
+
+
+if ORJSON_AVAILABLE:
+    ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def _orjson_default(o):
+        # Numpy scalars outside arrays and anything DjangoJSONEncoder knows (Decimal, UUID, ...)
+        if isinstance(o, np.generic):
+            return o.item()
+        return DjangoJSONEncoder().default(o)
+
+
+def dumps(data):
+    """Serialize data to JSON bytes with orjson when available"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, default=_orjson_default, option=ORJSON_OPTIONS)
+    return json.dumps(data, cls=DashboardJSONEncoder).encode('utf-8')
+
+
+def json_response(data, status=200, **kwargs):
+    """
+    Drop-in replacement for JsonResponse used by all API views
+    Datetimes and NumPy arrays are serialized natively, without converting to lists first
+    """
+    return HttpResponse(dumps(data), content_type='application/json', status=status, **kwargs)
+
+
+BINARY_CONTENT_TYPE = 'application/octet-stream'
+BINARY_MAGIC = b'IOTB'
+BINARY_VERSION = 1
+BINARY_DTYPES = {'float64': '<f8', 'float32': '<f4', 'int32': '<i4'}
+BINARY_ALIGNMENT = 8
+
+
+def wants_binary(request):
+    """Whether the client opted into typed-array payloads with Accept: application/octet-stream"""
+    return BINARY_CONTENT_TYPE in request.META.get('HTTP_ACCEPT', '')
+
+
+def _padding(size):
+    return -size % BINARY_ALIGNMENT
+
+
+def binary_response(columns, meta=None, status=200):
+    """
+    Build a typed-array response from NumPy columns
+    Layout: b'IOTB', uint32 LE header length, JSON header, then each column's raw
+    little-endian buffer. The header lists every column's name, dtype, byte offset
+    and length; offsets are from the start of the body and 8-byte aligned, so the
+    browser can wrap them with new Float32Array(buffer, offset, length) directly.
+    Columns are cast to their wire dtype, which copies them when it differs (e.g.
+    float64 values sent as float32), and each is then copied once into the body.
+    Args:
+        columns: List of (name, array, dtype) with dtype 'float64', 'float32' or 'int32'
+        meta: JSON-serializable metadata (labels, ranges, ...)
+    Returns:
+        HttpResponse
+    """
+    arrays = []
+    descriptors = []
+    for name, values, dtype in columns:
+        # Only copied here when the array has another dtype or is not contiguous
+        array = np.ascontiguousarray(values, dtype=BINARY_DTYPES[dtype])
+        arrays.append(array)
+        descriptors.append({'name': name, 'dtype': dtype, 'length': int(array.size)})
+
+    def encode_header(offset):
+        for descriptor, array in zip(descriptors, arrays):
+            descriptor['offset'] = offset
+            offset += array.nbytes + _padding(array.nbytes)
+        return dumps({'version': BINARY_VERSION, 'meta': meta or {}, 'columns': descriptors})
+
+    # Column offsets depend on the header size, so settle the header length first
+    header = encode_header(0)
+    while True:
+        start = len(BINARY_MAGIC) + 4 + len(header)
+        start += _padding(start)
+        candidate = encode_header(start)
+        if len(candidate) == len(header):
+            header = candidate
+            break
+        header = candidate
+    header += b' ' * (start - len(BINARY_MAGIC) - 4 - len(header))
+
+    parts = [BINARY_MAGIC, np.uint32(len(header)).astype('<u4').tobytes(), header]
+    for array in arrays:
+        # Raw buffers are joined into the body without per-value encoding
+        parts.append(array.data)
+        parts.append(b'\0' * _padding(array.nbytes))
+    return HttpResponse(b''.join(parts), content_type=BINARY_CONTENT_TYPE, status=status)
@@ -0,0 +1,187 @@
+# type: ignore
+import copy
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+from django.conf import settings
+from django.core.cache.backends.filebased import FileBasedCache
+from .coalesce import single_flight
+
+logger = logging.getLogger(__name__)
+
+# Defaults, overridable with the DETECTION_CACHE_* settings
+CACHE_ENTRIES = 512
+DISK_ENTRIES = 10000
+# Hamming distance (of 64 bits) under which two frames count as the same scene
+PERCEPTUAL_MAX_DISTANCE = 4
+
+
+def content_hash(image):
+    """SHA-256 of encoded image bytes, or of a decoded array's shape and pixels"""
+    digest = hashlib.sha256()
+    if isinstance(image, np.ndarray):
+        digest.update(str(image.shape).encode('ascii'))
+        digest.update(np.ascontiguousarray(image).data)
+    else:
+        digest.update(image)
+    return digest.hexdigest()
+
+
+def perceptual_hash(image):
+    """
+    64-bit difference hash: signs of horizontal gradients on a 9x8 grayscale thumbnail
+    Survives recompression and sensor noise, changes when the scene does
+    Args:
+        image: Encoded image bytes or a BGR array
+    Returns:
+        int, or None if the image cannot be decoded
+    """
+    if isinstance(image, np.ndarray):
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    else:
+        # JPEG decodes at 1/8 scale for almost nothing, which is plenty for a 9x8 thumbnail
+        gray = cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+        if gray is None:
+            return None
+    thumbnail = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA).astype(np.int16)
+    bits = (thumbnail[:, 1:] > thumbnail[:, :-1]).flatten()
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+class DetectionResultCache:
+    """
+    LRU cache of detection results keyed by image content and detection config
+    Exact lookups use the content hash. In perceptual mode a miss falls back to the
+    cached frame with the closest perceptual hash within max_distance. Entries can
+    also be written to a file-based cache so they survive restarts.
+    """
+
+    def __init__(self, max_entries=CACHE_ENTRIES, perceptual=False, max_distance=PERCEPTUAL_MAX_DISTANCE,
+                 disk_path=None, disk_entries=DISK_ENTRIES):
+        self.max_entries = max_entries
+        self.perceptual = perceptual
+        self.max_distance = max_distance
+        self._entries = OrderedDict()  # key -> (config, phash, result)
+        self._lock = threading.Lock()
+        self._disk = None
+        if disk_path:
+            self._disk = FileBasedCache(disk_path, {'TIMEOUT': None, 'OPTIONS': {'MAX_ENTRIES': disk_entries}})
+        self.stats = {'hits': 0, 'near_hits': 0, 'disk_hits': 0, 'misses': 0, 'uncacheable': 0}
+
+    @staticmethod
+    def _key(config, digest):
+        return hashlib.sha1(f'{config}|{digest}'.encode('utf-8')).hexdigest()
+
+    def _store(self, key, config, phash, result):
+        """Insert into the LRU (caller holds the lock)"""
+        self._entries[key] = (config, phash, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _nearest(self, config, phash):
+        """Closest cached entry for the same config by perceptual hash (caller holds the lock)"""
+        best_key, best_distance = None, self.max_distance + 1
+        for key, (entry_config, entry_phash, _) in self._entries.items():
+            if entry_config != config or entry_phash is None:
+                continue
+            distance = (entry_phash ^ phash).bit_count()
+            if distance < best_distance:
+                best_key, best_distance = key, distance
+        return best_key
+
+    def get_or_compute(self, image, config, compute):
+        """
+        Cached detection results for an image, computing them on a miss
+        Args:
+            image: Encoded image bytes or a BGR array
+            config: Detection config key (model version and slicing); None disables caching
+            compute: Callable returning the results dict
+        Returns:
+            dict: Results; cache hits carry 'cached': 'exact', 'near' or 'disk'
+        """
+        if config is None:
+            with self._lock:
+                self.stats['uncacheable'] += 1
+            return compute()
+
+        key = self._key(config, content_hash(image))
+        phash = perceptual_hash(image) if self.perceptual else None
+
+        with self._lock:
+            hit, source = None, None
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                hit, source = self._entries[key][2], 'exact'
+                self.stats['hits'] += 1
+            elif phash is not None:
+                near_key = self._nearest(config, phash)
+                if near_key is not None:
+                    self._entries.move_to_end(near_key)
+                    hit, source = self._entries[near_key][2], 'near'
+                    self.stats['near_hits'] += 1
+
+        if hit is None and self._disk is not None:
+            hit = self._disk.get(key)
+            if hit is not None:
+                source = 'disk'
+                with self._lock:
+                    self.stats['disk_hits'] += 1
+                    self._store(key, config, phash, hit)
+
+        if hit is not None:
+            return dict(copy.deepcopy(hit), cached=source)
+
+        with self._lock:
+            self.stats['misses'] += 1
+        # Concurrent uploads of the same frame share one detection
+        result = single_flight('detect', [('key', key)], compute)
+        if result.get('simulated'):
+            # Stand-in results from a model that failed to load are random, never reuse them
+            return result
+        with self._lock:
+            self._store(key, config, phash, result)
+        if self._disk is not None:
+            self._disk.set(key, result)
+        return copy.deepcopy(result)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self._disk is not None:
+            self._disk.clear()
+
+    def get_stats(self):
+        """Hit counts and the overall hit rate of cacheable lookups"""
+        with self._lock:
+            stats = dict(self.stats, entries=len(self._entries), max_entries=self.max_entries,
+                         perceptual=self.perceptual, persistent=self._disk is not None)
+        lookups = stats['hits'] + stats['near_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = round((lookups - stats['misses']) / lookups, 4) if lookups else 0.0
+        return stats
+
+
+# Global result cache instance
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """Get or create the result cache, or None when settings.DETECTION_CACHE_ENTRIES is 0"""
+    global _result_cache
+    max_entries = getattr(settings, 'DETECTION_CACHE_ENTRIES', CACHE_ENTRIES)
+    if not max_entries:
+        return None
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = DetectionResultCache(
+                max_entries=max_entries,
+                perceptual=getattr(settings, 'DETECTION_CACHE_PERCEPTUAL', False),
+                max_distance=getattr(settings, 'DETECTION_CACHE_MAX_DISTANCE', PERCEPTUAL_MAX_DISTANCE),
+                disk_path=getattr(settings, 'DETECTION_CACHE_DIR', None),
+                disk_entries=getattr(settings, 'DETECTION_CACHE_DISK_ENTRIES', DISK_ENTRIES),
+            )
+    return _result_cache
@@ -0,0 +1,228 @@
+# type: ignore
+import logging
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.db import connection, connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from .models import GROWTH_STAGES
+
+logger = logging.getLogger(__name__)
+
+# Status values written by the MQTT client and the detection views
+KNOWN_STATUSES = ['Online', 'Offline', 'Completed']
+
+# SQLite FTS5 side index over detection class names (see migration 0012)
+DETECTION_FTS_TABLE = 'dashboard_detectiondata_fts'
+
+# YYYY-MM-DD[ HH[:MM]], YYYY-MM or DD/MM/YYYY
+DATE_PATTERN = (
+    r'(?:(?P<year>\d{4})-(?P<month>\d{1,2})(?:-(?P<day>\d{1,2})'
+    r'(?:[ T](?P<hour>\d{1,2})(?::(?P<minute>\d{2}))?)?)?'
+    r'|(?P<dmy_day>\d{1,2})/(?P<dmy_month>\d{1,2})/(?P<dmy_year>\d{4}))'
+)
+DATE_RE = re.compile(DATE_PATTERN)
+# HH:MM on its own, matched against the local time of day on any date
+TIME_RE = re.compile(r'(?<![\d:])(?P<hour>\d{1,2}):(?P<minute>\d{2})(?![\d:])')
+RANGE_RE = re.compile(
+    r'(?P<start>' + DATE_PATTERN.replace('?P<', '?P<s_') + r')'
+    r'\s*(?:\.\.|\s-\s|\s+(?:to|sampai|s/d)\s+)\s*'
+    r'(?P<end>' + DATE_PATTERN.replace('?P<', '?P<e_') + r')'
+)
+
+
+def _date_bounds(match, prefix=''):
+    """
+    Turn a DATE_PATTERN match into a local [start, end) datetime range
+    Raises ValueError for impossible dates and OverflowError for ones outside
+    what datetime can hold in UTC (e.g. 9999-12-31, whose end is in year 10000)
+    """
+    group = lambda name: match.group(prefix + name)
+    if group('dmy_year'):
+        year, month, day = int(group('dmy_year')), int(group('dmy_month')), int(group('dmy_day'))
+        hour = minute = None
+    else:
+        year, month = int(group('year')), int(group('month'))
+        day = int(group('day')) if group('day') else None
+        hour = int(group('hour')) if group('hour') else None
+        minute = int(group('minute')) if group('minute') else None
+
+    if day is None:
+        start = datetime(year, month, 1)
+        end = datetime(year + month // 12, month % 12 + 1, 1)
+    elif hour is None:
+        start = datetime(year, month, day)
+        end = start + timedelta(days=1)
+    elif minute is None:
+        start = datetime(year, month, day, hour)
+        end = start + timedelta(hours=1)
+    else:
+        start = datetime(year, month, day, hour, minute)
+        end = start + timedelta(minutes=1)
+    # Converting to UTC here rather than in the query raises the overflow while parsing
+    return timezone.make_aware(start).astimezone(dt_timezone.utc), timezone.make_aware(end).astimezone(dt_timezone.utc)
+
+
+def parse_search(text):
+    """
+    Split a data log search string into structured filters
+    Args:
+        text: Raw search box input
+    Returns:
+        dict: ranges [(start, end)], times [(hour, minute)], statuses, growth_stages
+              and remaining free-text terms
+    """
+    parsed = {'ranges': [], 'times': [], 'statuses': [], 'growth_stages': [], 'terms': []}
+
+    def take_range(match):
+        try:
+            start, _ = _date_bounds(match, 's_')
+            _, end = _date_bounds(match, 'e_')
+        except (ValueError, OverflowError):
+            return match.group(0)
+        parsed['ranges'].append((start, end))
+        return ' '
+
+    def take_date(match):
+        try:
+            parsed['ranges'].append(_date_bounds(match))
+        except (ValueError, OverflowError):
+            return match.group(0)
+        return ' '
+
+    def take_time(match):
+        hour, minute = int(match.group('hour')), int(match.group('minute'))
+        if hour > 23 or minute > 59:
+            return match.group(0)
+        parsed['times'].append((hour, minute))
+        return ' '
+
+    text = RANGE_RE.sub(take_range, text)
+    text = DATE_RE.sub(take_date, text)
+    text = TIME_RE.sub(take_time, text)
+
+    statuses = {status.lower(): status for status in KNOWN_STATUSES}
+    stages = {stage.lower(): stage for stage in GROWTH_STAGES}
+    for word in text.split():
+        key = word.lower()
+        if key in statuses:
+            parsed['statuses'].append(statuses[key])
+        elif key in stages:
+            parsed['growth_stages'].append(stages[key])
+        else:
+            parsed['terms'].append(word)
+    return parsed
+
+
+# Database aliases known to have the FTS5 side index
+_fts_aliases = set()
+
+
+def _fts_table_exists(alias):
+    """
+    Whether the FTS5 side index exists on a database
+    Only a positive answer is remembered, so a process started before migrate
+    picks the index up on a later search
+    """
+    if alias in _fts_aliases:
+        return True
+    database = connections[alias]
+    if database.vendor != 'sqlite':
+        return False
+    exists = DETECTION_FTS_TABLE in database.introspection.table_names()
+    if exists:
+        _fts_aliases.add(alias)
+    return exists
+
+
+def has_detection_fts():
+    """Check whether the FTS5 side index exists (SQLite only)"""
+    return _fts_table_exists(connection.alias)
+
+
+def _fts_query(terms):
+    """Build an FTS5 MATCH expression requiring every term as a prefix"""
+    return ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+
+def _fts_q(match):
+    """Condition on detections whose class names match an FTS5 expression"""
+    return Q(id__in=RawSQL(
+        f'SELECT rowid FROM {DETECTION_FTS_TABLE} WHERE {DETECTION_FTS_TABLE} MATCH %s',
+        [match]
+    ))
+
+
+def _fts_filter(queryset, match):
+    """Restrict a detection queryset to rows whose class names match an FTS5 expression"""
+    return queryset.filter(_fts_q(match))
+
+
+def filter_pest_classes(queryset, class_names):
+    """
+    Keep detections that found any of the given pest classes
+    Class names match exactly. The FTS5 side index, when available, narrows the
+    candidates first: it splits names on '_', so "wereng" also matches "wereng_coklat"
+    there, and the JSON key lookup drops those
+    """
+    any_class = Q()
+    for name in class_names:
+        any_class |= Q(class_counts__has_key=name)
+    if has_detection_fts():
+        match = ' OR '.join('"{}"'.format(name.replace('"', '""')) for name in class_names)
+        queryset = _fts_filter(queryset, match)
+    return queryset.filter(any_class)
+
+
+def apply_search(queryset, data_type, text):
+    """
+    Filter a data log queryset by a search string using indexed lookups
+    Dates become timestamp range filters, times of day hour/minute filters,
+    statuses and growth stages equality filters. On detection data the remaining
+    words are matched against class names through the FTS5 side index; words
+    with digits that are not a full date or time (e.g. "10-19" or "08") fall back
+    to matching the timestamp text, as the search box always did
+    """
+    parsed = parse_search(text)
+
+    if parsed['ranges']:
+        ranges = Q()
+        for start, end in parsed['ranges']:
+            ranges |= Q(timestamp__gte=start, timestamp__lt=end)
+        queryset = queryset.filter(ranges)
+
+    if parsed['times']:
+        times = Q()
+        for hour, minute in parsed['times']:
+            times |= Q(timestamp__hour=hour, timestamp__minute=minute)
+        queryset = queryset.filter(times)
+
+    if parsed['statuses']:
+        queryset = queryset.filter(status__in=parsed['statuses'])
+
+    # Words with digits may be partial dates or times the parser does not take
+    fragments = [term for term in parsed['terms'] if any(char.isdigit() for char in term)]
+    terms = [term for term in parsed['terms'] if term not in fragments]
+    if data_type == 'detection':
+        if parsed['growth_stages']:
+            queryset = queryset.filter(growth_stage__in=parsed['growth_stages'])
+        fts = has_detection_fts()
+        if terms:
+            if fts:
+                queryset = _fts_filter(queryset, _fts_query(terms))
+            else:
+                for term in terms:
+                    queryset = queryset.filter(class_counts__has_key=term)
+        for fragment in fragments:
+            # Still a class name (e.g. pest_1), or a piece of the timestamp
+            class_match = _fts_q(_fts_query([fragment])) if fts else Q(class_counts__has_key=fragment)
+            queryset = queryset.filter(class_match | Q(timestamp__icontains=fragment))
+    else:
+        # Growth stages only exist on detection data, so treat them as free text
+        for term in terms + parsed['growth_stages']:
+            queryset = queryset.filter(status__icontains=term)
+        for fragment in fragments:
+            queryset = queryset.filter(Q(timestamp__icontains=fragment) | Q(status__icontains=fragment))
+
+    return queryset
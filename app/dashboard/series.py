@@ -0,0 +1,214 @@
+# type: ignore
+import logging
+import numpy as np
+from django.db.models import Avg
+from django.core.cache import cache
+from django.db.models.functions import TruncMinute, TruncHour, TruncDay
+from django.utils import timezone
+from datetime import timedelta
+from .models import SensorData, SystemData
+
+logger = logging.getLogger(__name__)
+
+# Numeric fields that can be requested from /api/series/
+SERIES_METRICS = {
+    'temperature': SensorData,
+    'humidity': SensorData,
+    'rainfall': SensorData,
+    'thunder': SensorData,
+    'pest_count': SensorData,
+    'cpu_usage': SensorData,
+    'cpu_percent': SystemData,
+    'ram_percent': SystemData,
+    'ram_used_gb': SystemData,
+    'ram_total_gb': SystemData,
+    'storage_percent': SystemData,
+    'storage_used_gb': SystemData,
+    'storage_total_gb': SystemData,
+    'network_sent_mb': SystemData,
+    'network_recv_mb': SystemData,
+    'load_1min': SystemData,
+    'load_5min': SystemData,
+    'load_15min': SystemData,
+    'cpu_temp': SystemData,
+    'battery_level': SystemData,
+}
+
+# Aggregated sources, coarsest first: (name, trunc function, bucket size in seconds)
+SERIES_SOURCES = [
+    ('daily', TruncDay, 86400),
+    ('hourly', TruncHour, 3600),
+    ('minutely', TruncMinute, 60),
+]
+
+DEFAULT_POINTS = 500
+MAX_POINTS = 5000
+
+# Charts embedded in the index page
+INDEX_SERIES_METRICS = ['temperature', 'humidity', 'rainfall', 'cpu_percent', 'ram_percent', 'storage_percent']
+INDEX_SERIES_HOURS = 24
+INDEX_SERIES_POINTS = 200
+INDEX_SERIES_CACHE_KEY = 'dashboard:index_series'
+INDEX_SERIES_CACHE_SECONDS = 5
+
+
+def lttb(x, y, threshold):
+    """
+    Downsample a series with Largest-Triangle-Three-Buckets
+    Args:
+        x: 1-D array of monotonically increasing x values
+        y: 1-D array of y values
+        threshold: Number of points to keep
+    Returns:
+        tuple: (x, y) arrays with at most `threshold` points
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return x, y
+
+    # Bucket boundaries for the n - 2 interior points
+    every = (n - 2) / (threshold - 2)
+    edges = (np.arange(threshold - 1) * every).astype(np.intp) + 1
+    edges[-1] = n - 1
+
+    sampled = np.empty(threshold, dtype=np.intp)
+    sampled[0] = 0
+    sampled[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+
+        # Average of the next bucket (the last point for the final bucket)
+        next_start = end
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        # Pick the point forming the largest triangle with a and the next average
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        sampled[i + 1] = a
+
+    return x[sampled], y[sampled]
+
+
+def choose_source(start, end, points):
+    """Pick the coarsest aggregated source that still has at least `points` buckets"""
+    span = (end - start).total_seconds()
+    for name, trunc, bucket_seconds in SERIES_SOURCES:
+        if span / bucket_seconds >= points:
+            return name, trunc
+    return 'raw', None
+
+
+def fetch_series(metric, start, end, points):
+    """
+    Read a metric from the appropriate raw or aggregated source
+    Returns:
+        tuple: (source name, epoch seconds array, values array)
+    """
+    model = SERIES_METRICS[metric]
+    source, trunc = choose_source(start, end, points)
+
+    queryset = model.objects.filter(
+        timestamp__range=(start, end),
+        **{f'{metric}__isnull': False}
+    )
+    if trunc is None:
+        rows = queryset.order_by('timestamp').values_list('timestamp', metric)
+    else:
+        rows = queryset.annotate(
+            bucket=trunc('timestamp')
+        ).values('bucket').annotate(
+            value=Avg(metric)
+        ).order_by('bucket').values_list('bucket', 'value')
+
+    rows = list(rows)
+    timestamps = np.fromiter((row[0].timestamp() for row in rows), dtype=np.float64, count=len(rows))
+    values = np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows))
+    return source, timestamps, values
+
+
+def bucket_mean(x, y, start, end, points):
+    """
+    Average a series into `points` equal-width buckets between start and end
+    Args:
+        x: Epoch seconds array
+        y: Values array
+        start: Range start (epoch seconds)
+        end: Range end (epoch seconds)
+        points: Number of buckets
+    Returns:
+        tuple: (bucket start times, bucket means with NaN for empty buckets)
+    """
+    width = (end - start) / points
+    index = np.clip(((x - start) / width).astype(np.intp), 0, points - 1)
+    sums = np.bincount(index, weights=y, minlength=points)
+    counts = np.bincount(index, minlength=points)
+    means = np.divide(sums, counts, out=np.full(points, np.nan), where=counts > 0)
+    return start + np.arange(points) * width, means
+
+
+def build_series(metric, start, end, points=DEFAULT_POINTS):
+    """
+    Get a downsampled time series for a SensorData/SystemData metric
+    Args:
+        metric: Field name from SERIES_METRICS
+        start: Aware datetime, start of the range
+        end: Aware datetime, end of the range
+        points: Maximum number of points to return
+    Returns:
+        dict: source name, timestamps (epoch ms) and values as NumPy arrays
+    """
+    source, timestamps, values = fetch_series(metric, start, end, points)
+    row_count = len(values)
+
+    timestamps, values = lttb(timestamps, values, points)
+
+    logger.debug(f"Series {metric}: {row_count} {source} rows downsampled to {len(values)} points")
+
+    return {
+        'metric': metric,
+        'source': source,
+        'timestamps': (timestamps * 1000).astype(np.int64),
+        'values': np.round(values, 3),
+    }
+
+
+def get_index_series():
+    """
+    Get the pre-bucketed chart series embedded in the index page
+    The result is cached for a few seconds, so page loads cost O(points) rather than O(rows)
+    Returns:
+        dict: from/to range, shared bucket timestamps (epoch ms) and {metric: values}
+    """
+    data = cache.get(INDEX_SERIES_CACHE_KEY)
+    if data is not None:
+        return data
+
+    end = timezone.now()
+    start = end - timedelta(hours=INDEX_SERIES_HOURS)
+    start_seconds, end_seconds = start.timestamp(), end.timestamp()
+
+    bucket_times = None
+    series = {}
+    for metric in INDEX_SERIES_METRICS:
+        _, timestamps, values = fetch_series(metric, start, end, INDEX_SERIES_POINTS)
+        bucket_times, means = bucket_mean(timestamps, values, start_seconds, end_seconds, INDEX_SERIES_POINTS)
+        # Empty buckets become null so the charts show gaps
+        series[metric] = [None if np.isnan(v) else v for v in np.round(means, 3).tolist()]
+
+    data = {
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'timestamps': (bucket_times * 1000).astype(np.int64).tolist(),
+        'series': series,
+    }
+    cache.set(INDEX_SERIES_CACHE_KEY, data, INDEX_SERIES_CACHE_SECONDS)
+    return data
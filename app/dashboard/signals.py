@@ -1,14 +1,39 @@
 #type: ignore
-from django.db.models.signals import post_migrate
+from django.db.models.signals import post_migrate, post_save, post_delete
 from django.dispatch import receiver
 from django.apps import apps
+from .counts import COUNTED_MODELS, local_day, record_insert, record_delete
+from .fragments import bump_fragment_version
 import logging
 
 logger = logging.getLogger(__name__)
 
+COUNTED_SENDERS = {model: data_type for data_type, model in COUNTED_MODELS.items()}
+
 @receiver(post_migrate)
 def post_migration_handler(sender, **kwargs):
     """Handle post-migration tasks"""
     if sender.name == 'dashboard':
         logger.info("Dashboard app migration completed")
-        # Add any other post-migration tasks here if needed 
\ No newline at end of file
+        # Add any other post-migration tasks here if needed 
+
+@receiver(post_save)
+def count_saved_row(sender, instance, created, **kwargs):
+    """Keep the data log's per-day row counters and cached pages up to date"""
+    if sender in COUNTED_SENDERS:
+        try:
+            if created:
+                record_insert(COUNTED_SENDERS[sender], instance)
+            bump_fragment_version(COUNTED_SENDERS[sender], local_day(instance.timestamp))
+        except Exception as e:
+            logger.error(f"Error updating row counters: {e}")
+
+@receiver(post_delete)
+def count_deleted_row(sender, instance, **kwargs):
+    """Keep the data log's per-day row counters and cached pages up to date"""
+    if sender in COUNTED_SENDERS:
+        try:
+            record_delete(COUNTED_SENDERS[sender], instance)
+            bump_fragment_version(COUNTED_SENDERS[sender], local_day(instance.timestamp))
+        except Exception as e:
+            logger.error(f"Error updating row counters: {e}")
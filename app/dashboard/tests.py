@@ -1,3 +1,732 @@
-from django.test import TestCase
+import io
+import json
+import math
+import os
+import queue
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import datetime, timedelta
+from unittest import mock, skipUnless
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connections
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from dashboard import coalesce, counts, delta, fleet, jobs, postprocess, search, series
+from dashboard.models import DailyRowCount, DetectionData, DetectionJob, SensorData, SystemData
+from dashboard.pagination import InvalidCursor, KeysetPaginator, decode_cursor, encode_cursor, latest_per_timestamp
+from dashboard.responses import BINARY_ALIGNMENT, BINARY_CONTENT_TYPE, BINARY_DTYPES, BINARY_MAGIC, json_response, wants_binary
+from dashboard.yolo_detector import SAHI_AVAILABLE
 
-# Create your tests here.
+
+def run_threads(*targets):
+    """Run callables concurrently and return their results in order"""
+    results = [None] * len(targets)
+
+    def run(i, target):
+        results[i] = target()
+
+    threads = [threading.Thread(target=run, args=(i, target)) for i, target in enumerate(targets)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+class SingleFlightTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_callers_share_one_computation(self):
+        started, release, calls = threading.Event(), threading.Event(), []
+
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'result'
+
+        def follower():
+            started.wait(5)
+            threading.Timer(0.1, release.set).start()
+            return coalesce.single_flight('test', [('a', '1')], compute)
+
+        results = run_threads(lambda: coalesce.single_flight('test', [('a', '1')], compute), follower)
+        self.assertEqual(results, ['result', 'result'])
+        self.assertEqual(len(calls), 1)
+
+    def test_error_is_raised_in_every_caller(self):
+        def compute():
+            time.sleep(0.1)
+            raise ValueError('boom')
+
+        def call():
+            try:
+                coalesce.single_flight('test_error', [], compute)
+            except ValueError as e:
+                return str(e)
+
+        self.assertEqual(run_threads(call, call), ['boom', 'boom'])
+
+    @override_settings(DASHBOARD_COALESCE_SHARED=True)
+    def test_waiting_worker_reads_the_leader_result(self):
+        # Two workers only share the cache: call the cross-worker path directly
+        key = coalesce.flight_key('test_shared', [('a', '1')])
+        leader_started, calls = threading.Event(), []
+
+        def leader_compute():
+            calls.append('leader')
+            leader_started.set()
+            time.sleep(0.2)
+            return 'leader result'
+
+        def waiter():
+            leader_started.wait(5)
+            return coalesce._compute_shared('test_shared', key, lambda: calls.append('waiter') or 'waiter result')
+
+        results = run_threads(lambda: coalesce._compute_shared('test_shared', key, leader_compute), waiter)
+        self.assertEqual(results, ['leader result', 'leader result'])
+        self.assertEqual(calls, ['leader'])
+
+    @override_settings(DASHBOARD_COALESCE_SHARED=True)
+    def test_later_request_computes_again(self):
+        key = coalesce.flight_key('test_fresh', [])
+        coalesce._compute_shared('test_fresh', key, lambda: 'first')
+        self.assertEqual(coalesce._compute_shared('test_fresh', key, lambda: 'second'), 'second')
+
+    def test_flight_key_escapes_parameters(self):
+        self.assertNotEqual(coalesce.flight_key('view', [('a', '1&b=2')]),
+                            coalesce.flight_key('view', [('a', '1'), ('b', '2')]))
+        self.assertEqual(coalesce.flight_key('view', [('b', '2'), ('a', '1'), ('_', '123')]),
+                         coalesce.flight_key('view', [('a', '1'), ('b', '2')]))
+
+    def test_representations_never_share_a_flight(self):
+        # Both requests must be in the view at once, which fails if one waits on the other's flight
+        barrier = threading.Barrier(2, timeout=2)
+
+        @coalesce.coalesce_view
+        def view(request):
+            barrier.wait()
+            return json_response({'binary': wants_binary(request)})
+
+        factory = RequestFactory()
+        # A query parameter may name the other representation, even with the reserved key
+        for param in ('format', '__repr'):
+            binary = factory.get('/', {param: 'json'}, HTTP_ACCEPT=BINARY_CONTENT_TYPE)
+            plain = factory.get('/', {param: 'binary'})
+            binary_response, plain_response = run_threads(lambda: view(binary), lambda: view(plain))
+            self.assertEqual(binary_response.content, b'{"binary":true}')
+            self.assertEqual(plain_response.content, b'{"binary":false}')
+
+
+class PestClassFilterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.wereng = DetectionData.objects.create(class_counts={'wereng': 2}, total_detections=2)
+        cls.coklat = DetectionData.objects.create(class_counts={'wereng_coklat': 1}, total_detections=1)
+        cls.tikus = DetectionData.objects.create(class_counts={'tikus': 1, 'walang': 3}, total_detections=4)
+
+    def filtered(self, *class_names):
+        return set(search.filter_pest_classes(DetectionData.objects.all(), class_names))
+
+    def test_class_names_match_exactly_with_fts(self):
+        self.assertTrue(search.has_detection_fts())
+        self.assertEqual(self.filtered('wereng'), {self.wereng})
+        self.assertEqual(self.filtered('wereng_coklat'), {self.coklat})
+        self.assertEqual(self.filtered('wereng', 'walang'), {self.wereng, self.tikus})
+
+    def test_fts_and_json_lookups_agree(self):
+        with mock.patch.object(search, 'has_detection_fts', return_value=False):
+            self.assertEqual(self.filtered('wereng'), {self.wereng})
+            self.assertEqual(self.filtered('wereng', 'walang'), {self.wereng, self.tikus})
+            self.assertEqual(self.filtered('coklat'), set())
+        self.assertEqual(self.filtered('coklat'), set())
+
+
+def local(*args):
+    return timezone.make_aware(datetime(*args))
+
+
+class SearchParserTests(SimpleTestCase):
+
+    def test_dates_become_local_day_month_and_minute_ranges(self):
+        self.assertEqual(search.parse_search('2025-08-03')['ranges'], [(local(2025, 8, 3), local(2025, 8, 4))])
+        self.assertEqual(search.parse_search('03/08/2025')['ranges'], [(local(2025, 8, 3), local(2025, 8, 4))])
+        self.assertEqual(search.parse_search('2025-12')['ranges'], [(local(2025, 12, 1), local(2026, 1, 1))])
+        self.assertEqual(search.parse_search('2025-08-03 14:30')['ranges'],
+                         [(local(2025, 8, 3, 14, 30), local(2025, 8, 3, 14, 31))])
+        self.assertEqual(search.parse_search('2025-08-03 14')['ranges'],
+                         [(local(2025, 8, 3, 14), local(2025, 8, 3, 15))])
+
+    def test_ranges_span_from_the_first_start_to_the_last_end(self):
+        for text in ('2025-08-01..2025-08-03', '2025-08-01 to 2025-08-03', '01/08/2025 sampai 03/08/2025'):
+            self.assertEqual(search.parse_search(text)['ranges'], [(local(2025, 8, 1), local(2025, 8, 4))], text)
+
+    def test_times_statuses_stages_and_terms(self):
+        parsed = search.parse_search('14:30 offline panen wereng 10-19')
+        self.assertEqual(parsed['times'], [(14, 30)])
+        self.assertEqual(parsed['statuses'], ['Offline'])
+        self.assertEqual(parsed['growth_stages'], ['Panen'])
+        self.assertEqual(parsed['terms'], ['wereng', '10-19'])
+
+    def test_impossible_dates_and_times_stay_text(self):
+        parsed = search.parse_search('2025-02-30 25:61')
+        self.assertEqual((parsed['ranges'], parsed['times']), ([], []))
+        self.assertEqual(parsed['terms'], ['2025-02-30', '25:61'])
+
+    def test_dates_at_the_edge_of_datetime_stay_text(self):
+        for text in ('9999-12-31', '9999-12', '0001-01-01'):
+            self.assertEqual(search.parse_search(text)['ranges'], [], text)
+        parsed = search.parse_search('2025-01-01..9999-12-31')
+        self.assertEqual(parsed['ranges'], [(local(2025, 1, 1), local(2025, 1, 2))])
+        self.assertEqual(parsed['terms'], ['..9999-12-31'])
+
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.morning = SensorData.objects.create(timestamp=local(2025, 8, 3, 8, 15), status='Online')
+        cls.afternoon = SensorData.objects.create(timestamp=local(2025, 8, 3, 14, 30), status='Offline')
+        cls.next_day = SensorData.objects.create(timestamp=local(2025, 8, 4, 14, 30), status='Online')
+        cls.wereng = DetectionData.objects.create(timestamp=local(2025, 8, 3, 9), class_counts={'wereng_coklat': 1},
+                                                  growth_stage='Panen')
+        cls.tikus = DetectionData.objects.create(timestamp=local(2025, 8, 4, 9), class_counts={'tikus': 1})
+
+    def search(self, model, data_type, text):
+        return set(search.apply_search(model.objects.all(), data_type, text))
+
+    def test_date_time_and_status_filters(self):
+        self.assertEqual(self.search(SensorData, 'sensor', '2025-08-03'), {self.morning, self.afternoon})
+        self.assertEqual(self.search(SensorData, 'sensor', '14:30'), {self.afternoon, self.next_day})
+        self.assertEqual(self.search(SensorData, 'sensor', '14:30 online'), {self.next_day})
+        self.assertEqual(self.search(SensorData, 'sensor', '2025-08-03..2025-08-04 offline'), {self.afternoon})
+
+    def test_partial_dates_match_the_timestamp_text(self):
+        self.assertEqual(self.search(SensorData, 'sensor', '08-04'), {self.next_day})
+        self.assertEqual(self.search(DetectionData, 'detection', '08-03'), {self.wereng})
+
+    def test_detection_terms_match_class_name_prefixes(self):
+        self.assertEqual(self.search(DetectionData, 'detection', 'wereng'), {self.wereng})
+        self.assertEqual(self.search(DetectionData, 'detection', 'coklat'), {self.wereng})
+        self.assertEqual(self.search(DetectionData, 'detection', 'tikus panen'), set())
+
+    def test_fts_index_is_found_after_a_negative_check(self):
+        search._fts_aliases.discard('default')
+        introspection = connections['default'].introspection
+        with mock.patch.object(introspection, 'table_names', return_value=[]):
+            self.assertFalse(search.has_detection_fts())
+        self.assertTrue(search.has_detection_fts())
+        with mock.patch.object(introspection, 'table_names', side_effect=AssertionError('checked again')):
+            self.assertTrue(search.has_detection_fts())
+
+    def test_data_log_search_out_of_datetime_range(self):
+        self.client.force_login(User.objects.create_user('tester', password='secret'))
+        response = self.client.get(reverse('data_log'), {'type': 'sensor', 'search': '9999-12-31'})
+        self.assertEqual(response.status_code, 200)
+
+
+class FleetMapTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # A dense field near Bogor, a second one near Surabaya and one device in Medan
+        # (readings differ so SensorData.save doesn't drop them as duplicates)
+        for i in range(30):
+            SensorData.objects.create(latitude=-6.6 + i * 0.001, longitude=106.8 + i * 0.001, pest_count=i)
+        for i in range(10):
+            SensorData.objects.create(latitude=-7.25 - i * 0.01, longitude=112.75, temperature=25 + i, status='Offline')
+        SensorData.objects.create(latitude=3.59, longitude=98.67, pest_count=50)
+        cls.user = User.objects.create_user('tester', password='secret')
+
+    def setUp(self):
+        cache.clear()
+        fleet._index = None
+
+    def test_tile_lookup_matches_a_scan_at_every_zoom(self):
+        index = fleet.get_fleet_index()
+        for zoom in range(fleet.MAX_ZOOM + 1):
+            n = 1 << zoom
+            tiles = {(int(x * n), int(y * n)) for x, y in zip(index['x'], index['y'])}
+            found = 0
+            for tx, ty in tiles:
+                expected = np.flatnonzero(((index['x'] * n).astype(np.int64) == tx) & ((index['y'] * n).astype(np.int64) == ty))
+                self.assertEqual(sorted(fleet._tile_devices(index, zoom, tx, ty).tolist()), expected.tolist())
+                found += len(expected)
+            self.assertEqual(found, 41)
+
+    def test_clusters_count_every_device_once(self):
+        data = fleet.get_fleet_clusters(95, -11, 141, 6, 5)
+        self.assertEqual(data['devices'], 41)
+        worst = max(data['clusters'], key=lambda cluster: cluster['max_pest_count'])
+        self.assertEqual((worst['count'], worst['pest_level']), (1, 'high'))
+
+    def test_wide_viewport_is_clustered_at_a_coarser_zoom(self):
+        data = fleet.get_fleet_clusters(-180, -85, 180, 85, 12)
+        self.assertLessEqual(data['tiles'], fleet.MAX_TILES)
+        self.assertLess(data['zoom'], 12)
+        self.assertEqual(data['devices'], 41)
+        # A small viewport keeps its zoom
+        self.assertEqual(fleet.get_fleet_clusters(106.79, -6.61, 106.84, -6.56, 15)['zoom'], 15)
+
+    def test_index_is_reused_until_its_version_changes(self):
+        index = fleet.get_fleet_index()
+        with mock.patch.object(fleet, 'build_fleet_index', side_effect=AssertionError('rebuilt')):
+            self.assertIs(fleet.get_fleet_index(), index)
+        cache.delete(fleet.FLEET_INDEX_VERSION_CACHE_KEY)
+        self.assertIsNot(fleet.get_fleet_index(), index)
+
+    def test_api_rejects_non_finite_bbox(self):
+        self.client.force_login(self.user)
+        url = reverse('fleet_map')
+        for bbox in ('-inf,-10,inf,10', '0,nan,10,10', '0,0,1e400,10'):
+            self.assertEqual(self.client.get(url, {'bbox': bbox, 'zoom': 5}).status_code, 400, bbox)
+        response = self.client.get(url, {'bbox': '-180,-85,180,85', 'zoom': 8})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['devices'], 41)
+
+
+class DetectionJobLeaseTests(TestCase):
+    RESULTS = {'detections': [{'class': 'wereng'}], 'total_detections': 1, 'class_counts': {'wereng': 1},
+               'model_version': 'best@1'}
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        with open(os.path.join(media.name, 'upload.jpg'), 'wb') as upload:
+            upload.write(b'image')
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        # This test process plays the detection process host:1
+        for patcher in (mock.patch.object(jobs, '_worker_id', 'host:1'), mock.patch.object(jobs, '_queue', queue.Queue(8))):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def job(self, **fields):
+        fields = {'image_path': 'upload.jpg', 'worker': 'host:1', 'lease_at': timezone.now(), **fields}
+        return DetectionJob.objects.create(**fields)
+
+    def test_leased_job_records_one_detection(self):
+        job = self.job()
+        with mock.patch.object(jobs, 'detect', return_value=dict(self.RESULTS)):
+            jobs._process_job(job.id)
+        job.refresh_from_db()
+        self.assertEqual(job.status, DetectionJob.COMPLETED)
+        self.assertEqual(job.detection.model_version, 'best@1')
+        self.assertEqual(DetectionData.objects.count(), 1)
+
+    def test_result_of_a_job_taken_over_mid_detection_is_discarded(self):
+        job = self.job()
+
+        def slow_detect(image, growth_stage):
+            # Our lease expired and another process took the job over meanwhile
+            DetectionJob.objects.filter(id=job.id).update(worker='host:2', status=DetectionJob.QUEUED)
+            return dict(self.RESULTS)
+
+        with mock.patch.object(jobs, 'detect', side_effect=slow_detect):
+            jobs._process_job(job.id)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker, job.detection_id), (DetectionJob.QUEUED, 'host:2', None))
+        self.assertEqual(DetectionData.objects.count(), 0)
+
+    def test_failure_of_a_job_taken_over_is_not_recorded(self):
+        job = self.job()
+
+        def failing_detect(image, growth_stage):
+            DetectionJob.objects.filter(id=job.id).update(worker='host:2', status=DetectionJob.QUEUED)
+            raise RuntimeError('model crashed')
+
+        with mock.patch.object(jobs, 'detect', side_effect=failing_detect):
+            jobs._process_job(job.id)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), (DetectionJob.QUEUED, ''))
+
+    def test_expired_jobs_are_adopted_once_and_finished_ones_never(self):
+        stale = timezone.now() - timedelta(seconds=jobs.JOB_LEASE_SECONDS + 1)
+        orphan = self.job(worker='host:2', lease_at=stale)
+        legacy = self.job(worker='', lease_at=None, status=DetectionJob.RUNNING)
+        finished = self.job(worker='host:2', lease_at=stale, status=DetectionJob.COMPLETED)
+        live = self.job(worker='host:2')
+
+        jobs._adopt_expired()
+        self.assertEqual(sorted(jobs._queue.queue), sorted([orphan.id, legacy.id]))
+        for job, worker, status in ((orphan, 'host:1', DetectionJob.QUEUED), (legacy, 'host:1', DetectionJob.QUEUED),
+                                    (finished, 'host:2', DetectionJob.COMPLETED), (live, 'host:2', DetectionJob.QUEUED)):
+            job.refresh_from_db()
+            self.assertEqual((job.worker, job.status), (worker, status))
+
+        # Another process looking at the same jobs gets none of them
+        with mock.patch.object(jobs, '_worker_id', 'host:3'), mock.patch.object(jobs, '_queue', queue.Queue()) as other:
+            jobs._adopt_expired()
+            self.assertEqual(other.qsize(), 0)
+
+
+class ExportZipTests(TestCase):
+
+    def test_download_all_streams_every_table(self):
+        SensorData.objects.create(temperature=25.5)
+        DetectionData.objects.create(class_counts={'wereng': 2}, total_detections=2)
+        self.client.force_login(User.objects.create_user('tester', password='secret'))
+        response = self.client.get(reverse('download_all_csv'), {'period': 'all'})
+        self.assertEqual(response.status_code, 200)
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        rows = {name.split('_')[0]: archive.read(name).decode().splitlines() for name in archive.namelist()}
+        self.assertEqual(sorted(rows), ['detection', 'sensor', 'system'])
+        self.assertEqual((len(rows['sensor']), len(rows['system']), len(rows['detection'])), (2, 1, 2))
+        self.assertIn('25.5', rows['sensor'][1])
+
+
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # Seven rows over five timestamps, two of them shared, created out of order
+        cls.base = local(2025, 8, 3, 12)
+        for minutes, status in ((4, 'Online'), (0, 'Online'), (2, 'Offline'), (2, 'Online'), (1, 'Online'),
+                                (3, 'Offline'), (3, 'Online')):
+            SensorData.objects.create(timestamp=cls.base + timedelta(minutes=minutes), status=status,
+                                      temperature=SensorData.objects.count())
+
+    def newest_first(self, queryset):
+        return list(queryset.order_by('-timestamp', '-id'))
+
+    def test_cursor_round_trip(self):
+        cursor = encode_cursor(self.base, 42, 'prev')
+        self.assertNotIn('=', cursor)
+        self.assertEqual(decode_cursor(cursor), (self.base, 42, 'prev'))
+        for cursor in ('not a cursor', encode_cursor(self.base, 1)[:-4], 'eyJ0IjoiMjAyNSJ9'):
+            with self.assertRaises(InvalidCursor):
+                decode_cursor(cursor)
+
+    def test_pages_walk_every_row_in_order_and_back(self):
+        expected = self.newest_first(SensorData.objects.all())
+        paginator = KeysetPaginator(SensorData.objects.all(), 3)
+        pages, cursor = [], None
+        while True:
+            page = paginator.page(cursor)
+            pages.append(page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual([row for page in pages for row in page], expected)
+        self.assertFalse(pages[0].has_previous())
+
+        previous = paginator.page(pages[2].previous_cursor)
+        self.assertEqual(list(previous), list(pages[1]))
+        self.assertEqual(list(paginator.page(previous.previous_cursor)), list(pages[0]))
+        self.assertFalse(paginator.page(previous.previous_cursor).has_previous())
+
+    def test_latest_per_timestamp_keeps_the_newest_row(self):
+        rows = self.newest_first(latest_per_timestamp(SensorData.objects.all()))
+        self.assertEqual([row.status for row in rows], ['Online'] * 5)
+        self.assertEqual(len({row.timestamp for row in rows}), 5)
+
+    def test_latest_per_timestamp_deduplicates_within_the_filters(self):
+        # The newer Online duplicates are filtered out, so the Offline rows stay visible
+        rows = self.newest_first(latest_per_timestamp(SensorData.objects.filter(status='Offline')))
+        self.assertEqual([row.timestamp for row in rows], [self.base + timedelta(minutes=3), self.base + timedelta(minutes=2)])
+
+
+def parse_binary(body):
+    """Read a typed-array response back into its header and NumPy columns"""
+    length = int(np.frombuffer(body[4:8], dtype='<u4')[0])
+    header = json.loads(body[8:8 + length])
+    columns = {}
+    for column in header['columns']:
+        assert column['offset'] % BINARY_ALIGNMENT == 0
+        columns[column['name']] = np.frombuffer(body, dtype=BINARY_DTYPES[column['dtype']],
+                                                count=column['length'], offset=column['offset'])
+    return header, columns
+
+
+class BinaryResponseTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.start = local(2025, 8, 3, 12)
+        for i in range(20):
+            SensorData.objects.create(timestamp=cls.start + timedelta(minutes=i, milliseconds=123 * i), temperature=20 + i / 3)
+
+    def get_series(self, **headers):
+        return self.client.get(reverse('series'), {
+            # Fewer minutes than points, so the raw rows are served
+            'metric': 'temperature', 'points': 40,
+            'from': self.start.isoformat(), 'to': (self.start + timedelta(minutes=30)).isoformat(),
+        }, **headers)
+
+    def test_series_columns_match_the_json_variant(self):
+        data = self.get_series().json()
+        response = self.get_series(HTTP_ACCEPT=BINARY_CONTENT_TYPE)
+        self.assertEqual(response['Content-Type'], BINARY_CONTENT_TYPE)
+        self.assertIn('Accept', response['Vary'])
+        self.assertEqual(response.content[:4], BINARY_MAGIC)
+
+        header, columns = parse_binary(response.content)
+        self.assertEqual(header['meta']['points'], data['points'])
+        self.assertEqual((header['meta']['source'], data['source']), ('raw', 'raw'))
+        # Millisecond timestamps survive exactly, values to float32 precision
+        self.assertEqual(columns['timestamps'].tolist(), data['timestamps'])
+        self.assertEqual([int(timestamp) % 1000 for timestamp in columns['timestamps']], [123 * i % 1000 for i in range(20)])
+        np.testing.assert_allclose(columns['values'], data['values'], rtol=1e-6)
+
+    def test_detection_statistics_datasets_become_int32_columns(self):
+        DetectionData.objects.create(class_counts={'wereng': 2, 'tikus': 1}, total_detections=3)
+        data = self.client.get(reverse('detection_statistics')).json()
+        header, columns = parse_binary(self.client.get(reverse('detection_statistics'),
+                                                       HTTP_ACCEPT=BINARY_CONTENT_TYPE).content)
+        self.assertEqual(sorted(columns), sorted(dataset['label'] for dataset in data['chart_data']['datasets']))
+        for dataset in data['chart_data']['datasets']:
+            self.assertEqual(columns[dataset['label']].tolist(), dataset['data'])
+
+
+def reference_lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets as published by Steinarsson, one point at a time"""
+    n = len(x)
+    every = (n - 2) / (threshold - 2)
+    a, sampled = 0, [0]
+    for i in range(threshold - 2):
+        next_start, next_end = math.floor((i + 1) * every) + 1, min(math.floor((i + 2) * every) + 1, n)
+        avg_x = sum(x[next_start:next_end]) / (next_end - next_start)
+        avg_y = sum(y[next_start:next_end]) / (next_end - next_start)
+        best, best_area = None, -1
+        for j in range(math.floor(i * every) + 1, math.floor((i + 1) * every) + 1):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(best)
+        a = best
+    return sampled + [n - 1]
+
+
+class LTTBTests(SimpleTestCase):
+
+    def test_matches_the_reference_bucket_selection(self):
+        rng = np.random.default_rng(7)
+        for n, threshold in ((1002, 102), (500, 50), (10, 3), (257, 17)):
+            x = np.cumsum(rng.uniform(0.5, 1.5, n))
+            y = np.sin(x / 20) + rng.normal(0, 0.2, n)
+            sampled_x, sampled_y = series.lttb(x, y, threshold)
+            expected = reference_lttb(x.tolist(), y.tolist(), threshold)
+            self.assertEqual(sampled_x.tolist(), x[expected].tolist(), (n, threshold))
+            self.assertEqual(sampled_y.tolist(), y[expected].tolist(), (n, threshold))
+
+    def test_keeps_endpoints_and_spikes(self):
+        x = np.arange(1000, dtype=np.float64)
+        y = np.zeros(1000)
+        y[[137, 642]] = [50, -80]
+        sampled_x, sampled_y = series.lttb(x, y, 20)
+        self.assertEqual(len(sampled_x), 20)
+        self.assertEqual((sampled_x[0], sampled_x[-1]), (0, 999))
+        self.assertTrue(np.all(np.diff(sampled_x) > 0))
+        self.assertIn(137, sampled_x)
+        self.assertIn(642, sampled_x)
+
+    def test_short_series_are_returned_unchanged(self):
+        x, y = np.arange(5.0), np.arange(5.0) ** 2
+        for threshold in (5, 10, 2):
+            sampled_x, sampled_y = series.lttb(x, y, threshold)
+            self.assertEqual((sampled_x.tolist(), sampled_y.tolist()), (x.tolist(), y.tolist()))
+
+
+class SeriesTests(TestCase):
+
+    def test_series_downsamples_raw_rows_to_the_requested_points(self):
+        start = local(2025, 8, 3, 12)
+        for i in range(120):
+            SensorData.objects.create(timestamp=start + timedelta(seconds=10 * i), humidity=50 + (i % 7))
+        data = series.build_series('humidity', start, start + timedelta(minutes=30), points=50)
+        self.assertEqual(data['source'], 'raw')
+        self.assertEqual(len(data['timestamps']), 50)
+        self.assertEqual(data['timestamps'][0], int(start.timestamp() * 1000))
+        self.assertEqual(data['timestamps'][-1], int((start + timedelta(seconds=1190)).timestamp() * 1000))
+
+    def test_long_ranges_read_aggregated_buckets(self):
+        start = local(2025, 8, 3)
+        for hour in range(48):
+            for minute in (0, 30):
+                SensorData.objects.create(timestamp=start + timedelta(hours=hour, minutes=minute), humidity=hour + minute / 30)
+        data = series.build_series('humidity', start, start + timedelta(days=2), points=40)
+        self.assertEqual(data['source'], 'hourly')
+        self.assertEqual(len(data['values']), 40)
+        # Each hourly bucket is the mean of its two readings
+        self.assertTrue(np.all(data['values'] % 1 == 0.5))
+
+
+class DailyRowCountTests(TestCase):
+
+    def counters(self, data_type):
+        return dict(DailyRowCount.objects.filter(data_type=data_type).values_list('day', 'rows'))
+
+    def sensor(self, timestamp, temperature):
+        return SensorData.objects.create(timestamp=timestamp, temperature=temperature)
+
+    def test_saves_and_deletes_keep_counters_per_local_day(self):
+        # 23:30 in Jakarta is still 16:30 UTC: the row belongs to the local day
+        late = self.sensor(local(2025, 8, 3, 23, 30), 1)
+        first = self.sensor(local(2025, 8, 4, 8), 2)
+        duplicate = self.sensor(local(2025, 8, 4, 8), 3)
+        SystemData.objects.create(timestamp=local(2025, 8, 4, 8), cpu_percent=10)
+        SystemData.objects.create(timestamp=local(2025, 8, 4, 8), cpu_percent=20)
+        day3, day4 = datetime(2025, 8, 3).date(), datetime(2025, 8, 4).date()
+        # Sensor rows sharing a timestamp show once in the data log, system rows don't
+        self.assertEqual(self.counters('sensor'), {day3: 1, day4: 1})
+        self.assertEqual(self.counters('system'), {day4: 2})
+
+        duplicate.delete()
+        self.assertEqual(self.counters('sensor'), {day3: 1, day4: 1})
+        first.delete()
+        late.delete()
+        self.assertEqual(self.counters('sensor'), {day3: 0, day4: 0})
+
+    def test_rebuild_matches_maintained_counters(self):
+        for i in range(12):
+            self.sensor(local(2025, 8, 1) + timedelta(hours=7 * i), i)
+            if i % 3 == 0:
+                self.sensor(local(2025, 8, 1) + timedelta(hours=7 * i), 50 + i)
+            DetectionData.objects.create(timestamp=local(2025, 8, 1) + timedelta(hours=5 * i))
+        maintained = {data_type: self.counters(data_type) for data_type in counts.COUNTED_MODELS}
+        counts.rebuild_daily_counts()
+        self.assertEqual({data_type: self.counters(data_type) for data_type in counts.COUNTED_MODELS}, maintained)
+        self.assertEqual(sum(maintained['sensor'].values()), 12)
+
+    def test_totals_match_the_data_log_rows(self):
+        now = timezone.now()
+        for i in range(40):
+            self.sensor(now - timedelta(hours=5 * i), i)
+        self.sensor(now - timedelta(hours=5), 99)
+        queryset = latest_per_timestamp(SensorData.objects.all())
+        for period, start_date, end_date in (('all', '', ''), ('3', '', ''), ('7', '', ''),
+                                             ('all', (now - timedelta(days=4)).date().isoformat(), ''),
+                                             ('all', '', (now - timedelta(days=2)).date().isoformat())):
+            expected = queryset
+            if period != 'all':
+                expected = expected.filter(timestamp__gte=now - timedelta(days=int(period)))
+            if start_date:
+                expected = expected.filter(timestamp__date__gte=start_date)
+            if end_date:
+                expected = expected.filter(timestamp__date__lte=end_date)
+            with mock.patch.object(counts.timezone, 'now', return_value=now):
+                total = counts.count_records(expected, 'sensor', period, start_date, end_date)
+            self.assertEqual(total, expected.count(), (period, start_date, end_date))
+
+
+class DeltaSyncTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.base = local(2025, 8, 3, 12)
+        # Two rows share a timestamp, and ids are not in timestamp order
+        cls.rows = [SensorData.objects.create(timestamp=cls.base + timedelta(minutes=minutes), temperature=temperature)
+                    for minutes, temperature in ((2, 20), (0, 21), (1, 22), (1, 23), (3, 24))]
+
+    def test_parse_since_ts(self):
+        self.assertEqual(delta.parse_since_ts('1754197200123'), self.base + timedelta(milliseconds=123))
+        self.assertEqual(delta.parse_since_ts('2025-08-03T05:00:00+00:00'), self.base)
+        # Naive datetimes are local time
+        self.assertEqual(delta.parse_since_ts('2025-08-03T12:00:00'), self.base)
+        for value in ('1e20', 'inf', '-inf', 'nan', 'yesterday', ''):
+            with self.assertRaises(ValueError):
+                delta.parse_since_ts(value)
+
+    def test_since_id_returns_newer_rows_as_columns(self):
+        data = delta.get_delta('sensor', since_id=self.rows[1].id)
+        self.assertEqual(data['columns']['id'], [row.id for row in self.rows[2:]])
+        self.assertEqual(data['columns']['temperature'], [22, 23, 24])
+        self.assertEqual(data['columns']['timestamp'][0], int((self.base + timedelta(minutes=1)).timestamp() * 1000))
+        self.assertEqual((data['count'], data['has_more'], data['since_id']), (3, False, self.rows[-1].id))
+        self.assertEqual(delta.get_delta('sensor', since_id=self.rows[-1].id)['count'], 0)
+
+    def test_cursor_pages_do_not_skip_rows_sharing_a_timestamp(self):
+        seen, cursor = [], {'since_ts': self.base - timedelta(seconds=1)}
+        while True:
+            data = delta.get_delta('sensor', limit=1, **cursor)
+            seen += data['columns']['temperature']
+            if not data['has_more']:
+                break
+            cursor = {'since_id': data['since_id'], 'since_ts': delta.parse_since_ts(data['since_ts'])}
+        self.assertEqual(seen, [21, 22, 23, 20, 24])
+
+    def test_read_apis_answer_delta_requests(self):
+        response = self.client.get(reverse('latest_data'), {'since_id': self.rows[3].id})
+        self.assertEqual(response.json()['columns']['temperature'], [24])
+        self.assertEqual(self.client.get(reverse('system_data'), {'since_id': 0}).json()['count'], 0)
+        for params in ({'since_ts': '1e20'}, {'since_ts': 'inf'}, {'since_id': 'x'}, {'since_id': 1, 'limit': 'all'}):
+            self.assertEqual(self.client.get(reverse('latest_data'), params).status_code, 400, params)
+
+
+class MergePredictionsTests(SimpleTestCase):
+
+    def merge(self, boxes, scores, class_ids):
+        return postprocess.merge_predictions(np.array(boxes, dtype=np.float64).reshape(-1, 4),
+                                             np.array(scores, dtype=np.float64), np.array(class_ids, dtype=np.int64))
+
+    def test_overlapping_boxes_of_a_class_merge_into_their_union(self):
+        # The second box lies mostly inside the first (IoS 0.8), the third is elsewhere
+        boxes, scores, class_ids = self.merge(
+            [[0, 0, 100, 100], [20, 20, 120, 100], [300, 300, 340, 340]], [0.9, 0.95, 0.85], [0, 0, 0])
+        self.assertEqual(boxes.tolist(), [[0, 0, 120, 100], [300, 300, 340, 340]])
+        self.assertEqual(scores.tolist(), [0.95, 0.85])
+        self.assertEqual(class_ids.tolist(), [0, 0])
+
+    def test_classes_never_merge_and_come_out_class_by_class(self):
+        boxes, scores, class_ids = self.merge(
+            [[0, 0, 100, 100], [0, 0, 100, 100], [10, 10, 90, 90]], [0.9, 0.95, 0.8], [1, 0, 1])
+        self.assertEqual(class_ids.tolist(), [0, 1])
+        self.assertEqual(boxes.tolist(), [[0, 0, 100, 100], [0, 0, 100, 100]])
+        self.assertEqual(scores.tolist(), [0.95, 0.9])
+
+    def test_match_threshold_and_metric(self):
+        # IoS 0.5 but IoU 0.25: merged by IOS only
+        boxes = [[0, 0, 100, 100], [50, 0, 150, 100]]
+        self.assertEqual(len(self.merge(boxes, [0.9, 0.8], [0, 0])[0]), 1)
+        self.assertEqual(len(postprocess.merge_predictions(np.array(boxes, dtype=np.float64), np.array([0.9, 0.8]),
+                                                           np.array([0, 0]), metric='IOU')[0]), 2)
+
+    def test_empty_input(self):
+        boxes, scores, class_ids = self.merge([], [], [])
+        self.assertEqual((boxes.shape, len(scores), len(class_ids)), ((0, 4), 0, 0))
+        results = postprocess.to_results(boxes, scores, class_ids, {}, 0.5)
+        self.assertEqual((results['total_detections'], results['class_counts'], results['average_confidence']), (0, {}, 0.0))
+
+    def test_results_count_classes_in_order_of_appearance(self):
+        boxes, scores, class_ids = self.merge(
+            [[0, 0, 10, 10], [50, 50, 60, 60], [100, 100, 110, 110]], [0.9, 0.8, 0.7], [2, 0, 2])
+        results = postprocess.to_results(boxes, scores, class_ids, {0: 'tikus', 2: 'wereng'}, 1.234)
+        self.assertEqual(results['class_counts'], {'tikus': 1, 'wereng': 2})
+        self.assertEqual([detection['class'] for detection in results['detections']], ['tikus', 'wereng', 'wereng'])
+        self.assertEqual((results['average_confidence'], results['processing_time']), (0.8, 1.23))
+
+    @skipUnless(SAHI_AVAILABLE, 'sahi is not installed')
+    def test_matches_sahi_greedy_nmm(self):
+        from sahi.postprocess.combine import GreedyNMMPostprocess
+        from sahi.prediction import ObjectPrediction
+
+        rng = np.random.default_rng(3)
+        for _ in range(5):
+            # Clusters of jittered boxes, as neighbouring slices report the same pest
+            centres = rng.uniform(50, 1850, (40, 2)).repeat(4, axis=0) + rng.normal(0, 6, (160, 2))
+            sizes = rng.uniform(20, 60, (160, 2))
+            boxes = np.round(np.hstack([centres - sizes / 2, centres + sizes / 2]), 2)
+            scores = np.round(rng.uniform(0.8, 1.0, 160), 4)
+            class_ids = rng.integers(0, 3, 160)
+
+            predictions = [ObjectPrediction(bbox=box.tolist(), category_id=int(class_id), category_name=str(class_id),
+                                            score=float(score))
+                           for box, score, class_id in zip(boxes, scores, class_ids)]
+            expected = GreedyNMMPostprocess(match_threshold=postprocess.MERGE_MATCH_THRESHOLD,
+                                            match_metric=postprocess.MERGE_MATCH_METRIC, class_agnostic=False)(predictions)
+            merged_boxes, merged_scores, merged_ids = postprocess.merge_predictions(boxes, scores, class_ids)
+            sahi_boxes, sahi_scores, sahi_ids, _ = postprocess.from_object_predictions(expected)
+            self.assertLess(len(merged_boxes), 160)
+            np.testing.assert_allclose(merged_boxes, sahi_boxes)
+            self.assertEqual(merged_scores.tolist(), sahi_scores.tolist())
+            self.assertEqual(merged_ids.tolist(), sahi_ids.tolist())
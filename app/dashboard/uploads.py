@@ -0,0 +1,96 @@
+# type: ignore
+import itertools
+import logging
+import os
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Largest accepted upload (override with settings.DETECTION_UPLOAD_MAX_BYTES)
+UPLOAD_MAX_BYTES = 10 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 64 * 1024
+UPLOAD_DIR = 'detections'
+
+# Leading bytes of the image formats OpenCV decodes, and the extension they are stored with
+IMAGE_SIGNATURES = [
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'BM', 'bmp'),
+]
+
+
+class InvalidUpload(Exception):
+    """Raised for uploads that are empty or not a supported image"""
+
+
+class UploadTooLarge(InvalidUpload):
+    """Raised for uploads over the size limit"""
+
+
+def image_extension(header):
+    """
+    File extension for an image from its first bytes
+    Args:
+        header: At least the first 12 bytes of the file
+    Returns:
+        str: Extension without the dot
+    Raises:
+        InvalidUpload: If the bytes are not a supported image format
+    """
+    for signature, extension in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return extension
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'webp'
+    raise InvalidUpload('Unsupported image format, expected JPEG, PNG, WebP or BMP')
+
+
+def iter_stream(stream, length=None):
+    """Read a request or file stream in chunks without buffering the whole body"""
+    remaining = length
+    while remaining is None or remaining > 0:
+        chunk = stream.read(UPLOAD_CHUNK_SIZE if remaining is None else min(UPLOAD_CHUNK_SIZE, remaining))
+        if not chunk:
+            break
+        if remaining is not None:
+            remaining -= len(chunk)
+        yield chunk
+
+
+def save_upload(chunks):
+    """
+    Write the uploaded bytes unchanged under MEDIA_ROOT/detections
+    The format is taken from the first chunk, so the file is never decoded or re-encoded here
+    Args:
+        chunks: Iterable of bytes
+    Returns:
+        str: Saved path relative to MEDIA_ROOT
+    Raises:
+        InvalidUpload: If the upload is empty, too large or not an image
+    """
+    max_bytes = getattr(settings, 'DETECTION_UPLOAD_MAX_BYTES', UPLOAD_MAX_BYTES)
+    chunks = iter(chunks)
+    first = next(chunks, b'')
+    if not first:
+        raise InvalidUpload('No image data provided')
+    extension = image_extension(first[:12])
+
+    timestamp = timezone.now().strftime('%Y%m%d_%H%M%S_%f')
+    file_path = os.path.join(UPLOAD_DIR, f'detection_{timestamp}.{extension}')
+    full_path = os.path.join(settings.MEDIA_ROOT, file_path)
+
+    size = 0
+    try:
+        with open(full_path, 'wb') as destination:
+            for chunk in itertools.chain([first], chunks):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f'Image is larger than the {max_bytes} byte limit')
+                destination.write(chunk)
+    except InvalidUpload:
+        os.remove(full_path)
+        raise
+
+    logger.info(f"Saved {size} byte upload to {file_path}")
+    return file_path
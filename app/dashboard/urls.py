@@ -13,9 +13,14 @@ urlpatterns = [
     path('api/latest-data/', views.get_latest_data, name='latest_data'),
     path('api/system-data/', views.get_system_data, name='system_data'),
     path('api/location-data/', views.get_location_data, name='location_data'),
+    path('api/fleet-map/', views.get_fleet_map, name='fleet_map'),
     path('api/detection-statistics/', views.get_detection_statistics, name='detection_statistics'),
+    path('api/series/', views.get_series, name='series'),
+    path('api/coalescing-stats/', views.get_coalescing_stats, name='coalescing_stats'),
     path('api/latest-detection/', views.get_latest_detection, name='latest_detection'),
     path('api/upload-image/', views.upload_image, name='upload_image'),
+    path('api/detection-jobs/<int:job_id>/', views.get_detection_job, name='detection_job'),
+    path('api/detection-workers/', views.get_detection_workers, name='detection_workers'),
     path('api/detection-history/', views.get_detection_history, name='detection_history'),
     path('api/delete-detection/<int:detection_id>/', views.delete_detection, name='delete_detection'),
 ]
\ No newline at end of file
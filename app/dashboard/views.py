@@ -1,30 +1,39 @@
 # type: ignore
 import logging
 from django.shortcuts import render
-from django.http import JsonResponse
-from .models import SensorData, SystemData, DetectionData
+from .models import SensorData, SystemData, DetectionData, DetectionJob
+from .responses import json_response, wants_binary, binary_response
+from .series import SERIES_METRICS, DEFAULT_POINTS, MAX_POINTS, build_series, get_index_series
+from .pagination import KeysetPaginator, InvalidCursor, latest_per_timestamp
+from .search import apply_search, filter_pest_classes
+from .coalesce import coalesce_view, get_stats as get_coalesce_stats
+from .counts import count_records
+from .delta import DELTA_LIMIT, wants_delta, parse_since_ts, get_delta
+from .fleet import MAX_ZOOM as FLEET_MAX_ZOOM, get_fleet_clusters
+from .fragments import FRAGMENT_CACHE_SECONDS, page_fragment_key, fragments_cached, load_page_rows
+from .jobs import RETRY_AFTER_SECONDS, QueueFull, submit_job, job_payload, detection_queue_full, queue_depth
+from .executor import get_executor
+from .result_cache import get_result_cache
+from .model_registry import get_registry
+from .uploads import UPLOAD_CHUNK_SIZE, InvalidUpload, UploadTooLarge, save_upload, iter_stream
+from .exports import EXPORT_COLUMNS, get_export_format, iter_export, iter_zip
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, timedelta
+from django.utils.dateparse import parse_date, parse_datetime
 from django.contrib.auth import authenticate, login, logout
 from django.shortcuts import redirect
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse
-import csv
-from io import StringIO
-from django.core.paginator import Paginator
-from django.db.models import Q, OuterRef, Subquery
-from django.db.models import Max
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
 import base64
 import json
+import math
 import os
 from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
-import cv2
-import numpy as np
-from PIL import Image
-import io
 
 # Set up logger
 logger = logging.getLogger(__name__)
@@ -36,10 +45,8 @@ def index(request):
     # Get the latest system data
     latest_system_data = SystemData.get_latest_data()
     
-    # Get data for the last 24 hours for charts
-    yesterday = timezone.now() - timedelta(days=1)
-    recent_data = SensorData.objects.filter(timestamp__gte=yesterday).order_by('timestamp')
-    recent_system_data = SystemData.get_recent_data(hours=24)
+    # Get pre-bucketed chart series for the last 24 hours (cached, fixed point budget)
+    chart_series = get_index_series()
     
     # Get the last 10 records for the table
     table_data = SensorData.objects.all()[:10]
@@ -54,8 +61,7 @@ def index(request):
     context = {
         'latest_data': latest_data,
         'latest_system_data': latest_system_data,
-        'recent_data': recent_data,
-        'recent_system_data': recent_system_data,
+        'chart_series': chart_series,
         'table_data': table_data,
         'system_table_data': system_table_data,
         'latest_location': latest_location,
@@ -76,8 +82,20 @@ def format_timestamp_csv(timestamp):
     # Use Excel-friendly format: YYYY-MM-DD HH:MM:SS
     return jakarta_time.strftime('%Y-%m-%d %H:%M:%S')
 
+def _delta_response(request, data_type):
+    """Answer a since_id/since_ts request with only the newer rows, as columns"""
+    try:
+        since_id = int(request.GET['since_id']) if request.GET.get('since_id') else None
+        since_ts = parse_since_ts(request.GET['since_ts']) if request.GET.get('since_ts') else None
+        limit = max(1, min(int(request.GET.get('limit', DELTA_LIMIT)), DELTA_LIMIT))
+    except ValueError as e:
+        return json_response({'error': str(e)}, status=400)
+    return json_response(get_delta(data_type, since_id, since_ts, limit))
+
 def get_latest_data(request):
     """API endpoint to get latest sensor data for AJAX updates"""
+    if wants_delta(request):
+        return _delta_response(request, 'sensor')
     latest_data = SensorData.objects.first()
     latest_system_data = SystemData.get_latest_data()
     
@@ -148,10 +166,12 @@ def get_latest_data(request):
             'battery_level': 0,
         })
     
-    return JsonResponse(data)
+    return json_response(data)
 
 def get_system_data(request):
     """API endpoint to get latest system data for AJAX updates"""
+    if wants_delta(request):
+        return _delta_response(request, 'system')
     latest_system_data = SystemData.get_latest_data()
     
     if latest_system_data:
@@ -193,7 +213,7 @@ def get_system_data(request):
             'battery_level': 0,
         }
     
-    return JsonResponse(data)
+    return json_response(data)
 
 def get_location_data(request):
     """API endpoint to get location data for the map"""
@@ -217,8 +237,33 @@ def get_location_data(request):
             'status': 'Offline'
         }
     
-    return JsonResponse(data)
+    return json_response(data)
+
+@coalesce_view
+def get_fleet_map(request):
+    """API endpoint to get server-side clustered device markers for the map viewport"""
+    try:
+        west, south, east, north = (float(value) for value in request.GET.get('bbox', '').split(','))
+        zoom = int(request.GET.get('zoom', 13))
+    except ValueError:
+        return json_response({'error': 'bbox must be west,south,east,north and zoom an integer'}, status=400)
+
+    if not all(math.isfinite(value) for value in (west, south, east, north)):
+        return json_response({'error': 'bbox values must be finite numbers'}, status=400)
+    if west >= east or south >= north:
+        return json_response({'error': 'bbox must be west,south,east,north with west < east and south < north'}, status=400)
+    zoom = max(0, min(zoom, FLEET_MAX_ZOOM))
+
+    try:
+        data = get_fleet_clusters(west, south, east, north, zoom)
+    except Exception as e:
+        logger.error(f"Error clustering fleet map: {str(e)}")
+        return json_response({'error': str(e)}, status=500)
+
+    data['bbox'] = [west, south, east, north]
+    return json_response(data)
 
+@coalesce_view
 def get_detection_statistics(request):
     """API endpoint to get pest detection statistics for charts"""
     try:
@@ -292,15 +337,85 @@ def get_detection_statistics(request):
             }
         }
         
-        return JsonResponse(response_data)
+        if wants_binary(request):
+            # One int32 column per dataset; everything else travels in the header
+            columns = [(dataset['label'], dataset.pop('data'), 'int32') for dataset in chart_data['datasets']]
+            response = binary_response(columns, meta=response_data)
+        else:
+            response = json_response(response_data)
+        patch_vary_headers(response, ['Accept'])
+        return response
         
     except Exception as e:
-        return JsonResponse({
+        return json_response({
             'error': str(e),
             'chart_data': {'labels': [], 'datasets': []},
             'summary': {'total_detections': 0, 'total_pests': 0, 'class_counts': {}, 'period_days': 7}
         }, status=500)
 
+def _parse_series_datetime(value, default):
+    """Parse a from/to query value (ISO datetime or date) into an aware datetime"""
+    if not value:
+        return default
+    parsed = parse_datetime(value)
+    if parsed is None:
+        parsed_date = parse_date(value)
+        if parsed_date is None:
+            raise ValueError(f'Invalid datetime: {value}')
+        parsed = datetime.combine(parsed_date, datetime.min.time())
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+@coalesce_view
+def get_series(request):
+    """API endpoint to get a downsampled time series for a sensor or system metric"""
+    metric = request.GET.get('metric', 'temperature')
+    if metric not in SERIES_METRICS:
+        return json_response({
+            'error': f'Unknown metric: {metric}',
+            'metrics': sorted(SERIES_METRICS.keys())
+        }, status=400)
+
+    try:
+        end = _parse_series_datetime(request.GET.get('to'), timezone.now())
+        start = _parse_series_datetime(request.GET.get('from'), end - timedelta(days=1))
+        points = int(request.GET.get('points', DEFAULT_POINTS))
+    except ValueError as e:
+        return json_response({'error': str(e)}, status=400)
+
+    if start >= end:
+        return json_response({'error': 'from must be earlier than to'}, status=400)
+    points = max(3, min(points, MAX_POINTS))
+
+    try:
+        data = build_series(metric, start, end, points)
+    except Exception as e:
+        logger.error(f"Error building series for {metric}: {str(e)}")
+        return json_response({'error': str(e)}, status=500)
+
+    data.update({
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'points': len(data['values']),
+    })
+
+    if wants_binary(request):
+        # Timestamps as float64 epoch ms, exact to the millisecond like the JSON variant; values as float32
+        timestamps, values = data.pop('timestamps'), data.pop('values')
+        response = binary_response([
+            ('timestamps', timestamps, 'float64'),
+            ('values', values, 'float32'),
+        ], meta=data)
+    else:
+        response = json_response(data)
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+def get_coalescing_stats(request):
+    """API endpoint to get how many concurrent requests were served by a shared computation"""
+    return json_response(get_coalesce_stats())
+
 def get_latest_detection(request):
     """API endpoint to get latest detection data"""
     latest_detection = DetectionData.get_latest_detection()
@@ -320,7 +435,7 @@ def get_latest_detection(request):
             'status': 'No data',
         }
     
-    return JsonResponse(data)
+    return json_response(data)
 
 def login_view(request):
     """Handle user login"""
@@ -340,39 +455,20 @@ def logout_view(request):
     logout(request)
     return redirect('login')
 
-@login_required
-def data_log(request):
-    """Display data log page with filtering and pagination"""
-    # Get filter parameters
-    data_type = request.GET.get('type', 'sensor')
-    period = request.GET.get('period', '7')
-    start_date = request.GET.get('start_date', '')
-    end_date = request.GET.get('end_date', '')
-    search = request.GET.get('search', '')
-    page = request.GET.get('page', 1)
+DATA_TYPE_MODELS = {
+    'sensor': SensorData,
+    'system': SystemData,
+    'detection': DetectionData,
+}
+
+def _get_filtered_queryset(data_type, period, start_date, end_date, search):
+    """Build the filtered queryset shared by the data log and CSV downloads"""
+    queryset = DATA_TYPE_MODELS.get(data_type, SensorData).objects.all()
     
     # Calculate date range based on period
     if period != 'all':
         days = int(period)
-        start_datetime = timezone.now() - timedelta(days=days)
-    else:
-        start_datetime = None
-    
-    # Filter data based on type
-    if data_type == 'sensor':
-        queryset = SensorData.objects.all()
-        if start_datetime:
-            queryset = queryset.filter(timestamp__gte=start_datetime)
-    elif data_type == 'system':
-        queryset = SystemData.objects.all()
-        if start_datetime:
-            queryset = queryset.filter(timestamp__gte=start_datetime)
-    elif data_type == 'detection':
-        queryset = DetectionData.objects.all()
-        if start_datetime:
-            queryset = queryset.filter(timestamp__gte=start_datetime)
-    else:
-        queryset = SensorData.objects.all()
+        queryset = queryset.filter(timestamp__gte=timezone.now() - timedelta(days=days))
     
     # Apply date filters if provided
     if start_date:
@@ -380,48 +476,43 @@ def data_log(request):
     if end_date:
         queryset = queryset.filter(timestamp__date__lte=end_date)
     
-    # Apply search filter
+    # Apply search filter (dates, statuses, growth stages and class names)
     if search:
-        if data_type == 'sensor':
-            queryset = queryset.filter(
-                Q(status__icontains=search) | 
-                Q(timestamp__icontains=search)
-            )
-        elif data_type == 'system':
-            queryset = queryset.filter(
-                Q(status__icontains=search) | 
-                Q(timestamp__icontains=search)
-            )
-        elif data_type == 'detection':
-            queryset = queryset.filter(
-                Q(status__icontains=search) | 
-                Q(timestamp__icontains=search)
-            )
+        queryset = apply_search(queryset, data_type, search)
     
-    if data_type == 'sensor':
-        # Only show the latest record for each unique timestamp
-        latest_ids = SensorData.objects.filter(
-            timestamp=OuterRef('timestamp')
-        ).order_by('-id').values('id')[:1]
-        queryset = queryset.filter(id__in=Subquery(latest_ids)).order_by('-timestamp')
-    elif data_type == 'detection':
-        # Deduplicate: only latest record per timestamp
-        latest_ids = queryset.values('timestamp').annotate(
-            latest_id=Max('id')
-        ).values_list('latest_id', flat=True)
-        queryset = queryset.filter(id__in=latest_ids)
-    else:
-        queryset = queryset.order_by('-timestamp')
+    return queryset
+
+@login_required
+def data_log(request):
+    """Display data log page with filtering and pagination"""
+    # Get filter parameters
+    data_type = request.GET.get('type', 'sensor')
+    period = request.GET.get('period', '7')
+    start_date = request.GET.get('start_date', '')
+    end_date = request.GET.get('end_date', '')
+    search = request.GET.get('search', '')
+    cursor = request.GET.get('cursor', '')
+
+    queryset = _get_filtered_queryset(data_type, period, start_date, end_date, search)
     
-    # Pagination
-    paginator = Paginator(queryset, 50)  # 50 items per page
+    if data_type in ('sensor', 'detection'):
+        # Only show the latest record for each unique timestamp
+        queryset = latest_per_timestamp(queryset)
+
+    # Keyset pagination on (timestamp, id); full rows are only loaded when the page isn't cached
+    paginator = KeysetPaginator(queryset.only('id', 'timestamp'), 50)  # 50 items per page
     try:
-        page_obj = paginator.page(page)
-    except:
-        page_obj = paginator.page(1)
-    
-    # Calculate total records
-    total_records = paginator.count
+        page_obj = paginator.page(cursor)
+    except InvalidCursor:
+        cursor = ''
+        page_obj = paginator.page()
+
+    fragment_key = page_fragment_key(data_type, [period, start_date, end_date, search], cursor, page_obj)
+    if not fragments_cached(fragment_key):
+        load_page_rows(page_obj, queryset.model)
+
+    # Total from the per-day counters (search queries use a cached exact count)
+    total_records = count_records(queryset, data_type, period, start_date, end_date, search)
     
     # Get the latest sensor data for navbar
     latest_data = SensorData.objects.first()
@@ -437,6 +528,8 @@ def data_log(request):
         'end_date': end_date,
         'search': search,
         'total_records': total_records,
+        'fragment_key': fragment_key,
+        'fragment_cache_seconds': FRAGMENT_CACHE_SECONDS,
         'latest_data': latest_data,
         'latest_system_data': latest_system_data,
     }
@@ -445,273 +538,76 @@ def data_log(request):
 
 @login_required
 def download_csv(request):
-    """Download sensor data as CSV with filtering"""
+    """Download sensor data as CSV (or NDJSON/Parquet/Arrow) with filtering"""
     # Get filter parameters
     data_type = request.GET.get('type', 'sensor')
     period = request.GET.get('period', '7')
     start_date = request.GET.get('start_date', '')
     end_date = request.GET.get('end_date', '')
     search = request.GET.get('search', '')
+    export_format = request.GET.get('format', 'csv')
     
-    # Calculate date range based on period
-    if period != 'all':
-        days = int(period)
-        start_datetime = timezone.now() - timedelta(days=days)
-    else:
-        start_datetime = None
-    
-    # Filter data based on type
-    if data_type == 'sensor':
-        queryset = SensorData.objects.all()
-        if start_datetime:
-            queryset = queryset.filter(timestamp__gte=start_datetime)
-    elif data_type == 'system':
-        queryset = SystemData.objects.all()
-        if start_datetime:
-            queryset = queryset.filter(timestamp__gte=start_datetime)
-    elif data_type == 'detection':
-        queryset = DetectionData.objects.all()
-        if start_datetime:
-            queryset = queryset.filter(timestamp__gte=start_datetime)
-    else:
-        queryset = SensorData.objects.all()
-    
-    # Apply date filters if provided
-    if start_date:
-        queryset = queryset.filter(timestamp__date__gte=start_date)
-    if end_date:
-        queryset = queryset.filter(timestamp__date__lte=end_date)
+    try:
+        _, content_type, extension, _, _ = get_export_format(export_format)
+    except ValueError as e:
+        return json_response({'error': str(e)}, status=400)
     
-    # Apply search filter
-    if search:
-        if data_type == 'sensor':
-            queryset = queryset.filter(
-                Q(status__icontains=search) | 
-                Q(timestamp__icontains=search)
-            )
-        elif data_type == 'system':
-            queryset = queryset.filter(
-                Q(status__icontains=search) | 
-                Q(timestamp__icontains=search)
-            )
-        elif data_type == 'detection':
-            queryset = queryset.filter(
-                Q(status__icontains=search) | 
-                Q(timestamp__icontains=search)
-            )
+    if data_type not in EXPORT_COLUMNS:
+        data_type = 'sensor'
+    queryset = _get_filtered_queryset(data_type, period, start_date, end_date, search)
     
-    # Order by timestamp and remove duplicates for sensor data
+    # Remove duplicates for sensor data: only one record per timestamp
     if data_type == 'sensor':
-        # Use a more precise deduplication approach to ensure only one record per timestamp
-        from django.db.models import Max
-        # Get the latest ID for each unique timestamp
-        latest_ids = queryset.values('timestamp').annotate(
-            latest_id=Max('id')
-        ).values_list('latest_id', flat=True)
-        # Filter to only include the latest record for each timestamp
-        queryset = queryset.filter(id__in=latest_ids).order_by('-timestamp')
-    else:
-        queryset = queryset.order_by('-timestamp')
+        queryset = latest_per_timestamp(queryset)
+    queryset = queryset.order_by('-timestamp', '-id')
     
     # Generate timestamp for filename
     current_time = timezone.now().strftime('%Y%m%d_%H%M%S')
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="{data_type}_data_{current_time}.csv"'
     
-    writer = csv.writer(response)
-    
-    # Write headers based on data type
-    if data_type == 'sensor':
-        writer.writerow(['Timestamp', 'Temperature', 'Humidity', 'Rainfall', 'Thunder', 'Pest Count', 'Status', 'Latitude', 'Longitude'])
-        
-        for data in queryset:
-            writer.writerow([
-                format_timestamp_csv(data.timestamp),
-                data.temperature,
-                data.humidity,
-                data.rainfall,
-                data.thunder,
-                data.pest_count,
-                data.status,
-                data.latitude,
-                data.longitude
-            ])
-    elif data_type == 'system':
-        writer.writerow(['Timestamp', 'CPU %', 'RAM %', 'RAM Used (GB)', 'RAM Total (GB)', 'Storage %', 'Storage Used (GB)', 'Storage Total (GB)', 'Network Sent (MB)', 'Network Received (MB)', 'Load 1min', 'CPU Temp (°C)', 'Battery Level (%)', 'Status'])
-        
-        for data in queryset:
-            writer.writerow([
-                format_timestamp_csv(data.timestamp),
-                data.cpu_percent,
-                data.ram_percent,
-                data.ram_used_gb,
-                data.ram_total_gb,
-                data.storage_percent,
-                data.storage_used_gb,
-                data.storage_total_gb,
-                data.network_sent_mb,
-                data.network_recv_mb,
-                data.load_1min,
-                data.cpu_temp,
-                data.battery_level,
-                data.status
-            ])
-    elif data_type == 'detection':
-        writer.writerow(['Timestamp', 'Total Detections', 'Class Counts', 'Detection Details', 'Status'])
-        
-        for data in queryset:
-            writer.writerow([
-                format_timestamp_csv(data.timestamp),
-                data.total_detections,
-                str(data.class_counts) if data.class_counts else '',
-                str(data.detection_details) if data.detection_details else '',
-                data.status
-            ])
+    # Stream rows straight from a database cursor so memory stays constant
+    response = StreamingHttpResponse(iter_export(queryset, data_type, export_format), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{data_type}_data_{current_time}.{extension}"'
     
     return response
 
 @login_required
 def download_all_csv(request):
     """Download all data (sensor + system + detection) as ZIP with separate CSV files"""
-    import zipfile
-    from io import BytesIO
-    
     # Get filter parameters
     period = request.GET.get('period', '7')
     start_date = request.GET.get('start_date', '')
     end_date = request.GET.get('end_date', '')
     search = request.GET.get('search', '')
+    export_format = request.GET.get('format', 'csv')
     
-    # Calculate date range based on period
-    if period != 'all':
-        days = int(period)
-        start_datetime = timezone.now() - timedelta(days=days)
-    else:
-        start_datetime = None
+    try:
+        extension = get_export_format(export_format)[2]
+    except ValueError as e:
+        return json_response({'error': str(e)}, status=400)
     
-    # Filter sensor data
-    sensor_queryset = SensorData.objects.all()
-    if start_datetime:
-        sensor_queryset = sensor_queryset.filter(timestamp__gte=start_datetime)
-    if start_date:
-        sensor_queryset = sensor_queryset.filter(timestamp__date__gte=start_date)
-    if end_date:
-        sensor_queryset = sensor_queryset.filter(timestamp__date__lte=end_date)
-    if search:
-        sensor_queryset = sensor_queryset.filter(
-            Q(status__icontains=search) | 
-            Q(timestamp__icontains=search)
-        )
-    
-    # Filter system data
-    system_queryset = SystemData.objects.all()
-    if start_datetime:
-        system_queryset = system_queryset.filter(timestamp__gte=start_datetime)
-    if start_date:
-        system_queryset = system_queryset.filter(timestamp__date__gte=start_date)
-    if end_date:
-        system_queryset = system_queryset.filter(timestamp__date__lte=end_date)
-    if search:
-        system_queryset = system_queryset.filter(
-            Q(status__icontains=search) | 
-            Q(timestamp__icontains=search)
-        )
-    
-    # Filter detection data
-    detection_queryset = DetectionData.objects.all()
-    if start_datetime:
-        detection_queryset = detection_queryset.filter(timestamp__gte=start_datetime)
-    if start_date:
-        detection_queryset = detection_queryset.filter(timestamp__date__gte=start_date)
-    if end_date:
-        detection_queryset = detection_queryset.filter(timestamp__date__lte=end_date)
-    if search:
-        detection_queryset = detection_queryset.filter(
-            Q(status__icontains=search) | 
-            Q(timestamp__icontains=search)
-        )
+    sensor_queryset = _get_filtered_queryset('sensor', period, start_date, end_date, search)
+    system_queryset = _get_filtered_queryset('system', period, start_date, end_date, search)
+    detection_queryset = _get_filtered_queryset('detection', period, start_date, end_date, search)
     
     # Order by timestamp and remove duplicates for sensor data
-    from django.db.models import Max
-    # Get the latest ID for each unique timestamp
-    latest_ids = sensor_queryset.values('timestamp').annotate(
-        latest_id=Max('id')
-    ).values_list('latest_id', flat=True)
-    # Filter to only include the latest record for each timestamp
-    sensor_queryset = sensor_queryset.filter(id__in=latest_ids).order_by('-timestamp')
-    system_queryset = system_queryset.order_by('-timestamp')
-    detection_queryset = detection_queryset.order_by('-timestamp')
+    sensor_queryset = latest_per_timestamp(sensor_queryset).order_by('-timestamp', '-id')
+    system_queryset = system_queryset.order_by('-timestamp', '-id')
+    detection_queryset = detection_queryset.order_by('-timestamp', '-id')
     
     # Generate timestamp for filename
     current_time = timezone.now().strftime('%Y%m%d_%H%M%S')
     
-    # Create ZIP file in memory
-    zip_buffer = BytesIO()
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        
-        # Create sensor data CSV
-        sensor_csv = StringIO()
-        sensor_writer = csv.writer(sensor_csv)
-        sensor_writer.writerow(['Timestamp', 'Temperature', 'Humidity', 'Rainfall', 'Thunder', 'Pest Count', 'Status', 'Latitude', 'Longitude'])
-        
-        for data in sensor_queryset:
-            sensor_writer.writerow([
-                format_timestamp_csv(data.timestamp),
-                data.temperature,
-                data.humidity,
-                data.rainfall,
-                data.thunder,
-                data.pest_count,
-                data.status,
-                data.latitude,
-                data.longitude
-            ])
-        
-        zip_file.writestr(f'sensor_data_{current_time}.csv', sensor_csv.getvalue())
-        
-        # Create system data CSV
-        system_csv = StringIO()
-        system_writer = csv.writer(system_csv)
-        system_writer.writerow(['Timestamp', 'CPU %', 'RAM %', 'RAM Used (GB)', 'RAM Total (GB)', 'Storage %', 'Storage Used (GB)', 'Storage Total (GB)', 'Network Sent (MB)', 'Network Received (MB)', 'Load 1min', 'CPU Temp (°C)', 'Battery Level (%)', 'Status'])
-        
-        for data in system_queryset:
-            system_writer.writerow([
-                format_timestamp_csv(data.timestamp),
-                data.cpu_percent,
-                data.ram_percent,
-                data.ram_used_gb,
-                data.ram_total_gb,
-                data.storage_percent,
-                data.storage_used_gb,
-                data.storage_total_gb,
-                data.network_sent_mb,
-                data.network_recv_mb,
-                data.load_1min,
-                data.cpu_temp,
-                data.battery_level,
-                data.status
-            ])
-        
-        zip_file.writestr(f'system_data_{current_time}.csv', system_csv.getvalue())
-        
-        # Create detection data CSV
-        detection_csv = StringIO()
-        detection_writer = csv.writer(detection_csv)
-        detection_writer.writerow(['Timestamp', 'Total Detections', 'Class Counts', 'Detection Details', 'Status'])
-        
-        for data in detection_queryset:
-            detection_writer.writerow([
-                format_timestamp_csv(data.timestamp),
-                data.total_detections,
-                str(data.class_counts) if data.class_counts else '',
-                str(data.detection_details) if data.detection_details else '',
-                data.status
-            ])
-        
-        zip_file.writestr(f'detection_data_{current_time}.csv', detection_csv.getvalue())
-    
-    # Prepare response
-    response = HttpResponse(zip_buffer.getvalue(), content_type='application/zip')
+    entries = [
+        (f'sensor_data_{current_time}.{extension}', sensor_queryset, 'sensor'),
+        (f'system_data_{current_time}.{extension}', system_queryset, 'system'),
+        (f'detection_data_{current_time}.{extension}', detection_queryset, 'detection'),
+    ]
+    
+    # Stream the archive: CSV chunks are deflated and sent as they are produced
+    response = StreamingHttpResponse(
+        iter_zip(entries, format=export_format),
+        content_type='application/zip'
+    )
     response['Content-Disposition'] = f'attachment; filename="all_data_{current_time}.zip"'
     
     return response
@@ -723,103 +619,171 @@ def detection_page(request):
 
 @csrf_exempt
 def upload_image(request):
-    """API endpoint for handling image uploads and YOLO detection"""
+    """
+    API endpoint for image uploads: saves the image and queues a detection job
+    Accepts a multipart form (image, growth_stage), a raw image/* body with
+    ?growth_stage=, or JSON with a base64 image. The original bytes are stored
+    without re-encoding and decoded once, by the detection worker.
+    Returns 202 with the job id to poll at /api/detection-jobs/<id>/, or 429 when
+    the detection queue is full
+    """
     if request.method == 'POST':
         try:
-            # Get the image data from the request
-            data = json.loads(request.body)
-            image_data = data.get('image')
-            growth_stage = data.get('growth_stage', 'Vegetatif')  # Default to Vegetatif
-            
-            if not image_data:
-                return JsonResponse({'error': 'No image data provided'}, status=400)
-            
-            # Remove the data URL prefix if present
-            if image_data.startswith('data:image'):
-                image_data = image_data.split(',')[1]
-            
-            # Decode base64 image
-            image_bytes = base64.b64decode(image_data)
-            
-            # Convert to PIL Image
-            image = Image.open(io.BytesIO(image_bytes))
+            # Refuse early when the workers are saturated, before reading the image
+            if detection_queue_full():
+                return _queue_full_response()
             
-            # Convert to OpenCV format for YOLO processing
-            opencv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+            if request.content_type == 'multipart/form-data':
+                # Multipart form: the file part is streamed by Django's upload handlers
+                upload = request.FILES.get('image')
+                growth_stage = request.POST.get('growth_stage', 'Vegetatif')
+                if upload is None:
+                    return json_response({'error': 'No image data provided'}, status=400)
+                file_path = save_upload(upload.chunks(UPLOAD_CHUNK_SIZE))
+            elif request.content_type.startswith('image/') or request.content_type == 'application/octet-stream':
+                # Raw image body, growth stage in the query string
+                growth_stage = request.GET.get('growth_stage', 'Vegetatif')
+                length = int(request.META.get('CONTENT_LENGTH') or 0) or None
+                file_path = save_upload(iter_stream(request, length))
+            else:
+                # Legacy JSON body with a base64 (data URL) image
+                data = json.loads(request.body)
+                image_data = data.get('image')
+                growth_stage = data.get('growth_stage', 'Vegetatif')  # Default to Vegetatif
+                
+                if not image_data:
+                    return json_response({'error': 'No image data provided'}, status=400)
+                
+                # Remove the data URL prefix if present
+                if image_data.startswith('data:image'):
+                    image_data = image_data.split(',')[1]
+                
+                # Decode base64 image and store the encoded bytes as they are
+                file_path = save_upload([base64.b64decode(image_data)])
             
-            # Use YOLO detector for pest detection
             try:
-                from .yolo_detector import detect_pests
-                detection_results = detect_pests(opencv_image)
-            except Exception as e:
-                logger.error(f"Error importing or using YOLO detector: {str(e)}")
-                return JsonResponse({'error': f'Detection model error: {str(e)}'}, status=500)
+                job = submit_job(file_path, growth_stage)
+            except QueueFull:
+                os.remove(os.path.join(settings.MEDIA_ROOT, file_path))
+                return _queue_full_response()
             
-            # Save the image to media directory
-            timestamp = timezone.now().strftime('%Y%m%d_%H%M%S')
-            filename = f'detection_{timestamp}.jpg'
-            file_path = os.path.join('detections', filename)
+            logger.info(f"Queued detection job {job.id} for {file_path} ({growth_stage})")
             
-            # Save the image
-            image.save(os.path.join(settings.MEDIA_ROOT, file_path))
-            
-            # Create detection record in database
-            detection_data = DetectionData.objects.create(
-                timestamp=timezone.now(),
-                total_detections=len(detection_results.get('detections', [])),
-                class_counts=detection_results.get('class_counts', {}),
-                growth_stage=growth_stage,
-                image_path=file_path,
-                status='Completed'
-            )
-            
-            # Log detection results
-            logger.info(f"Detection completed: {detection_results['total_detections']} objects found")
-            logger.info(f"Growth stage: {growth_stage}")
-            if 'class_counts' in detection_results:
-                for class_name, count in detection_results['class_counts'].items():
-                    logger.info(f"  - {class_name}: {count}")
-            
-            return JsonResponse({
+            return json_response({
                 'success': True,
-                'detection_results': detection_results,
+                'job_id': job.id,
+                'status': job.status,
+                'status_url': reverse('detection_job', args=[job.id]),
                 'image_path': file_path,
-                'detection_id': detection_data.id,
                 'growth_stage': growth_stage
-            })
+            }, status=202)
             
+        except UploadTooLarge as e:
+            return json_response({'error': str(e)}, status=413)
+        except InvalidUpload as e:
+            return json_response({'error': str(e)}, status=400)
         except Exception as e:
             logger.error(f"Error in upload_image: {str(e)}")
-            return JsonResponse({'error': str(e)}, status=500)
+            return json_response({'error': str(e)}, status=500)
     
-    return JsonResponse({'error': 'Invalid request method'}, status=405)
+    return json_response({'error': 'Invalid request method'}, status=405)
+
+def _queue_full_response():
+    """429 telling the client to retry the upload later"""
+    response = json_response({'error': 'Detection queue is full, try again shortly'}, status=429)
+    response['Retry-After'] = str(RETRY_AFTER_SECONDS)
+    return response
+
+def get_detection_job(request, job_id):
+    """API endpoint for polling the status and result of a detection job"""
+    try:
+        job = DetectionJob.objects.get(id=job_id)
+    except DetectionJob.DoesNotExist:
+        return json_response({'error': 'Detection job not found'}, status=404)
+    return json_response(job_payload(job))
+
+def get_detection_workers(request):
+    """
+    API endpoint for detection queue depth, per-process worker health, result cache
+    hit rates and the registered models (models loaded in this process)
+    """
+    executor = get_executor()
+    result_cache = get_result_cache()
+    return json_response({
+        'queue_depth': queue_depth(),
+        'processes': executor.health() if executor else [],
+        'stats': executor.get_stats() if executor else None,
+        'result_cache': result_cache.get_stats() if result_cache else None,
+        'models': get_registry().get_stats(),
+    })
+
+# Fields clients can request from /api/detection-history/ with fields=
+DETECTION_HISTORY_FIELDS = ['id', 'timestamp', 'total_detections', 'growth_stage', 'class_counts', 'status', 'image_path',
+                            'model_version']
+DETECTION_HISTORY_LIMIT = 10
+DETECTION_HISTORY_MAX_LIMIT = 100
+
+def _split_param(value):
+    """Split a comma-separated query parameter into its non-empty values"""
+    return [part.strip() for part in value.split(',') if part.strip()]
 
 @login_required
 def get_detection_history(request):
-    """API endpoint to get detection history"""
+    """
+    API endpoint to get detection history, newest first
+    Query parameters: cursor (from next_cursor/previous_cursor), limit,
+    fields (comma-separated subset of DETECTION_HISTORY_FIELDS),
+    growth_stage and pest_class (comma-separated, any of)
+    With since_id/since_ts only newer detections are returned, as columns
+    """
+    if wants_delta(request):
+        return _delta_response(request, 'detection')
+
+    fields = _split_param(request.GET.get('fields', '')) or DETECTION_HISTORY_FIELDS
+    unknown = [field for field in fields if field not in DETECTION_HISTORY_FIELDS]
+    if unknown:
+        return json_response({
+            'error': f'Unknown fields: {", ".join(unknown)}',
+            'fields': DETECTION_HISTORY_FIELDS
+        }, status=400)
+
     try:
-        # Get recent detections
-        recent_detections = DetectionData.objects.all().order_by('-timestamp')[:10]
-        
+        limit = int(request.GET.get('limit', DETECTION_HISTORY_LIMIT))
+    except ValueError:
+        return json_response({'error': 'limit must be an integer'}, status=400)
+    limit = max(1, min(limit, DETECTION_HISTORY_MAX_LIMIT))
+
+    try:
+        # Only load the requested columns; id and timestamp are needed for the cursor
+        queryset = DetectionData.objects.only('id', 'timestamp', *fields)
+
+        growth_stages = _split_param(request.GET.get('growth_stage', ''))
+        if growth_stages:
+            queryset = queryset.filter(growth_stage__in=growth_stages)
+        pest_classes = _split_param(request.GET.get('pest_class', ''))
+        if pest_classes:
+            queryset = filter_pest_classes(queryset, pest_classes)
+
+        page = KeysetPaginator(queryset, limit).page(request.GET.get('cursor') or None)
+
         detections = []
-        for detection in recent_detections:
-            detections.append({
-                'id': detection.id,
-                'timestamp': format_timestamp_local(detection.timestamp),
-                'total_detections': detection.total_detections,
-                'growth_stage': detection.growth_stage,
-                'class_counts': detection.class_counts,
-                'status': detection.status,
-                'image_path': detection.image_path
-            })
-        
-        return JsonResponse({
+        for detection in page:
+            item = {field: getattr(detection, field) for field in fields}
+            if 'timestamp' in item:
+                item['timestamp'] = format_timestamp_local(detection.timestamp)
+            detections.append(item)
+
+        return json_response({
             'success': True,
-            'detections': detections
+            'detections': detections,
+            'next_cursor': page.next_cursor,
+            'previous_cursor': page.previous_cursor,
         })
-        
+
+    except InvalidCursor:
+        return json_response({'error': 'Invalid cursor'}, status=400)
     except Exception as e:
-        return JsonResponse({'error': str(e)}, status=500)
+        return json_response({'error': str(e)}, status=500)
 
 @login_required
 def delete_detection(request, detection_id):
@@ -840,21 +804,21 @@ def delete_detection(request, detection_id):
             detection.delete()
             logger.info(f"Deleted detection record: {detection_id}")
             
-            return JsonResponse({
+            return json_response({
                 'success': True,
                 'message': 'Detection result deleted successfully'
             })
             
         except DetectionData.DoesNotExist:
-            return JsonResponse({
+            return json_response({
                 'success': False,
                 'error': 'Detection result not found'
             }, status=404)
         except Exception as e:
             logger.error(f"Error deleting detection: {str(e)}")
-            return JsonResponse({
+            return json_response({
                 'success': False,
                 'error': str(e)
             }, status=500)
     
-    return JsonResponse({'error': 'Invalid request method'}, status=405)
\ No newline at end of file
+    return json_response({'error': 'Invalid request method'}, status=405)
\ No newline at end of file
@@ -1,11 +1,16 @@
 import cv2
 import numpy as np
 import os
-import tempfile
+import ast
+import json
 from django.conf import settings
 import logging
-from datetime import datetime
 import time
+from .postprocess import MERGE_MATCH_THRESHOLD, from_object_predictions, merge_predictions, to_results
+from .prefilter import prefilter_settings, score_slices
+
+logger = logging.getLogger(__name__)
+
 try:
     from sahi import AutoDetectionModel
     from sahi.predict import get_sliced_prediction
@@ -14,7 +19,209 @@ except ImportError as e:
     logger.error(f"SAHI import error: {e}")
     SAHI_AVAILABLE = False
 
-logger = logging.getLogger(__name__)
+try:
+    import onnxruntime as ort
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    logger.info("onnxruntime not available, slices are run one at a time through SAHI")
+    ONNXRUNTIME_AVAILABLE = False
+
+# Slice geometry used by SAHI sliced prediction, unless a tuned profile is present
+# (see load_slice_profile and the tune_slices management command)
+SLICE_SIZE = 640
+SLICE_OVERLAP = 0.5
+SLICE_PROFILE_NAME = 'slice_profile.json'
+# Slices per ONNX inference call (override with settings.DETECTION_BATCH_SIZE)
+SLICE_BATCH_SIZE = 8
+CONFIDENCE_THRESHOLD = 0.8
+# Per-slice NMS, as Ultralytics does (the cross-slice merge is in postprocess)
+NMS_IOU_THRESHOLD = 0.7
+LETTERBOX_COLOR = 114
+
+
+def slice_profile_path():
+    """Slice profile file (settings.DETECTION_SLICE_PROFILE, default models/slice_profile.json)"""
+    return str(getattr(settings, 'DETECTION_SLICE_PROFILE', None) or
+               os.path.join(settings.BASE_DIR, 'models', SLICE_PROFILE_NAME))
+
+
+def load_slice_profile():
+    """
+    Slice geometry written by the tune_slices command
+    Returns:
+        tuple: (slice size, overlap ratio), the defaults when there is no valid profile
+    """
+    path = slice_profile_path()
+    if not os.path.exists(path):
+        return SLICE_SIZE, SLICE_OVERLAP
+    try:
+        with open(path) as profile_file:
+            profile = json.load(profile_file)
+        slice_size, overlap = int(profile['slice_size']), float(profile['overlap'])
+        if slice_size < 32 or not 0 <= overlap < 1:
+            raise ValueError(f'slice size {slice_size}, overlap {overlap}')
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.error(f"Invalid slice profile {path}, using {SLICE_SIZE}px at {SLICE_OVERLAP} overlap: {e}")
+        return SLICE_SIZE, SLICE_OVERLAP
+    return slice_size, overlap
+
+
+def slice_boxes(image_height, image_width, slice_height=SLICE_SIZE, slice_width=SLICE_SIZE,
+                overlap_height_ratio=SLICE_OVERLAP, overlap_width_ratio=SLICE_OVERLAP):
+    """
+    Slice windows in the same order and geometry as sahi.slicing.get_slice_bboxes
+    Returns:
+        list: [x_min, y_min, x_max, y_max] per slice; edge slices are shifted back inside the image
+    """
+    y_overlap = int(overlap_height_ratio * slice_height)
+    x_overlap = int(overlap_width_ratio * slice_width)
+    boxes = []
+    y_min = y_max = 0
+    while y_max < image_height:
+        x_min = x_max = 0
+        y_max = y_min + slice_height
+        while x_max < image_width:
+            x_max = x_min + slice_width
+            if y_max > image_height or x_max > image_width:
+                x_end, y_end = min(image_width, x_max), min(image_height, y_max)
+                boxes.append([max(0, x_end - slice_width), max(0, y_end - slice_height), x_end, y_end])
+            else:
+                boxes.append([x_min, y_min, x_max, y_max])
+            x_min = x_max - x_overlap
+        y_min = y_max - y_overlap
+    return boxes
+
+
+class BatchedSliceEngine:
+    """
+    Sliced inference that feeds all slices of a frame to ONNX Runtime in batches
+    Slices are cut as views of the frame and copied once, into the batch tensor
+    """
+
+    def __init__(self, model_path, confidence_threshold=CONFIDENCE_THRESHOLD, batch_size=SLICE_BATCH_SIZE,
+                 slice_size=None, slice_overlap=SLICE_OVERLAP):
+        options = ort.SessionOptions()
+        # 0 lets ONNX Runtime use every core; detection processes each get a share
+        options.intra_op_num_threads = getattr(settings, 'DETECTION_ORT_THREADS', 0)
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.input_size = model_input.shape[2] if isinstance(model_input.shape[2], int) else SLICE_SIZE
+        # Models exported with a fixed batch dimension can only take that many slices per call
+        fixed_batch = model_input.shape[0]
+        self.batch_size = fixed_batch if isinstance(fixed_batch, int) else batch_size
+        self.confidence_threshold = confidence_threshold
+        # Slices other than the model input size are resized to it, like the full frame
+        self.slice_size = slice_size or self.input_size
+        self.slice_overlap = slice_overlap
+        # Optional cheap scoring that skips slices without content (see dashboard.prefilter)
+        self.prefilter_method, self.prefilter_threshold = prefilter_settings()
+        # Running estimate of model time per tile, used to report the time skipped slices save
+        self.tile_seconds = None
+
+        # Ultralytics stores the class names in the ONNX metadata
+        names = self.session.get_modelmeta().custom_metadata_map.get('names')
+        self.class_names = {int(k): v for k, v in ast.literal_eval(names).items()} if names else {}
+        logger.info(f"Batched slice engine ready: input {self.input_size}px, batch size {self.batch_size}, "
+                    f"{self.slice_size}px slices at {self.slice_overlap} overlap")
+
+    def _tiles(self, image):
+        """
+        Slices as (view, x offset, y offset, scale), plus the letterboxed full frame
+        Returns:
+            tuple: (tiles, prefilter stats or None)
+        """
+        height, width = image.shape[:2]
+        boxes = slice_boxes(height, width, self.slice_size, self.slice_size, self.slice_overlap, self.slice_overlap)
+        multiple_slices = len(boxes) > 1
+        stats = None
+        if self.prefilter_method and multiple_slices:
+            start = time.perf_counter()
+            scores = score_slices(image, boxes, self.prefilter_method)
+            kept = [box for box, score in zip(boxes, scores) if score >= self.prefilter_threshold]
+            stats = {
+                'method': self.prefilter_method,
+                'threshold': self.prefilter_threshold,
+                'slices': len(boxes),
+                'skipped': len(boxes) - len(kept),
+                'scoring_ms': round((time.perf_counter() - start) * 1000, 2),
+            }
+            boxes = kept
+        tiles = [(image[y_min:y_max, x_min:x_max], x_min, y_min, 1.0) for x_min, y_min, x_max, y_max in boxes]
+        if self.slice_size != self.input_size:
+            scale = self.input_size / self.slice_size
+            tiles = [
+                (cv2.resize(view, (round(view.shape[1] * scale), round(view.shape[0] * scale)),
+                            interpolation=cv2.INTER_LINEAR), x_offset, y_offset, scale)
+                for view, x_offset, y_offset, _ in tiles
+            ]
+        if multiple_slices:
+            # SAHI's standard prediction on the whole frame, merged with the slices
+            scale = self.input_size / max(height, width)
+            resized = cv2.resize(image, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_LINEAR)
+            tiles.append((resized, 0, 0, scale))
+        return tiles, stats
+
+    def _infer(self, tiles):
+        """Run tiles through the model, one ONNX call per batch"""
+        size = self.input_size
+        outputs = []
+        started = time.perf_counter()
+        for start in range(0, len(tiles), self.batch_size):
+            group = tiles[start:start + self.batch_size]
+            batch = np.full((len(group), size, size, 3), LETTERBOX_COLOR, dtype=np.uint8)
+            for i, (pixels, _, _, _) in enumerate(group):
+                batch[i, :pixels.shape[0], :pixels.shape[1]] = pixels
+            tensor = np.ascontiguousarray(batch.transpose(0, 3, 1, 2), dtype=np.float32)
+            tensor /= 255.0
+            outputs.extend(self.session.run(None, {self.input_name: tensor})[0])
+        if tiles:
+            per_tile = (time.perf_counter() - started) / len(tiles)
+            self.tile_seconds = per_tile if self.tile_seconds is None else 0.9 * self.tile_seconds + 0.1 * per_tile
+        return outputs
+
+    def _decode(self, output, x_offset, y_offset, scale):
+        """Decode one (4 + classes, anchors) YOLO output into full-frame boxes after per-class NMS"""
+        predictions = output.T
+        class_scores = predictions[:, 4:]
+        class_ids = class_scores.argmax(axis=1)
+        scores = class_scores[np.arange(len(class_ids)), class_ids]
+        keep = scores >= self.confidence_threshold
+        if not keep.any():
+            return np.empty((0, 4), dtype=np.float32), np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+        centers, class_ids, scores = predictions[keep, :4], class_ids[keep], scores[keep]
+
+        xywh = np.column_stack([centers[:, :2] - centers[:, 2:] / 2, centers[:, 2:]])
+        indices = cv2.dnn.NMSBoxesBatched(
+            xywh.tolist(), scores.tolist(), class_ids.tolist(), self.confidence_threshold, NMS_IOU_THRESHOLD
+        )
+        indices = np.asarray(indices, dtype=np.intp).reshape(-1)
+        xywh = xywh[indices] / scale
+        offset = np.array([x_offset, y_offset], dtype=xywh.dtype)
+        boxes = np.column_stack([xywh[:, :2] + offset, xywh[:, :2] + xywh[:, 2:] + offset])
+        return boxes, scores[indices], class_ids[indices].astype(np.int64)
+
+    def predict(self, image):
+        """
+        Sliced prediction on an RGB frame
+        Args:
+            image: RGB image (numpy array)
+        Returns:
+            tuple: (boxes (n, 4) xyxy, scores (n,), class_ids (n,) of the merged detections,
+                    prefilter stats with the estimated model time saved, or None)
+        """
+        height, width = image.shape[:2]
+        tiles, prefilter = self._tiles(image)
+        decoded = [self._decode(output, x_offset, y_offset, scale)
+                   for output, (_, x_offset, y_offset, scale) in zip(self._infer(tiles), tiles)]
+        boxes, scores, class_ids = (np.concatenate(parts) for parts in zip(*decoded))
+        # Clip to the frame in double precision, as SAHI's ObjectPrediction does
+        boxes = boxes.astype(np.float64)
+        boxes[:, :2] = np.maximum(boxes[:, :2], 0)
+        boxes[:, 2:] = np.minimum(boxes[:, 2:], [width, height])
+        if prefilter is not None:
+            prefilter['saved_ms'] = round(prefilter['skipped'] * (self.tile_seconds or 0.0) * 1000, 2)
+        return (*merge_predictions(boxes, scores.astype(np.float64), class_ids), prefilter)
 
 class SAHIDetector:
     def __init__(self, model_path=None):
@@ -26,6 +233,9 @@ class SAHIDetector:
         self.model = None
         self.model_path = model_path
         self.detection_model = None
+        self.engine = None
+        # Slice geometry from the tuned profile, or the defaults
+        self.slice_size, self.slice_overlap = load_slice_profile()
         
         # Default pest classes (you can customize these)
         self.pest_classes = [
@@ -36,27 +246,39 @@ class SAHIDetector:
         self._load_model()
     
     def _load_model(self):
-        """Load SAHI detection model"""
+        """
+        Load the detection model
+        ONNX models run through the batched slice engine; the SAHI model, which would
+        hold a second copy of the weights, is only loaded when the engine cannot be
+        """
+        if not (self.model_path and os.path.exists(self.model_path)):
+            logger.warning(f"Model path not found: {self.model_path}")
+        # Falls back to a default model for testing
+        path = self.model_path if self.model_path and os.path.exists(self.model_path) else "best.onnx"
+
+        # Batched ONNX slice inference when the model is an ONNX file, merged as SAHI merges slices
+        if ONNXRUNTIME_AVAILABLE and path.endswith('.onnx') and os.path.exists(path):
+            try:
+                batch_size = getattr(settings, 'DETECTION_BATCH_SIZE', SLICE_BATCH_SIZE)
+                self.engine = BatchedSliceEngine(path, batch_size=batch_size,
+                                                 slice_size=self.slice_size, slice_overlap=self.slice_overlap)
+                logger.info(f"Successfully loaded batched slice engine from {path}")
+                return
+            except Exception as e:
+                logger.error(f"Error loading batched slice engine, using SAHI slicing: {e}")
+                self.engine = None
+
+        if not SAHI_AVAILABLE:
+            return
         try:
-            if self.model_path and os.path.exists(self.model_path):
-                logger.info(f"Attempting to load model from: {self.model_path}")
-                self.detection_model = AutoDetectionModel.from_pretrained(
-                    model_type="yolo11",
-                    model_path=self.model_path,
-                    confidence_threshold=0.8,
-                    device="cpu",
-                )
-                logger.info(f"Successfully loaded SAHI model from {self.model_path}")
-            else:
-                logger.warning(f"Model path not found: {self.model_path}")
-                # Use a default model for testing
-                self.detection_model = AutoDetectionModel.from_pretrained(
-                    model_type="yolo11",
-                    model_path="best.onnx",  # Use nano model for testing
-                    confidence_threshold=0.8,
-                    device="cpu",
-                )
-                logger.info("Loaded default YOLO11 model for testing")
+            logger.info(f"Attempting to load SAHI model from: {path}")
+            self.detection_model = AutoDetectionModel.from_pretrained(
+                model_type="yolo11",
+                model_path=path,
+                confidence_threshold=CONFIDENCE_THRESHOLD,
+                device="cpu",
+            )
+            logger.info(f"Successfully loaded SAHI model from {path}")
         except Exception as e:
             logger.error(f"Error loading SAHI model: {e}")
             logger.error(f"Model path was: {self.model_path}")
@@ -80,21 +302,6 @@ class SAHIDetector:
         
         return image
     
-    def _save_temp_image(self, image):
-        """
-        Save image to temporary file for SAHI processing
-        Args:
-            image: OpenCV image
-        Returns:
-            Temporary file path
-        """
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        temp_filename = f"temp_input_{timestamp}.png"
-        temp_path = os.path.join(tempfile.gettempdir(), temp_filename)
-        
-        cv2.imwrite(temp_path, image)
-        return temp_path
-    
     def detect(self, image):
         """
         Perform SAHI object detection on the image
@@ -103,11 +310,7 @@ class SAHIDetector:
         Returns:
             dict: Detection results
         """
-        if not SAHI_AVAILABLE:
-            logger.warning("SAHI not available, using simulation")
-            return self._simulate_detection(image)
-            
-        if self.detection_model is None:
+        if self.detection_model is None and self.engine is None:
             logger.warning("Detection model not loaded, using simulation")
             return self._simulate_detection(image)
         
@@ -118,61 +321,40 @@ class SAHIDetector:
             # Resize image to 1080p
             image = self._resize_image(image)
             
-            # Save temporary image
-            temp_path = self._save_temp_image(image)
+            # SAHI takes the array in memory but expects RGB channel order
+            rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
             
-            # Perform SAHI detection
-            result = get_sliced_prediction(
-                temp_path,
-                self.detection_model,
-                slice_height=640,
-                slice_width=640,
-                overlap_height_ratio=0.5,
-                overlap_width_ratio=0.5
-            )
+            # Perform SAHI detection, batching the slices when the ONNX engine is loaded
+            prefilter = None
+            if self.engine is not None:
+                boxes, scores, class_ids, prefilter = self.engine.predict(rgb_image)
+                class_names = self.engine.class_names
+            else:
+                result = get_sliced_prediction(
+                    rgb_image,
+                    self.detection_model,
+                    slice_height=self.slice_size,
+                    slice_width=self.slice_size,
+                    overlap_height_ratio=self.slice_overlap,
+                    overlap_width_ratio=self.slice_overlap
+                )
+                boxes, scores, class_ids, class_names = from_object_predictions(result.object_prediction_list)
             
             # Calculate processing time
             end_time = time.time()
             processing_time = end_time - start_time
             
-            # Process detection results
-            detections = []
-            class_counts = {}
-            
-            for obj in result.object_prediction_list:
-                class_name = obj.category.name
-                confidence = obj.score.value
-                bbox = obj.bbox.to_xyxy()
-                
-                # Count classes
-                class_counts[class_name] = class_counts.get(class_name, 0) + 1
-                
-                detection = {
-                    'class': class_name,
-                    'confidence': confidence,
-                    'bbox': [int(bbox[0]), int(bbox[1]), int(bbox[2]), int(bbox[3])]
-                }
-                detections.append(detection)
-            
-            # Calculate average confidence
-            avg_confidence = sum(d['confidence'] for d in detections) / len(detections) if detections else 0.0
-            
-            # Clean up temporary file
-            try:
-                os.remove(temp_path)
-            except:
-                pass
+            # Detections stay as arrays until here, where they become the JSON results
+            results = to_results(boxes, scores, class_ids, class_names, processing_time)
             
             logger.info(f"SAHI detection completed in {processing_time:.2f} seconds")
-            logger.info(f"Detected {len(detections)} objects")
+            logger.info(f"Detected {results['total_detections']} objects")
             
-            return {
-                'detections': detections,
-                'total_detections': len(detections),
-                'average_confidence': round(avg_confidence, 2),
-                'processing_time': round(processing_time, 2),
-                'class_counts': class_counts
-            }
+            if prefilter is not None:
+                logger.info(f"Prefilter skipped {prefilter['skipped']}/{prefilter['slices']} slices, "
+                            f"saving about {prefilter['saved_ms']:.0f} ms")
+                results['prefilter'] = prefilter
+            return results
             
         except Exception as e:
             logger.error(f"Error during SAHI detection: {e}")
@@ -217,7 +399,8 @@ class SAHIDetector:
             'total_detections': len(detections),
             'average_confidence': round(avg_confidence, 2),
             'processing_time': round(random.uniform(0.1, 0.5), 2),
-            'class_counts': {d['class']: 1 for d in detections}
+            'class_counts': {d['class']: 1 for d in detections},
+            'simulated': True
         }
     
     def draw_detections(self, image, detections):
@@ -255,25 +438,55 @@ class SAHIDetector:
         
         return result_image
 
-# Global detector instance
-_detector = None
+def get_detector(growth_stage=None):
+    """Get the loaded SAHI detector for a growth stage from the model registry"""
+    from .model_registry import get_registry
+    return get_registry().detector_for(growth_stage)[1]
 
-def get_detector():
-    """Get or create SAHI detector instance"""
-    global _detector
-    if _detector is None:
-        # Use the specific model path
-        model_path = '/home/kiki/system-dashboard/app/dashboard/models/best.onnx'
-        _detector = SAHIDetector(model_path)
-    return _detector
+def model_version(model_path=None):
+    """
+    Identify the model file without loading it
+    Args:
+        model_path: Model file, default settings.DETECTION_MODEL_PATH
+    Returns:
+        str: name, modification time and size, or None when the file is missing
+    """
+    if model_path is None:
+        from .model_registry import default_model_path
+        model_path = default_model_path()
+    try:
+        stat = os.stat(model_path)
+    except OSError:
+        return None
+    return f'{os.path.basename(model_path)}:{int(stat.st_mtime)}:{stat.st_size}'
+
+def detection_config_key(model_path=None, version=None):
+    """
+    Everything that changes detection output for a given image: the model version
+    and the resize, slicing, prefilter, threshold and merge settings
+    Args:
+        model_path: Model file, default settings.DETECTION_MODEL_PATH
+        version: The file's model_version when already known (e.g. from the model registry)
+    Returns:
+        str, or None when no model is available (simulated results are not reproducible)
+    """
+    version = version or model_version(model_path)
+    if version is None:
+        return None
+    slice_size, overlap = load_slice_profile()
+    method, threshold = prefilter_settings()
+    return (f'{version}|1920x1080|{slice_size}:{overlap}|'
+            f'{CONFIDENCE_THRESHOLD}:{NMS_IOU_THRESHOLD}:{MERGE_MATCH_THRESHOLD}|{method}:{threshold}')
 
-def detect_pests(image):
+def detect_pests(image, growth_stage=None, entry=None):
     """
     Main function to detect pests in an image using SAHI
     Args:
         image: OpenCV image (numpy array)
+        growth_stage: Growth stage selecting the model from the registry
+        entry: Registry ModelEntry to use instead of resolving the growth stage
     Returns:
         dict: Detection results
     """
-    detector = get_detector()
-    return detector.detect(image) 
\ No newline at end of file
+    from .model_registry import get_registry
+    return get_registry().detect(image, growth_stage=growth_stage, entry=entry) 
\ No newline at end of file